@@ -4,3 +4,38 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+
+        from recipes.models import Ingredient, IngredientInRecipe, Recipe
+        from recipes.signals import counters_changed, image_rendered
+        from . import metrics, response_cache
+
+        connection_created.connect(metrics.install_execute_wrapper)
+
+        post_save.connect(response_cache.on_recipe_changed, sender=Recipe)
+        post_delete.connect(response_cache.on_recipe_changed, sender=Recipe)
+        post_save.connect(
+            response_cache.on_recipe_ingredient_changed,
+            sender=IngredientInRecipe,
+        )
+        post_delete.connect(
+            response_cache.on_recipe_ingredient_changed,
+            sender=IngredientInRecipe,
+        )
+        post_save.connect(
+            response_cache.on_ingredient_saved, sender=Ingredient
+        )
+        post_save.connect(
+            response_cache.on_author_saved, sender=get_user_model()
+        )
+        image_rendered.connect(response_cache.on_recipe_changed, sender=Recipe)
+        image_rendered.connect(
+            response_cache.on_author_changed, sender=get_user_model()
+        )
+        counters_changed.connect(
+            response_cache.on_counters_changed, sender=Recipe
+        )
@@ -0,0 +1,255 @@
+"""Асинхронные варианты читающих эндпоинтов для запуска под ASGI.
+
+Список и карточка рецепта, поиск ингредиентов и подписки обслуживаются
+корутинами: токен, кэш ответов, страница выборки и подписки на авторов
+загружаются через async ORM и асинхронный API кэша, поэтому воркер
+uvicorn не держит поток на время ожидания БД и Redis. Выборки строятся
+теми же ViewSet (get_queryset, фильтры, пагинаторы), а сериализуются
+синхронными сериализаторами DRF уже по загруженным данным — все
+обращения к БД, которые сериализаторы сделали бы сами, выполняются
+заранее.
+
+Единственный синхронный шаг — фильтры django-filter: ?author=
+проверяется запросом к БД внутри form.is_valid(), поэтому фильтрация
+идёт через sync_to_async. Остальные методы (POST, PUT, DELETE, HEAD) и
+запросы Browsable API передаются синхронным ViewSet роутера.
+
+Маршруты подключаются в api.urls при ASYNC_READ_VIEWS.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.http import Http404, HttpResponse
+from django.utils.translation import gettext_lazy as _
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.authentication import get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
+
+from . import ingredient_catalog, response_cache
+from .metrics import view_labels
+from .serializers import UserWithRecipesSerializer
+from .views import RecipeViewSet, UserSubscriptionViewSet
+from recipes import ingredient_index
+from recipes.models import Recipe
+from users.models import Follow
+
+User = get_user_model()
+
+TOKEN_KEYWORD = b"token"
+
+
+def render(data, status=200, headers=None):
+    response = HttpResponse(
+        JSONRenderer().render(data),
+        status=status,
+        content_type="application/json",
+        headers=headers,
+    )
+    response["Vary"] = "Accept"
+    return response
+
+
+def handle_exception(exc):
+    """Ответ на исключение в формате DRF (APIView.handle_exception)."""
+    headers = {}
+    if isinstance(
+        exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+    ):
+        headers["WWW-Authenticate"] = "Token"
+    response = exception_handler(exc, {})
+    if response is None:
+        raise exc
+    for header in ("WWW-Authenticate", "Retry-After"):
+        if header in response:
+            headers[header] = response[header]
+    return render(response.data, response.status_code, headers)
+
+
+def _accepts_json(request):
+    renderers = [
+        renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+    ]
+    try:
+        renderer, media_type = DefaultContentNegotiation().select_renderer(
+            request, renderers
+        )
+    except exceptions.NotAcceptable:
+        return False
+    request.accepted_renderer = renderer
+    request.accepted_media_type = media_type
+    return renderer.format == "json"
+
+
+def async_read(fallback):
+    """GET обрабатывает корутина, остальное — синхронный fallback.
+
+    Корутина получает DRF Request без аутентификации: пользователь
+    определяется вызовом authenticate().
+    """
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            drf_request = Request(request)
+            if request.method == "GET" and _accepts_json(drf_request):
+                try:
+                    return await view(drf_request, *args, **kwargs)
+                except (exceptions.APIException, Http404) as exc:
+                    return handle_exception(exc)
+            timing = getattr(request, "metrics_timing", None)
+            if timing is not None:
+                timing.labels = view_labels(fallback, request.method)
+            return await sync_to_async(fallback)(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+async def authenticate(request):
+    """Асинхронный аналог TokenAuthentication; ставит request.user."""
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != TOKEN_KEYWORD:
+        return request.user
+    if len(auth) == 1:
+        raise exceptions.AuthenticationFailed(
+            _("Invalid token header. No credentials provided.")
+        )
+    if len(auth) > 2:
+        raise exceptions.AuthenticationFailed(
+            _("Invalid token header. Token string should not contain spaces.")
+        )
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        raise exceptions.AuthenticationFailed(
+            _("Invalid token header. Token string should not contain "
+              "invalid characters.")
+        )
+    try:
+        token = await Token.objects.select_related("user").aget(key=key)
+    except Token.DoesNotExist:
+        raise exceptions.AuthenticationFailed(_("Invalid token."))
+    if not token.user.is_active:
+        raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+    request.user = token.user
+    request.auth = token
+    return token.user
+
+
+async def load_subscriptions(user, author_ids):
+    """Контекст "subscriptions" для сериализаторов (см. serializers)."""
+    if not user.is_authenticated:
+        return {}
+    author_ids = set(author_ids)
+    followed = {
+        author_id async for author_id in Follow.objects.filter(
+            user=user, author_id__in=author_ids
+        ).values_list("author_id", flat=True)
+    }
+    return {author_id: author_id in followed for author_id in author_ids}
+
+
+def viewset(viewset_class, request, action, **kwargs):
+    """Экземпляр ViewSet для get_queryset, фильтров и пагинатора."""
+    return viewset_class(
+        request=request,
+        args=(),
+        kwargs=kwargs,
+        action=action,
+        format_kwarg=None,
+    )
+
+
+async def _cached(key, build):
+    data = await response_cache.alookup(key)
+    if data is not None:
+        return render(data, headers={"X-Cache": "HIT"})
+    data = await build()
+    await response_cache.astore(key, data)
+    return render(data, headers={"X-Cache": "MISS"})
+
+
+async def _recipe_list(request):
+    view = viewset(RecipeViewSet, request, "list")
+    queryset = await sync_to_async(view.filter_queryset)(view.get_queryset())
+    page = await view.paginator.apaginate_queryset(queryset, request, view)
+    context = view.get_serializer_context()
+    context["subscriptions"] = await load_subscriptions(
+        request.user, (recipe.author_id for recipe in page)
+    )
+    serializer = view.get_serializer(page, many=True, context=context)
+    return view.paginator.get_paginated_response(serializer.data).data
+
+
+async def recipe_list(request):
+    await authenticate(request)
+    if response_cache.is_cacheable(request):
+        return await _cached(
+            await response_cache.alist_key(request),
+            lambda: _recipe_list(request),
+        )
+    return render(await _recipe_list(request))
+
+
+async def _recipe_detail(request, pk):
+    view = viewset(RecipeViewSet, request, "retrieve", pk=pk)
+    try:
+        recipe = await view.get_queryset().aget(pk=pk)
+    except Recipe.DoesNotExist:
+        raise Http404(
+            f"No {Recipe._meta.object_name} matches the given query."
+        )
+    context = view.get_serializer_context()
+    context["subscriptions"] = await load_subscriptions(
+        request.user, [recipe.author_id]
+    )
+    return view.get_serializer(recipe, context=context).data
+
+
+async def recipe_detail(request, pk):
+    await authenticate(request)
+    if response_cache.is_cacheable(request):
+        return await _cached(
+            await response_cache.adetail_key(request, pk),
+            lambda: _recipe_detail(request, pk),
+        )
+    return render(await _recipe_detail(request, pk))
+
+
+async def ingredient_list(request):
+    await authenticate(request)
+    name = request.query_params.get("name")
+    if name is not None:
+        return render(await ingredient_index.asearch(name))
+    catalog = ingredient_catalog.get_catalog(
+        await ingredient_index.aget_index()
+    )
+    return ingredient_catalog.catalog_response(request, catalog)
+
+
+async def subscriptions(request):
+    user = await authenticate(request)
+    if not user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    view = viewset(UserSubscriptionViewSet, request, "get_user_subscriptions")
+    queryset = view.with_recipes(
+        User.objects.filter(following__user=user), request
+    ).order_by("username", "id")
+    page = await view.paginator.apaginate_queryset(queryset, request, view)
+    # все авторы выборки — подписки пользователя
+    context = {
+        "request": request,
+        "subscriptions": {author.pk: True for author in page},
+    }
+    serializer = UserWithRecipesSerializer(page, many=True, context=context)
+    return render(
+        view.paginator.get_paginated_response(serializer.data).data
+    )
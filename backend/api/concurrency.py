@@ -0,0 +1,34 @@
+"""Ограничение числа запросов, которые воркер ASGI обрабатывает одновременно.
+
+В Django 5.0 async ORM выполняет запросы через sync_to_async в отдельном
+потоке на каждый HTTP-запрос, и у каждого такого потока своё соединение
+с БД. Без ограничения сотня одновременных соединений клиентов означает
+сотню соединений с PostgreSQL и ошибки после max_connections. Лишние
+запросы ждут семафора в цикле событий, не занимая ни потока, ни
+соединения.
+"""
+import asyncio
+
+from asgiref.sync import markcoroutinefunction
+from django.conf import settings
+
+
+class ConcurrencyLimitMiddleware:
+    """Подключается в settings только при ASYNC_READ_VIEWS."""
+
+    sync_capable = False
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # создаётся в цикле событий воркера при первом запросе
+        self.semaphore = None
+        markcoroutinefunction(self)
+
+    async def __call__(self, request):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(
+                settings.ASGI_MAX_CONCURRENT_REQUESTS
+            )
+        async with self.semaphore:
+            return await self.get_response(request)
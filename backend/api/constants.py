@@ -1,4 +1,5 @@
 PAGE_SIZE = 6
+CURSOR_QUERY_PARAM = "cursor"
 
 ERROR_MESSAGES = {
     "ingredient_min_value": "Количество должно быть не меньше 1.",
@@ -8,7 +9,28 @@ ERROR_MESSAGES = {
     "field_required_patch": "Это поле обязательно для обновления.",
     "image_empty": "Изображение не может быть пустым.",
     "auth_required": "Authentication credentials were not provided.",
+    "cursor_conflict": (
+        "Параметр cursor нельзя сочетать с {params}: курсорная выдача "
+        "упорядочена по дате публикации."
+    ),
 }
 
 MAX_NAME_LENGTH = 150
-MIN_INGREDIENT_AMOUNT = 1
\ No newline at end of file
+MIN_INGREDIENT_AMOUNT = 1
+
+# Запросы короче этого ищутся по подстроке названия (триграммный индекс)
+MIN_FULL_TEXT_SEARCH_LENGTH = 3
+
+# Корзины гистограмм /metrics: длительности в секундах и число SQL-запросов
+METRICS_DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+METRICS_QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Пакетное добавление и удаление: предел id в запросе и статусы элементов
+MAX_BATCH_SIZE = 100
+BATCH_ADDED = "added"
+BATCH_EXISTS = "exists"
+BATCH_NOT_FOUND = "not_found"
+BATCH_REMOVED = "removed"
+BATCH_MISSING = "missing"
@@ -0,0 +1,79 @@
+import uuid
+
+import filetype
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+from recipes.renditions import rendition_url
+from .uploads import RejectedUpload, image_too_large_message
+
+MAGIC_BYTES_LENGTH = 261
+
+
+class DeferredBase64ImageField(Base64ImageField):
+    """Изображение в base64 (JSON) или файлом (multipart/form-data).
+
+    Pillow в запросе не используется: тип определяется по первым байтам,
+    а полностью изображение разбирает воркер process_images. Файлы из
+    multipart уже проверены ImageUploadHandler и лежат на диске.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("_DjangoImageField", forms.FileField)
+        super().__init__(*args, **kwargs)
+
+    def _size_error(self):
+        return ValidationError(image_too_large_message())
+
+    def to_internal_value(self, data):
+        if isinstance(data, RejectedUpload):
+            raise ValidationError(data.error)
+        if not isinstance(data, UploadedFile):
+            # base64 длиннее данных в 4/3 раза: не декодируем заведомо большие
+            if (
+                isinstance(data, str)
+                and len(data) * 3 // 4 > settings.MAX_IMAGE_UPLOAD_SIZE
+            ):
+                raise self._size_error()
+            return super().to_internal_value(data)
+        if data.size > settings.MAX_IMAGE_UPLOAD_SIZE:
+            raise self._size_error()
+        extension = getattr(data, "image_extension", None)
+        if extension is None:
+            extension = filetype.guess_extension(data.read(MAGIC_BYTES_LENGTH))
+            data.seek(0)
+        if extension not in self.ALLOWED_TYPES:
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+        data.name = f"{uuid.uuid4()}.{extension}"
+        return serializers.ImageField.to_internal_value(self, data)
+
+    def get_file_extension(self, filename, decoded_file):
+        extension = filetype.guess_extension(decoded_file)
+        if extension is None:
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        return extension
+
+
+class RenditionImageField(serializers.ImageField):
+    """URL уменьшенной копии изображения; до её готовности — оригинала.
+
+    ``list_size`` используется, когда объект сериализуется в списке.
+    """
+
+    def __init__(self, size, list_size=None, **kwargs):
+        self.size = size
+        self.list_size = list_size or size
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        in_list = isinstance(self.root, serializers.ListSerializer)
+        url = rendition_url(value, self.list_size if in_list else self.size)
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
@@ -1,7 +1,13 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchRank, TrigramWordSimilarity
+from django.db.models import Exists, F, OuterRef
 from django_filters.rest_framework import FilterSet, CharFilter, BooleanFilter
+from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.settings import api_settings
 
-from recipes.models import Recipe, Ingredient
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
+from recipes.search import search_query
+from .constants import MIN_FULL_TEXT_SEARCH_LENGTH
 
 User = get_user_model()
 
@@ -14,17 +20,67 @@ class RecipeFilter(FilterSet):
         model = Recipe
         fields = ["author", "is_favorited", "is_in_shopping_cart"]
 
-    def filter_is_favorited(self, queryset, name, value):
+    def _filter_by_user_relation(self, queryset, relation_model, value):
         user = self.request.user
-        if user.is_authenticated:
-            return queryset.filter(favorited_by__user=user) if value else queryset.exclude(favorited_by__user=user)
-        return queryset.none() if value else queryset
+        if not user.is_authenticated:
+            return queryset.none() if value else queryset
+        related = Exists(
+            relation_model.objects.filter(user=user, recipe=OuterRef("pk"))
+        )
+        return queryset.filter(related if value else ~related)
+
+    def filter_is_favorited(self, queryset, name, value):
+        return self._filter_by_user_relation(queryset, Favorite, value)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
-        user = self.request.user
-        if user.is_authenticated:
-            return queryset.filter(in_shopping_carts_of__user=user) if value else queryset.exclude(in_shopping_carts_of__user=user)
-        return queryset.none() if value else queryset
+        return self._filter_by_user_relation(queryset, ShoppingCart, value)
+
+
+class UniqueOrderingFilter(OrderingFilter):
+    """OrderingFilter, который дополняет сортировку полем id.
+
+    Значения полей сортировки (число добавлений в избранное, название)
+    повторяются, а без уникального последнего поля порядок равных строк
+    не определён, и страницы OFFSET-пагинации могут повторять или
+    пропускать рецепты. id берётся в направлении последнего поля, как в
+    индексе (-favorites_count, -id).
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering or {"id", "-id", "pk", "-pk"} & set(ordering):
+            return ordering
+        tiebreaker = "-id" if ordering[-1].startswith("-") else "id"
+        return [*ordering, tiebreaker]
+
+
+class RecipeSearchFilter(SearchFilter):
+    """Поиск по ?search=: полнотекстовый по search_vector с ранжированием.
+
+    Короткие запросы и запросы без слов ищутся по подстроке названия
+    (индекс gin_trgm_ops) и ранжируются по триграммному сходству. Без
+    явного ?ordering= выдача сортируется по релевантности, поэтому фильтр
+    должен стоять после OrderingFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, "").strip()
+        if not text:
+            return queryset
+        query = None
+        if len(text) >= MIN_FULL_TEXT_SEARCH_LENGTH:
+            query = search_query(text)
+        if query is not None:
+            queryset = queryset.filter(search_vector=query).annotate(
+                search_rank=SearchRank(F("search_vector"), query)
+            )
+        else:
+            queryset = queryset.filter(name__icontains=text).annotate(
+                search_rank=TrigramWordSimilarity(text, "name")
+            )
+        if api_settings.ORDERING_PARAM in request.query_params:
+            return queryset
+        return queryset.order_by("-search_rank", "-pub_date", "-id")
 
 
 class IngredientFilter(FilterSet):
@@ -0,0 +1,60 @@
+"""Предварительно отрендеренный ответ со всем каталогом ингредиентов.
+
+Тело ответа строится из in-memory индекса ингредиентов один раз на версию
+каталога и хранится в памяти вместе со сжатой копией. Версией служит
+sha256 тела: она меняется при любом изменении строк Ingredient и совпадает
+во всех воркерах, поэтому используется как strong ETag.
+"""
+import gzip
+import hashlib
+from collections import namedtuple
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from recipes import ingredient_index
+
+Catalog = namedtuple("Catalog", ("index", "body", "gzip_body", "version"))
+
+_catalog = None
+
+
+def get_catalog(index=None):
+    global _catalog
+    if index is None:
+        index = ingredient_index.get_index()
+    catalog = _catalog
+    if catalog is None or catalog.index is not index:
+        body = JSONRenderer().render(index.items)
+        catalog = _catalog = Catalog(
+            index=index,
+            body=body,
+            gzip_body=gzip.compress(body, mtime=0),
+            version=hashlib.sha256(body).hexdigest()[:32],
+        )
+    return catalog
+
+
+def catalog_response(request, catalog):
+    """Ответ с каталогом: 304 по If-None-Match, gzip по Accept-Encoding."""
+    use_gzip = "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", "")
+    etags = (f'"{catalog.version}"', f'"{catalog.version}-gzip"')
+    if_none_match = parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))
+    if "*" in if_none_match or set(etags) & set(if_none_match):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(
+            catalog.gzip_body if use_gzip else catalog.body,
+            content_type="application/json",
+        )
+        if use_gzip:
+            response["Content-Encoding"] = "gzip"
+    response["ETag"] = etags[use_gzip]
+    patch_cache_control(
+        response, public=True, max_age=settings.INGREDIENT_CATALOG_MAX_AGE
+    )
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
@@ -0,0 +1,276 @@
+"""Метрики запросов к API без DEBUG.
+
+К каждому соединению с БД при открытии подключается execute_wrapper,
+который считает SQL-запросы и их время для текущего запроса (ContextVar,
+который RequestMetricsMiddleware ставит на время обработки), не сохраняя
+текст запросов, как это делает connection.queries при DEBUG. ContextVar
+переходит в потоки sync_to_async, поэтому под ASGI учитываются и запросы
+async ORM. Время запроса делится на фазы:
+db (SQL), app (код представления и сериализаторов без SQL) и render
+(превращение Response в байты рендерером DRF). Фазы уходят в заголовок
+Server-Timing и в гистограммы процесса по представлению и действию,
+которые отдаёт /metrics в текстовом формате Prometheus. Гистограммы
+живут в памяти процесса: у каждого воркера gunicorn они свои.
+
+Медленные запросы пишутся в лог выборочно (SLOW_QUERY_SAMPLE_RATE) уже
+после ответа, когда известно, к какому представлению они относятся.
+Параметры запросов в лог не попадают.
+"""
+import bisect
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+from . import response_cache
+from .constants import METRICS_DURATION_BUCKETS, METRICS_QUERY_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+UNRESOLVED = ("unresolved", "none")
+
+HISTOGRAMS = {
+    "foodgram_http_request_duration_seconds": (
+        "Полное время обработки запроса", METRICS_DURATION_BUCKETS
+    ),
+    "foodgram_http_request_db_seconds": (
+        "Время SQL-запросов за запрос", METRICS_DURATION_BUCKETS
+    ),
+    "foodgram_http_request_render_seconds": (
+        "Время рендеринга ответа", METRICS_DURATION_BUCKETS
+    ),
+    "foodgram_http_request_queries": (
+        "Число SQL-запросов за запрос", METRICS_QUERY_BUCKETS
+    ),
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # последний элемент — корзина +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.histograms = {}
+
+    def record(self, labels, method, status, observations):
+        with self.lock:
+            self.requests[(*labels, method, status)] += 1
+            for name, value in observations.items():
+                histogram = self.histograms.get((name, labels))
+                if histogram is None:
+                    histogram = self.histograms[(name, labels)] = Histogram(
+                        HISTOGRAMS[name][1]
+                    )
+                histogram.observe(value)
+
+    def render(self):
+        lines = [
+            "# HELP foodgram_http_requests_total Число обработанных запросов",
+            "# TYPE foodgram_http_requests_total counter",
+        ]
+        with self.lock:
+            lines.extend(
+                "foodgram_http_requests_total{"
+                f'view="{view}",action="{action}",'
+                f'method="{method}",status="{status}"'
+                f"}} {count}"
+                for (view, action, method, status), count in sorted(
+                    self.requests.items()
+                )
+            )
+            histograms = sorted(self.histograms.items())
+            for name, (help_text, _) in HISTOGRAMS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, (view, action)), histogram in histograms:
+                    if metric == name:
+                        lines.extend(
+                            _histogram_lines(name, view, action, histogram)
+                        )
+        counters = response_cache.stats()
+        for kind in ("hits", "misses"):
+            name = f"foodgram_recipe_response_cache_{kind}_total"
+            lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name} {counters[kind]}")
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name, view, action, histogram):
+    labels = f'view="{view}",action="{action}"'
+    cumulative = 0
+    for bound, count in zip(
+        (*histogram.buckets, "+Inf"), histogram.counts
+    ):
+        cumulative += count
+        yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+    yield f"{name}_sum{{{labels}}} {histogram.sum}"
+    yield f"{name}_count{{{labels}}} {cumulative}"
+
+
+registry = Registry()
+
+current_timing = ContextVar("current_timing", default=None)
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    timing = current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    return timing.execute(execute, sql, params, many, context)
+
+
+def install_execute_wrapper(sender, connection, **kwargs):
+    """Обработчик connection_created."""
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+def view_labels(view_func, method):
+    """Имя представления и действия ViewSet (list, retrieve, favorite...)."""
+    method = method.lower()
+    view_class = getattr(view_func, "cls", None)
+    if view_class is None:
+        return getattr(view_func, "__name__", type(view_func).__name__), method
+    actions = getattr(view_func, "actions", None) or {}
+    return view_class.__name__, actions.get(method, method)
+
+
+class RequestTiming:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.labels = UNRESOLVED
+        self.queries = 0
+        self.db = 0
+        self.view_finished = None
+        self.db_before_render = 0
+        self.slow_queries = []
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db += elapsed
+            if (
+                elapsed * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS
+                and random.random() < settings.SLOW_QUERY_SAMPLE_RATE
+            ):
+                self.slow_queries.append((elapsed, sql))
+
+    def view_done(self):
+        self.view_finished = time.perf_counter()
+        self.db_before_render = self.db
+
+    def phases(self):
+        finished = time.perf_counter()
+        total = finished - self.started
+        render = 0
+        if self.view_finished is not None:
+            render = max(
+                finished - self.view_finished
+                - (self.db - self.db_before_render),
+                0,
+            )
+        return {
+            "total": total,
+            "db": self.db,
+            "render": render,
+            "app": max(total - self.db - render, 0),
+        }
+
+
+def server_timing(timing, phases):
+    return ", ".join((
+        f'db;desc="SQL x{timing.queries}";dur={phases["db"] * 1000:.1f}',
+        f"app;dur={phases['app'] * 1000:.1f}",
+        f"render;dur={phases['render'] * 1000:.1f}",
+        f"total;dur={phases['total'] * 1000:.1f}",
+    ))
+
+
+class RequestMetricsMiddleware:
+    """Считает SQL и время фаз запроса; ставится первым в MIDDLEWARE."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timing = request.metrics_timing = RequestTiming()
+        token = current_timing.set(timing)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        return self.record(request, timing, response)
+
+    async def __acall__(self, request):
+        timing = request.metrics_timing = RequestTiming()
+        token = current_timing.set(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        return self.record(request, timing, response)
+
+    def record(self, request, timing, response):
+        phases = timing.phases()
+        response["Server-Timing"] = server_timing(timing, phases)
+        registry.record(
+            timing.labels,
+            request.method,
+            response.status_code,
+            {
+                "foodgram_http_request_duration_seconds": phases["total"],
+                "foodgram_http_request_db_seconds": phases["db"],
+                "foodgram_http_request_render_seconds": phases["render"],
+                "foodgram_http_request_queries": timing.queries,
+            },
+        )
+        view, action = timing.labels
+        for elapsed, sql in timing.slow_queries:
+            logger.warning(
+                "Медленный SQL-запрос %.1f мс в %s.%s: %s",
+                elapsed * 1000, view, action, sql,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_timing.labels = view_labels(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        # Response DRF рендерится после возврата из представления
+        request.metrics_timing.view_done()
+        return response
+
+
+def metrics_view(request):
+    return HttpResponse(
+        registry.render(),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,12 @@
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class IgnoreFormatContentNegotiation(DefaultContentNegotiation):
+    """Не использует ``?format=`` для выбора рендерера DRF.
+
+    Нужна для view, где ``format`` выбирает формат файла, а ответы
+    с ошибками по-прежнему рендерятся в JSON.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
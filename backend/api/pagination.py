@@ -1,7 +1,424 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import hashlib
+import json
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import (
+    EmptyPage,
+    InvalidPage,
+    Page,
+    PageNotAnInteger,
+    Paginator,
+)
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .constants import CURSOR_QUERY_PARAM, ERROR_MESSAGES, PAGE_SIZE
+
+
+class AsyncPaginator(Paginator):
+    """Paginator с асинхронными acount() и apage() для представлений ASGI.
+
+    acount() сохраняет результат в cached_property count, поэтому проверки
+    номера страницы после него к БД не обращаются.
+    """
+
+    async def acount(self):
+        if "count" not in self.__dict__:
+            self.__dict__["count"] = await self.object_list.acount()
+        return self.count
+
+    async def apage(self, number):
+        await self.acount()
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        rows = [row async for row in self.object_list[bottom:top]]
+        return self._get_page(rows, number, self)
 
-from .constants import PAGE_SIZE
 
 class FoodgramPageNumberPagination(PageNumberPagination):
     page_size_query_param = "limit"
     page_size = PAGE_SIZE
+    django_paginator_class = AsyncPaginator
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset на async ORM; страница загружается целиком."""
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        # номер "last" требует числа страниц
+        await paginator.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = await paginator.apage(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+
+class ApproximatePage(Page):
+    """Страница, которая знает о следующей по лишней выбранной строке."""
+
+    def __init__(self, object_list, number, paginator, has_more):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        return self.has_more
+
+
+class ApproximateCountPaginator(AsyncPaginator):
+    """Paginator, который не считает COUNT(*) по большим выборкам.
+
+    Точное число считается ограниченным запросом до
+    APPROXIMATE_COUNT_THRESHOLD строк. Выше порога для выборки без условий
+    берётся оценка планировщика (pg_class.reltuples), а для
+    отфильтрованной — точный COUNT(*), закэшированный на
+    APPROXIMATE_COUNT_CACHE_TIMEOUT секунд. Наличие следующей страницы в
+    этом режиме определяется по лишней строке, а не по числу страниц.
+    """
+
+    count_is_approximate = False
+
+    @cached_property
+    def count(self):
+        # аннотации (Exists, ранг поиска) для подсчёта не нужны
+        queryset = self.object_list.order_by().values("pk")
+        threshold = settings.APPROXIMATE_COUNT_THRESHOLD
+        bounded = queryset[:threshold + 1].count()
+        if bounded <= threshold:
+            return bounded
+        self.count_is_approximate = True
+        estimate = None
+        if not queryset.query.where:
+            estimate = self._table_estimate(queryset)
+        if estimate is None:
+            estimate = self._cached_count(queryset)
+        return max(estimate, bounded)
+
+    @staticmethod
+    def _table_estimate(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != "postgresql":
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class "
+                "WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # -1: таблица ещё ни разу не анализировалась
+        return row[0] if row and row[0] >= 0 else None
+
+    async def acount(self):
+        if "count" in self.__dict__:
+            return self.count
+        queryset = self.object_list.order_by().values("pk")
+        threshold = settings.APPROXIMATE_COUNT_THRESHOLD
+        count = bounded = await queryset[:threshold + 1].acount()
+        if bounded > threshold:
+            self.count_is_approximate = True
+            estimate = None
+            if not queryset.query.where:
+                # у Django нет асинхронного курсора
+                estimate = await sync_to_async(self._table_estimate)(queryset)
+            if estimate is None:
+                estimate = await self._acached_count(queryset)
+            count = max(estimate, bounded)
+        self.__dict__["count"] = count
+        return count
+
+    @staticmethod
+    def _count_key(queryset):
+        sql, params = queryset.query.sql_with_params()
+        return "approximate-count:" + hashlib.sha256(
+            f"{sql}{params!r}".encode()
+        ).hexdigest()
+
+    @classmethod
+    def _cached_count(cls, queryset):
+        key = cls._count_key(queryset)
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, settings.APPROXIMATE_COUNT_CACHE_TIMEOUT)
+        return count
+
+    @classmethod
+    async def _acached_count(cls, queryset):
+        key = cls._count_key(queryset)
+        count = await cache.aget(key)
+        if count is None:
+            count = await queryset.acount()
+            await cache.aset(
+                key, count, settings.APPROXIMATE_COUNT_CACHE_TIMEOUT
+            )
+        return count
+
+    def validate_number(self, number):
+        if not self.count_is_approximate:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("Номер страницы должен быть целым числом.")
+        if number < 1:
+            raise EmptyPage("Номер страницы меньше 1.")
+        return number
+
+    def page(self, number):
+        if self.count <= settings.APPROXIMATE_COUNT_THRESHOLD:
+            return super().page(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        return self._approximate_page(rows, number)
+
+    async def apage(self, number):
+        if await self.acount() <= settings.APPROXIMATE_COUNT_THRESHOLD:
+            return await super().apage(number)
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        rows = [
+            row async for row in
+            self.object_list[bottom:bottom + self.per_page + 1]
+        ]
+        return self._approximate_page(rows, number)
+
+    def _approximate_page(self, rows, number):
+        if not rows and number > 1:
+            raise EmptyPage("На этой странице нет результатов.")
+        return ApproximatePage(
+            rows[:self.per_page], number, self, len(rows) > self.per_page
+        )
+
+
+class RecipePageNumberPagination(FoodgramPageNumberPagination):
+    django_paginator_class = ApproximateCountPaginator
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data["count_is_approximate"] = (
+            self.page.paginator.count_is_approximate
+        )
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"]["count_is_approximate"] = {
+            "type": "boolean",
+        }
+        return response_schema
+
+
+class KeysetPagination(BasePagination):
+    """Курсорная пагинация по ключу сортировки без OFFSET и COUNT(*).
+
+    Курсор хранит значения полей ``ordering`` у крайней записи страницы,
+    следующая страница выбирается условием «строго после ключа», которое
+    покрывается составным индексом по тем же полям. Поэтому страница N
+    стоит столько же, сколько первая. Последнее поле ключа должно быть
+    уникальным.
+    """
+
+    ordering = ()
+    page_size = PAGE_SIZE
+    page_size_query_param = "limit"
+    cursor_query_param = CURSOR_QUERY_PARAM
+    invalid_cursor_message = "Неверный курсор."
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return page_size if page_size > 0 else self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            position, reverse = cursor["p"], bool(cursor["r"])
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(
+            self.ordering
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, instance, reverse):
+        position = []
+        for field in self.ordering:
+            value = getattr(instance, field.lstrip("-"))
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            position.append(value)
+        cursor = json.dumps({"p": position, "r": int(reverse)})
+        encoded = base64.urlsafe_b64encode(cursor.encode()).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def _order_by(self, reverse):
+        if not reverse:
+            return self.ordering
+        return [
+            field[1:] if field.startswith("-") else f"-{field}"
+            for field in self.ordering
+        ]
+
+    def _after(self, position, reverse):
+        """(f1, f2, ...) строго после position в порядке сортировки.
+
+        Первое условие дублирует границу по ведущему полю, чтобы
+        PostgreSQL начал сканирование индекса с позиции курсора.
+        """
+        equal = Q()
+        after = Q()
+        bound = None
+        for field, value in zip(self._order_by(reverse), position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            if bound is None:
+                bound = Q(**{f"{name}__{lookup}e": value})
+            after |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return bound & after
+
+    def _page_queryset(self, queryset, request):
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+        queryset = queryset.order_by(*self._order_by(reverse))
+        if position is not None:
+            queryset = queryset.filter(self._after(position, reverse))
+        return queryset[:page_size + 1], page_size, position, reverse
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, *state = self._page_queryset(queryset, request)
+        return self._page(list(queryset), *state)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset, *state = self._page_queryset(queryset, request)
+        return self._page([row async for row in queryset], *state)
+
+    def _page(self, rows, page_size, position, reverse):
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+        has_next = position is not None if reverse else has_more
+        has_previous = has_more if reverse else position is not None
+        self.next_link = (
+            self.encode_cursor(rows[-1], False) if rows and has_next else None
+        )
+        if rows and has_previous:
+            self.previous_link = self.encode_cursor(rows[0], True)
+        elif position is not None and not reverse:
+            self.previous_link = remove_query_param(
+                self.base_url, self.cursor_query_param
+            )
+        else:
+            self.previous_link = None
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.next_link,
+            "previous": self.previous_link,
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {
+                    "type": "string", "nullable": True, "format": "uri"
+                },
+                "results": schema,
+            },
+        }
+
+
+class RecipeKeysetPagination(KeysetPagination):
+    ordering = ("-pub_date", "id")
+
+
+class TrendingKeysetPagination(KeysetPagination):
+    ordering = ("trending_rank",)
+
+
+class SubscriptionKeysetPagination(KeysetPagination):
+    ordering = ("username", "id")
+
+
+class KeysetPaginationMixin:
+    """Курсорная пагинация по запросу: ``?cursor=`` (пустой — первая страница).
+
+    Без параметра используется обычная постраничная ``pagination_class``.
+    Курсор задаёт порядок выдачи сам, поэтому вместе с параметрами
+    сортировки и поиска (``?ordering=``, ``?search=``) он отклоняется
+    с ошибкой 400.
+    """
+
+    keyset_pagination_class = None
+
+    def _ordering_params(self):
+        # у ViewSet без GenericAPIView фильтров нет
+        for backend in getattr(self, "filter_backends", ()):
+            if issubclass(backend, OrderingFilter):
+                yield backend.ordering_param
+            elif issubclass(backend, SearchFilter):
+                yield backend.search_param
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            pagination_class = self.pagination_class
+            if (
+                self.keyset_pagination_class is not None
+                and CURSOR_QUERY_PARAM in self.request.query_params
+            ):
+                conflicting = [
+                    param for param in self._ordering_params()
+                    if param in self.request.query_params
+                ]
+                if conflicting:
+                    raise ValidationError({
+                        "errors": ERROR_MESSAGES["cursor_conflict"].format(
+                            params=", ".join(conflicting)
+                        )
+                    })
+                pagination_class = self.keyset_pagination_class
+            self._paginator = (
+                pagination_class() if pagination_class is not None else None
+            )
+        return self._paginator
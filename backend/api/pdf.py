@@ -0,0 +1,446 @@
+"""Потоковая генерация простых текстовых PDF.
+
+Документ отдаётся по частям: каждая страница записывается, как только
+набраны её строки, а объекты шрифта, дерево страниц и таблица xref
+дописываются в конце. В памяти держатся только текущая страница, смещения
+объектов и множество использованных глифов.
+
+Для кириллицы встраивается TrueType-шрифт (PDF_FONT_PATH) как CIDFont с
+кодировкой Identity-H. Встраивается подмножество шрифта: контуры
+неиспользованных глифов удаляются, номера глифов не меняются.
+"""
+import hashlib
+import struct
+import zlib
+from functools import lru_cache
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 50
+FONT_SIZE = 11
+LEADING = 15
+# Таблицы TrueType, которые нужны для CIDFontType2 (PDF 1.7, 9.9)
+SUBSET_TABLES = (
+    b"cvt ", b"fpgm", b"glyf", b"head", b"hhea", b"hmtx", b"loca", b"maxp",
+    b"prep",
+)
+# Флаги составного глифа
+ARG_1_AND_2_ARE_WORDS = 0x0001
+WE_HAVE_A_SCALE = 0x0008
+MORE_COMPONENTS = 0x0020
+WE_HAVE_AN_X_AND_Y_SCALE = 0x0040
+WE_HAVE_A_TWO_BY_TWO = 0x0080
+
+
+class TrueTypeFont:
+    """Минимальный разбор TTF: cmap (формат 4), ширины глифов, метрики и
+    контуры (glyf/loca) для подмножества шрифта."""
+
+    def __init__(self, path):
+        with open(path, "rb") as font_file:
+            self.data = font_file.read()
+        self.tables = tables = self._read_tables()
+        head = tables[b"head"]
+        units_per_em = self._unpack(">H", head + 18)
+        self.scale = 1000 / units_per_em
+        self.bbox = [
+            round(value * self.scale)
+            for value in struct.unpack_from(">4h", self.data, head + 36)
+        ]
+        hhea = tables[b"hhea"]
+        self.ascent = round(self._unpack(">h", hhea + 4) * self.scale)
+        self.descent = round(self._unpack(">h", hhea + 6) * self.scale)
+        self.widths = self._read_widths(
+            tables[b"hmtx"], self._unpack(">H", hhea + 34)
+        )
+        self.cmap = self._read_cmap(tables[b"cmap"])
+        self.glyph_offsets = self._read_loca(
+            self._unpack(">H", tables[b"maxp"] + 4),
+            self._unpack(">h", head + 50),
+        )
+
+    def _unpack(self, fmt, offset):
+        return struct.unpack_from(fmt, self.data, offset)[0]
+
+    def _read_tables(self):
+        """Смещения таблиц; длины — в ``table_lengths``."""
+        num_tables = self._unpack(">H", 4)
+        tables, self.table_lengths = {}, {}
+        for index in range(num_tables):
+            tag, _, offset, length = struct.unpack_from(
+                ">4sIII", self.data, 12 + 16 * index
+            )
+            tables[tag] = offset
+            self.table_lengths[tag] = length
+        return tables
+
+    def _read_loca(self, number_of_glyphs, index_to_loc_format):
+        """Смещения контуров глифов от начала таблицы glyf."""
+        if index_to_loc_format:
+            fmt, factor = f">{number_of_glyphs + 1}I", 1
+        else:
+            fmt, factor = f">{number_of_glyphs + 1}H", 2
+        return [
+            offset * factor
+            for offset in struct.unpack_from(
+                fmt, self.data, self.tables[b"loca"]
+            )
+        ]
+
+    def _read_widths(self, hmtx, number_of_metrics):
+        return [
+            round(self._unpack(">H", hmtx + 4 * index) * self.scale)
+            for index in range(number_of_metrics)
+        ]
+
+    def _read_cmap(self, cmap):
+        num_subtables = self._unpack(">H", cmap + 2)
+        for index in range(num_subtables):
+            platform, encoding, offset = struct.unpack_from(
+                ">HHI", self.data, cmap + 4 + 8 * index
+            )
+            subtable = cmap + offset
+            if (
+                (platform, encoding) in ((3, 1), (0, 3))
+                and self._unpack(">H", subtable) == 4
+            ):
+                return self._read_cmap_format4(subtable)
+        raise ValueError("В шрифте нет Unicode-таблицы cmap формата 4.")
+
+    def _read_cmap_format4(self, subtable):
+        seg_count = self._unpack(">H", subtable + 6) // 2
+        ends = subtable + 14
+        starts = ends + 2 * seg_count + 2
+        deltas = starts + 2 * seg_count
+        range_offsets = deltas + 2 * seg_count
+        mapping = {}
+        for segment in range(seg_count):
+            end = self._unpack(">H", ends + 2 * segment)
+            start = self._unpack(">H", starts + 2 * segment)
+            delta = self._unpack(">h", deltas + 2 * segment)
+            range_offset_pos = range_offsets + 2 * segment
+            range_offset = self._unpack(">H", range_offset_pos)
+            for code in range(start, min(end, 0xFFFE) + 1):
+                if range_offset:
+                    glyph = self._unpack(
+                        ">H",
+                        range_offset_pos + range_offset + 2 * (code - start),
+                    )
+                    if glyph:
+                        glyph = (glyph + delta) & 0xFFFF
+                else:
+                    glyph = (code + delta) & 0xFFFF
+                if glyph:
+                    mapping[code] = glyph
+        return mapping
+
+    def width(self, glyph):
+        return self.widths[min(glyph, len(self.widths) - 1)]
+
+    def _glyph_data(self, glyph):
+        start = self.tables[b"glyf"] + self.glyph_offsets[glyph]
+        end = self.tables[b"glyf"] + self.glyph_offsets[glyph + 1]
+        return self.data[start:end]
+
+    def _components(self, glyph):
+        """Глифы, из которых собран составной глиф."""
+        data = self._glyph_data(glyph)
+        if len(data) < 10 or struct.unpack_from(">h", data)[0] >= 0:
+            return
+        position = 10
+        flags = MORE_COMPONENTS
+        while flags & MORE_COMPONENTS:
+            flags, component = struct.unpack_from(">HH", data, position)
+            yield component
+            position += 8 if flags & ARG_1_AND_2_ARE_WORDS else 6
+            if flags & WE_HAVE_A_SCALE:
+                position += 2
+            elif flags & WE_HAVE_AN_X_AND_Y_SCALE:
+                position += 4
+            elif flags & WE_HAVE_A_TWO_BY_TWO:
+                position += 8
+
+    def subset(self, glyphs):
+        """TTF, в котором остались контуры только глифов ``glyphs``.
+
+        Номера глифов сохраняются (CIDToGIDMap /Identity), у остальных
+        глифов пустые контуры. Таблица loca пишется в длинном формате.
+        """
+        keep = {0}
+        pending = list(glyphs)
+        while pending:
+            glyph = pending.pop()
+            if glyph not in keep and glyph < len(self.glyph_offsets) - 1:
+                keep.add(glyph)
+                pending.extend(self._components(glyph))
+        glyf, loca = bytearray(), []
+        for glyph in range(len(self.glyph_offsets) - 1):
+            loca.append(len(glyf))
+            if glyph in keep:
+                glyf += self._glyph_data(glyph)
+                glyf += bytes(-len(glyf) % 4)
+        loca.append(len(glyf))
+        head_offset = self.tables[b"head"]
+        head = bytearray(self.data[head_offset:head_offset + 54])
+        # checkSumAdjustment пересчитывается ниже, indexToLocFormat = 1
+        struct.pack_into(">I", head, 8, 0)
+        struct.pack_into(">h", head, 50, 1)
+        tables = {
+            tag: self.data[
+                self.tables[tag]:self.tables[tag] + self.table_lengths[tag]
+            ]
+            for tag in SUBSET_TABLES
+            if tag in self.tables
+        }
+        tables.update({
+            b"glyf": bytes(glyf),
+            b"head": bytes(head),
+            b"loca": struct.pack(f">{len(loca)}I", *loca),
+        })
+        return _build_font(tables)
+
+
+def _checksum(data):
+    data += bytes(-len(data) % 4)
+    return sum(struct.unpack(f">{len(data) // 4}I", data)) & 0xFFFFFFFF
+
+
+def _build_font(tables):
+    """Собирает файл TrueType из таблиц {тег: байты}."""
+    tags = sorted(tables)
+    entry_selector = len(tags).bit_length() - 1
+    search_range = 16 << entry_selector
+    directory = [struct.pack(
+        ">IHHHH",
+        0x00010000,
+        len(tags),
+        search_range,
+        entry_selector,
+        16 * len(tags) - search_range,
+    )]
+    body, offsets = [], {}
+    offset = 12 + 16 * len(tags)
+    for tag in tags:
+        data = tables[tag]
+        offsets[tag] = offset
+        directory.append(
+            struct.pack(">4sIII", tag, _checksum(data), offset, len(data))
+        )
+        body.append(data + bytes(-len(data) % 4))
+        offset += len(body[-1])
+    font = bytearray(b"".join(directory + body))
+    adjustment = (0xB1B0AFBA - _checksum(bytes(font))) & 0xFFFFFFFF
+    struct.pack_into(">I", font, offsets[b"head"] + 8, adjustment)
+    return bytes(font)
+
+
+@lru_cache(maxsize=None)
+def load_font(path):
+    return TrueTypeFont(path)
+
+
+class StreamingPDF:
+    """Пишет PDF по страницам: ``write_line`` отдаёт готовые куски байтов."""
+
+    CATALOG, PAGES, FONT, CID_FONT, DESCRIPTOR, FONT_FILE, TO_UNICODE = range(
+        1, 8
+    )
+
+    def __init__(self, font_path):
+        self.font_path = font_path
+        self.font = load_font(font_path)
+        self.offsets = {}
+        self.position = 0
+        self.next_object = self.TO_UNICODE + 1
+        self.page_ids = []
+        self.used_glyphs = {}
+        self.lines = []
+        self.lines_per_page = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+
+    def _object(self, number, body, stream=None):
+        self.offsets[number] = self.position
+        chunk = f"{number} 0 obj\n".encode() + body
+        if stream is not None:
+            chunk += b"\nstream\n" + stream + b"\nendstream"
+        chunk += b"\nendobj\n"
+        self.position += len(chunk)
+        return chunk
+
+    def _allocate(self):
+        number = self.next_object
+        self.next_object += 1
+        return number
+
+    def start(self):
+        header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self.position = len(header)
+        return header + self._object(
+            self.CATALOG,
+            f"<< /Type /Catalog /Pages {self.PAGES} 0 R >>".encode(),
+        )
+
+    def _encode(self, text):
+        glyphs = []
+        for char in text:
+            glyph = self.font.cmap.get(ord(char), 0)
+            self.used_glyphs[glyph] = char
+            glyphs.append(glyph)
+        return "".join(f"{glyph:04X}" for glyph in glyphs)
+
+    def _text_width(self, text):
+        return sum(
+            self.font.width(self.font.cmap.get(ord(char), 0)) for char in text
+        ) * FONT_SIZE / 1000
+
+    def _wrap(self, text):
+        max_width = PAGE_WIDTH - 2 * MARGIN
+        line = ""
+        for word in text.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if line and self._text_width(candidate) > max_width:
+                yield line
+                line = word
+            else:
+                line = candidate
+        yield line
+
+    def write_line(self, text=""):
+        """Добавляет строку; возвращает байты заполненных страниц."""
+        chunks = []
+        for line in self._wrap(text):
+            self.lines.append(self._encode(line))
+            if len(self.lines) >= self.lines_per_page:
+                chunks.append(self._flush_page())
+        return b"".join(chunks)
+
+    def _flush_page(self):
+        top = PAGE_HEIGHT - MARGIN - FONT_SIZE
+        content = [
+            f"BT /F1 {FONT_SIZE} Tf {LEADING} TL {MARGIN} {top} Td".encode()
+        ]
+        content.extend(f"<{line}> Tj T*".encode() for line in self.lines)
+        content.append(b"ET")
+        self.lines = []
+        stream = zlib.compress(b"\n".join(content))
+        content_id, page_id = self._allocate(), self._allocate()
+        self.page_ids.append(page_id)
+        return self._object(
+            content_id,
+            f"<< /Length {len(stream)} /Filter /FlateDecode >>".encode(),
+            stream,
+        ) + self._object(
+            page_id,
+            (
+                f"<< /Type /Page /Parent {self.PAGES} 0 R "
+                f"/MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                f"/Resources << /Font << /F1 {self.FONT} 0 R >> >> "
+                f"/Contents {content_id} 0 R >>"
+            ).encode(),
+        )
+
+    def _font_objects(self):
+        glyphs = sorted(self.used_glyphs)
+        widths = " ".join(
+            f"{glyph} [{self.font.width(glyph)}]" for glyph in glyphs
+        )
+        subset = self.font.subset(glyphs)
+        font_data = zlib.compress(subset)
+        # имя подмножества: шесть прописных букв и «+» (PDF 1.7, 9.6.4)
+        tag = "".join(
+            chr(ord("A") + byte % 26)
+            for byte in hashlib.md5(bytes(str(glyphs), "ascii")).digest()[:6]
+        )
+        to_unicode = "\n".join((
+            "/CIDInit /ProcSet findresource begin 12 dict begin begincmap",
+            "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) "
+            "/Supplement 0 >> def",
+            "/CMapName /Adobe-Identity-UCS def /CMapType 2 def",
+            "1 begincodespacerange <0000> <FFFF> endcodespacerange",
+            *(
+                f"{len(chunk)} beginbfchar\n"
+                + "\n".join(
+                    f"<{glyph:04X}> <{ord(self.used_glyphs[glyph]):04X}>"
+                    for glyph in chunk
+                )
+                + "\nendbfchar"
+                for chunk in (
+                    glyphs[start:start + 100]
+                    for start in range(0, len(glyphs), 100)
+                )
+            ),
+            "endcmap CMapName currentdict /CMap defineresource pop end end",
+        )).encode()
+        bbox = " ".join(str(value) for value in self.font.bbox)
+        return b"".join((
+            self._object(
+                self.FONT,
+                (
+                    "<< /Type /Font /Subtype /Type0 "
+                    f"/BaseFont /{tag}+Embedded "
+                    f"/Encoding /Identity-H /DescendantFonts "
+                    f"[{self.CID_FONT} 0 R] /ToUnicode {self.TO_UNICODE} 0 R >>"
+                ).encode(),
+            ),
+            self._object(
+                self.CID_FONT,
+                (
+                    "<< /Type /Font /Subtype /CIDFontType2 "
+                    f"/BaseFont /{tag}+Embedded "
+                    "/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) "
+                    f"/Supplement 0 >> /FontDescriptor {self.DESCRIPTOR} 0 R "
+                    f"/CIDToGIDMap /Identity /W [{widths}] >>"
+                ).encode(),
+            ),
+            self._object(
+                self.DESCRIPTOR,
+                (
+                    f"<< /Type /FontDescriptor /FontName /{tag}+Embedded "
+                    "/Flags 32 "
+                    f"/FontBBox [{bbox}] /ItalicAngle 0 "
+                    f"/Ascent {self.font.ascent} /Descent {self.font.descent} "
+                    f"/CapHeight {self.font.ascent} /StemV 80 "
+                    f"/FontFile2 {self.FONT_FILE} 0 R >>"
+                ).encode(),
+            ),
+            self._object(
+                self.FONT_FILE,
+                (
+                    f"<< /Length {len(font_data)} /Filter /FlateDecode "
+                    f"/Length1 {len(subset)} >>"
+                ).encode(),
+                font_data,
+            ),
+            self._object(
+                self.TO_UNICODE,
+                f"<< /Length {len(to_unicode)} >>".encode(),
+                to_unicode,
+            ),
+        ))
+
+    def finish(self):
+        """Дописывает последнюю страницу, шрифт, дерево страниц и xref."""
+        chunks = []
+        if self.lines or not self.page_ids:
+            chunks.append(self._flush_page())
+        chunks.append(self._font_objects())
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        chunks.append(self._object(
+            self.PAGES,
+            (
+                f"<< /Type /Pages /Kids [{kids}] "
+                f"/Count {len(self.page_ids)} >>"
+            ).encode(),
+        ))
+        xref_position = self.position
+        size = self.next_object
+        xref = [f"xref\n0 {size}\n0000000000 65535 f \n"]
+        xref.extend(
+            f"{self.offsets[number]:010d} 00000 n \n"
+            for number in range(1, size)
+        )
+        xref.append(
+            f"trailer\n<< /Size {size} /Root {self.CATALOG} 0 R >>\n"
+            f"startxref\n{xref_position}\n%%EOF\n"
+        )
+        chunks.append("".join(xref).encode())
+        return b"".join(chunks)
@@ -0,0 +1,196 @@
+"""Кэш ответов на анонимные GET-запросы списка и карточки рецепта.
+
+Ключ записи включает версию: общую версию списка или версию конкретного
+рецепта. При изменении рецепта, его ингредиентов, счётчиков популярности
+или профиля автора версии заменяются новыми (после коммита транзакции), и
+старые записи просто перестают читаться и истекают по таймауту. Анонимность
+определяется по отсутствию заголовка Authorization, поэтому попадание в
+кэш не требует ни одного SQL-запроса. Функции с префиксом a — то же для
+асинхронных представлений (api.async_views).
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+LIST_VERSION_KEY = "recipe-response:list-version"
+HITS_KEY = "recipe-response:hits"
+MISSES_KEY = "recipe-response:misses"
+# поля пользователя, которые попадают в ответы с рецептами
+AUTHOR_FIELDS = frozenset({
+    "username", "first_name", "last_name", "email", "avatar",
+    "avatar_renditions",
+})
+
+
+def _recipe_version_key(recipe_id):
+    return f"recipe-response:version:{recipe_id}"
+
+
+def is_cacheable(request):
+    return (
+        request.method == "GET"
+        and "HTTP_AUTHORIZATION" not in request.META
+        and request.accepted_renderer.format == "json"
+    )
+
+
+def _version(key):
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+async def _aversion(key):
+    version = await cache.aget(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not await cache.aadd(key, version, None):
+            version = await cache.aget(key, version)
+    return version
+
+
+def _normalized_query(request):
+    return "&".join(
+        f"{name}={value}"
+        for name, values in sorted(request.query_params.lists())
+        for value in sorted(values)
+    )
+
+
+def _list_hash(request):
+    return hashlib.sha256(
+        f"{request.build_absolute_uri('/')}?{_normalized_query(request)}"
+        .encode()
+    ).hexdigest()
+
+
+def _host_hash(request):
+    return hashlib.sha256(
+        request.build_absolute_uri("/").encode()
+    ).hexdigest()[:16]
+
+
+def list_key(request):
+    version = _version(LIST_VERSION_KEY)
+    return f"recipe-response:list:{version}:{_list_hash(request)}"
+
+
+async def alist_key(request):
+    version = await _aversion(LIST_VERSION_KEY)
+    return f"recipe-response:list:{version}:{_list_hash(request)}"
+
+
+def detail_key(request, recipe_id):
+    version = _version(_recipe_version_key(recipe_id))
+    return (
+        f"recipe-response:detail:{recipe_id}:{version}:{_host_hash(request)}"
+    )
+
+
+async def adetail_key(request, recipe_id):
+    version = await _aversion(_recipe_version_key(recipe_id))
+    return (
+        f"recipe-response:detail:{recipe_id}:{version}:{_host_hash(request)}"
+    )
+
+
+def _count(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+async def _acount(key):
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        if not await cache.aadd(key, 1, None):
+            await cache.aincr(key)
+
+
+def lookup(key):
+    data = cache.get(key)
+    _count(MISSES_KEY if data is None else HITS_KEY)
+    return data
+
+
+async def alookup(key):
+    data = await cache.aget(key)
+    await _acount(MISSES_KEY if data is None else HITS_KEY)
+    return data
+
+
+def store(key, data):
+    cache.set(key, data, settings.RECIPE_RESPONSE_CACHE_TIMEOUT)
+
+
+async def astore(key, data):
+    await cache.aset(key, data, settings.RECIPE_RESPONSE_CACHE_TIMEOUT)
+
+
+def stats():
+    counters = cache.get_many((HITS_KEY, MISSES_KEY))
+    return {
+        "hits": counters.get(HITS_KEY, 0),
+        "misses": counters.get(MISSES_KEY, 0),
+    }
+
+
+def bump(recipe_ids=()):
+    """Сбрасывает список и карточки рецептов после коммита транзакции."""
+    recipe_ids = list(recipe_ids)
+
+    def replace_versions():
+        cache.set_many(
+            {
+                key: uuid.uuid4().hex
+                for key in (
+                    LIST_VERSION_KEY,
+                    *map(_recipe_version_key, recipe_ids),
+                )
+            },
+            None,
+        )
+
+    transaction.on_commit(replace_versions)
+
+
+def on_recipe_changed(sender, instance, **kwargs):
+    bump([instance.pk])
+
+
+def on_recipe_ingredient_changed(sender, instance, **kwargs):
+    bump([instance.recipe_id])
+
+
+def on_counters_changed(sender, recipe_ids, **kwargs):
+    bump(recipe_ids)
+
+
+def on_ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        bump(instance.recipes.values_list("pk", flat=True))
+
+
+def on_author_saved(sender, instance, created, update_fields=None,
+                    **kwargs):
+    # вход обновляет только last_login: профиль в ответах не меняется
+    if created or (
+        update_fields is not None and not AUTHOR_FIELDS & set(update_fields)
+    ):
+        return
+    on_author_changed(sender, instance)
+
+
+def on_author_changed(sender, instance, **kwargs):
+    recipe_ids = list(instance.recipes.values_list("pk", flat=True))
+    if recipe_ids:
+        bump(recipe_ids)
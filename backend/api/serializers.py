@@ -1,18 +1,74 @@
+import json
+
 from djoser.serializers import (
     UserCreateSerializer as DjoserUserCreateSerializer,
     UserSerializer as DjoserUserSerializer,
 )
-from drf_extra_fields.fields import Base64ImageField
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Manager
 from rest_framework import serializers
 from rest_framework.exceptions import NotAuthenticated
+from rest_framework.utils import html
 
-from .constants import ERROR_MESSAGES, MAX_NAME_LENGTH, MIN_INGREDIENT_AMOUNT
-from recipes.models import Ingredient, Recipe, IngredientInRecipe
+from .constants import (
+    ERROR_MESSAGES,
+    MAX_BATCH_SIZE,
+    MAX_NAME_LENGTH,
+    MIN_INGREDIENT_AMOUNT,
+)
+from .fields import DeferredBase64ImageField, RenditionImageField
+from recipes import renditions, search, shopping_list
+from recipes.models import (
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingListItem,
+)
+from users.models import Follow
 
 UserModel = get_user_model()
 
 
+def load_subscriptions(context, author_ids):
+    """Загружает подписки текущего пользователя на авторов одним запросом.
+
+    Результат сохраняется в контексте сериализатора и переиспользуется
+    всеми вложенными UserDetailSerializer в рамках одного запроса.
+    """
+    request = context.get("request")
+    user = getattr(request, "user", None)
+    if not user or not user.is_authenticated:
+        return
+    subscriptions = context.setdefault("subscriptions", {})
+    missing_ids = set(author_ids) - subscriptions.keys()
+    if not missing_ids:
+        return
+    followed_ids = set(
+        Follow.objects.filter(user=user, author_id__in=missing_ids)
+        .values_list("author_id", flat=True)
+    )
+    subscriptions.update(
+        {author_id: author_id in followed_ids for author_id in missing_ids}
+    )
+
+
+class UserListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        users = list(data.all() if isinstance(data, Manager) else data)
+        load_subscriptions(self.context, (user.pk for user in users))
+        return super().to_representation(users)
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        recipes = list(data.all() if isinstance(data, Manager) else data)
+        load_subscriptions(
+            self.context, (recipe.author_id for recipe in recipes)
+        )
+        return super().to_representation(recipes)
+
+
 class UserCreateSerializer(DjoserUserCreateSerializer):
     first_name = serializers.CharField(required=True, max_length=MAX_NAME_LENGTH)
     last_name = serializers.CharField(required=True, max_length=MAX_NAME_LENGTH)
@@ -31,6 +87,7 @@ class UserCreateSerializer(DjoserUserCreateSerializer):
 
 class UserDetailSerializer(DjoserUserSerializer):
     is_subscribed = serializers.SerializerMethodField()
+    avatar = RenditionImageField("thumbnail")
 
     class Meta(DjoserUserSerializer.Meta):
         model = UserModel
@@ -44,6 +101,7 @@ class UserDetailSerializer(DjoserUserSerializer):
             "avatar",
         )
         read_only_fields = ("id", "is_subscribed", "avatar")
+        list_serializer_class = UserListSerializer
 
     def to_representation(self, user_instance):
         if not user_instance or getattr(user_instance, "is_anonymous", True):
@@ -59,7 +117,8 @@ class UserDetailSerializer(DjoserUserSerializer):
         if not user or not user.is_authenticated:
             return False
 
-        return obj.following.filter(user=user).exists()
+        load_subscriptions(self.context, [obj.pk])
+        return self.context["subscriptions"][obj.pk]
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -69,6 +128,18 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "name", "measurement_unit")
 
 
+class ShoppingListItemSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source="ingredient.id")
+    name = serializers.ReadOnlyField(source="ingredient.name")
+    measurement_unit = serializers.ReadOnlyField(
+        source="ingredient.measurement_unit"
+    )
+
+    class Meta:
+        model = ShoppingListItem
+        fields = ("id", "name", "measurement_unit", "amount")
+
+
 class IngredientAmountSerializer(serializers.Serializer):
     id = serializers.IntegerField()
     amount = serializers.IntegerField()
@@ -95,7 +166,7 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
 
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     ingredients = IngredientAmountSerializer(many=True)
-    image = Base64ImageField()
+    image = DeferredBase64ImageField()
 
     class Meta:
         model = Recipe
@@ -107,6 +178,19 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             "cooking_time",
         )
 
+    def to_internal_value(self, data):
+        # в multipart/form-data ингредиенты приходят JSON-строкой
+        ingredients = data.get("ingredients") if html.is_html_input(data) else None
+        if isinstance(ingredients, str):
+            try:
+                ingredients = json.loads(ingredients)
+            except ValueError:
+                raise serializers.ValidationError(
+                    {"ingredients": ["Ожидается JSON-массив ингредиентов."]}
+                )
+            data = {**data.dict(), "ingredients": ingredients}
+        return super().to_internal_value(data)
+
     def validate(self, data):
         required_fields = {"ingredients", "name", "text", "cooking_time", "image"}
         missing_fields = required_fields - set(self.initial_data.keys())
@@ -139,35 +223,89 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         if len(ids) != len(set(ids)):
             raise serializers.ValidationError("Ингредиенты не должны повторяться.")
 
+        found = Ingredient.objects.in_bulk(ids)
+        for ingredient_id in ids:
+            if ingredient_id not in found:
+                raise serializers.ValidationError(
+                    f"Ингредиент с id={ingredient_id} не найден."
+                )
         return ingredients
 
-    def _update_ingredients(self, recipe_instance, ingredients_list):
-        IngredientInRecipe.objects.filter(recipe=recipe_instance).delete()
-        objs_to_create = []
-        for item in ingredients_list:
-            try:
-                ingredient = Ingredient.objects.get(id=item["id"])
-            except Ingredient.DoesNotExist:
-                raise serializers.ValidationError(f"Ингредиент с id={item['id']} не найден.")
-            objs_to_create.append(
-                IngredientInRecipe(
-                    recipe=recipe_instance,
-                    ingredient=ingredient,
-                    amount=item["amount"]
+    def _update_ingredients(self, recipe_instance, ingredients_list, current=None):
+        """Приводит ингредиенты рецепта к переданным; True, если изменился их набор.
+
+        Текущие строки сравниваются с запросом, поэтому выполняются только
+        нужные вставки, изменения количества и удаления. Список покупок
+        пересчитывается, только если что-то изменилось.
+        """
+        if current is None:
+            current = {
+                amount.ingredient_id: amount
+                for amount in IngredientInRecipe.objects.filter(
+                    recipe=recipe_instance
                 )
-            )
-        IngredientInRecipe.objects.bulk_create(objs_to_create)
-
+            }
+        requested = {item["id"]: item["amount"] for item in ingredients_list}
+        to_delete = [
+            amount.pk
+            for ingredient_id, amount in current.items()
+            if ingredient_id not in requested
+        ]
+        to_update, to_create = [], []
+        for ingredient_id, value in requested.items():
+            amount = current.get(ingredient_id)
+            if amount is None:
+                to_create.append(
+                    IngredientInRecipe(
+                        recipe=recipe_instance,
+                        ingredient_id=ingredient_id,
+                        amount=value,
+                    )
+                )
+            elif amount.amount != value:
+                amount.amount = value
+                to_update.append(amount)
+        if not (to_delete or to_update or to_create):
+            return False
+        # новый рецепт ещё ни у кого не в корзине; у существующего вклад
+        # вычитается по старым строкам и прибавляется по новым
+        in_carts = self.instance is not None
+        if in_carts:
+            shopping_list.remove_recipe(recipe_instance.pk)
+        if to_delete:
+            IngredientInRecipe.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            IngredientInRecipe.objects.bulk_update(to_update, ["amount"])
+        if to_create:
+            IngredientInRecipe.objects.bulk_create(to_create)
+        if in_carts:
+            shopping_list.add_recipe(recipe_instance.pk)
+        return bool(to_delete or to_create)
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop("ingredients")
         recipe = Recipe.objects.create(**validated_data)
-        self._update_ingredients(recipe, ingredients_data)
+        self._update_ingredients(recipe, ingredients_data, current={})
+        search.update_search_vector([recipe.pk])
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop("ingredients")
+        if "image" in validated_data:
+            renditions.discard(instance.image)
+        text_changed = any(
+            getattr(instance, field) != validated_data[field]
+            for field in ("name", "text")
+            if field in validated_data
+        )
         instance = super().update(instance, validated_data)
-        self._update_ingredients(instance, ingredients_data)
+        if (
+            self._update_ingredients(instance, ingredients_data)
+            or text_changed
+        ):
+            search.update_search_vector([instance.pk])
         return instance
     
 
@@ -176,7 +314,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     ingredients = IngredientInRecipeSerializer(many=True, source="ingredient_amounts", read_only=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
-    image = Base64ImageField(read_only=True)
+    image = RenditionImageField("full", list_size="card")
 
     class Meta:
         model = Recipe
@@ -192,32 +330,49 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             "cooking_time",
         )
         read_only_fields = fields
+        list_serializer_class = RecipeListSerializer
 
-    def get_is_favorited(self, recipe_obj):
+    def _get_user_flag(self, recipe_obj, annotation, related_name):
         request = self.context.get("request")
         user = getattr(request, "user", None)
         if not user or user.is_anonymous:
             return False
-        return recipe_obj.favorited_by.filter(user=user).exists()
+        # RecipeViewSet аннотирует флаги через Exists, запрос нужен
+        # только для экземпляров, полученных в обход get_queryset().
+        flag = getattr(recipe_obj, annotation, None)
+        if flag is not None:
+            return flag
+        return getattr(recipe_obj, related_name).filter(user=user).exists()
+
+    def get_is_favorited(self, recipe_obj):
+        return self._get_user_flag(recipe_obj, "is_favorited", "favorited_by")
 
     def get_is_in_shopping_cart(self, recipe_obj):
-        request = self.context.get("request")
-        user = getattr(request, "user", None)
-        if not user or user.is_anonymous:
-            return False
-        return recipe_obj.in_shopping_carts_of.filter(user=user).exists()
+        return self._get_user_flag(
+            recipe_obj, "is_in_shopping_cart", "in_shopping_carts_of"
+        )
 
 
 class RecipeShortSerializer(serializers.ModelSerializer):
+    image = RenditionImageField("thumbnail")
+
     class Meta:
         model = Recipe
         fields = ("id", "name", "image", "cooking_time")
         read_only_fields = ("id", "name", "image", "cooking_time")
 
 
+def get_recipes_limit(request):
+    try:
+        recipes_limit = int(request.query_params.get("recipes_limit"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    return recipes_limit if recipes_limit >= 0 else None
+
+
 class UserWithRecipesSerializer(UserDetailSerializer):
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.IntegerField(source="recipes.count", read_only=True)
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(UserDetailSerializer.Meta):
         fields = UserDetailSerializer.Meta.fields + ("recipes", "recipes_count")
@@ -227,22 +382,17 @@ class UserWithRecipesSerializer(UserDetailSerializer):
         )
 
     def get_recipes(self, obj):
-        request = self.context.get("request")
-        recipes_limit = None
-        if request:
-            try:
-                recipes_limit = int(request.query_params.get("recipes_limit"))
-            except (TypeError, ValueError):
-                pass
-
-        recipes_qs = obj.recipes.all()
-        if recipes_limit is not None:
-            recipes_qs = recipes_qs[:recipes_limit]
+        recipes_qs = getattr(obj, "recipes_preview", None)
+        if recipes_qs is None:
+            recipes_limit = get_recipes_limit(self.context.get("request"))
+            recipes_qs = obj.recipes.all()
+            if recipes_limit is not None:
+                recipes_qs = recipes_qs[:recipes_limit]
         return RecipeShortSerializer(recipes_qs, many=True, context=self.context).data
 
 
 class AvatarUploadSerializer(serializers.Serializer):
-    avatar = Base64ImageField(required=True)
+    avatar = DeferredBase64ImageField(required=True)
 
     class Meta:
         fields = ("avatar",)
@@ -260,3 +410,19 @@ class RecipeShortLinkSerializer(serializers.Serializer):
 
     class Meta:
         fields = ("short_link",)
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BATCH_SIZE,
+    )
+
+
+class AuthorIdsSerializer(serializers.Serializer):
+    authors = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BATCH_SIZE,
+    )
@@ -0,0 +1,166 @@
+"""Потоковая выгрузка списка покупок в txt, csv, json и pdf.
+
+Продукты и рецепты корзины выбираются одним запросом (UNION ALL
+агрегата ShoppingListItem и рецептов) и читаются курсором по частям,
+а файл формируется и отдаётся клиенту по мере чтения строк.
+"""
+import csv
+import io
+import json
+
+from django.conf import settings
+from django.db.models import CharField, F, IntegerField, Value
+from django.utils import timezone
+
+from recipes.models import Recipe, ShoppingListItem
+from .pdf import StreamingPDF
+
+INGREDIENT_ROW, RECIPE_ROW = 0, 1
+CURSOR_CHUNK_SIZE = 2000
+OUTPUT_CHUNK_SIZE = 16 * 1024
+NO_TEXT = Value(None, output_field=CharField())
+NO_NUMBER = Value(None, output_field=IntegerField())
+
+
+def shopping_list_rows(user):
+    """Строки списка: сначала суммы ингредиентов, затем рецепты корзины.
+
+    У ингредиентов заполнены ``product``, ``unit`` и ``total``, у рецептов —
+    ``title`` и ``username`` автора; остальные поля строки равны None.
+    """
+    totals = (
+        ShoppingListItem.objects.filter(user=user)
+        .values(
+            kind=Value(INGREDIENT_ROW),
+            product=F("ingredient__name"),
+            unit=F("ingredient__measurement_unit"),
+            total=F("amount"),
+            title=NO_TEXT,
+            username=NO_TEXT,
+        )
+        .order_by()
+    )
+    recipes = (
+        Recipe.objects.filter(in_shopping_carts_of__user=user)
+        .values(
+            kind=Value(RECIPE_ROW),
+            product=NO_TEXT,
+            unit=NO_TEXT,
+            total=NO_NUMBER,
+            title=F("name"),
+            username=F("author__username"),
+        )
+        .order_by()
+    )
+    return (
+        totals.union(recipes, all=True)
+        .order_by("kind", "product", "title")
+        .iterator(chunk_size=CURSOR_CHUNK_SIZE)
+    )
+
+
+def _sections(rows):
+    ingredients = recipes = 0
+    for row in rows:
+        if row["kind"] == INGREDIENT_ROW:
+            ingredients += 1
+            yield INGREDIENT_ROW, ingredients, row
+        else:
+            recipes += 1
+            yield RECIPE_ROW, recipes, row
+
+
+def _text_lines(rows):
+    yield f"Список покупок Foodgram на {timezone.localdate():%d.%m.%Y}:"
+    yield ""
+    yield "Продукты:"
+    for kind, number, row in _sections(rows):
+        if kind == INGREDIENT_ROW:
+            yield (
+                f"{number}. {row['product'].capitalize()} "
+                f"({row['unit']}) — {row['total']}"
+            )
+            continue
+        if number == 1:
+            yield ""
+            yield "Рецепты, для которых нужны эти продукты:"
+        yield f"{number}. {row['title']} — @{row['username']}"
+
+
+def render_txt(rows):
+    for line in _text_lines(rows):
+        yield f"{line}\n"
+
+
+def render_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    yield "\ufeff"
+    writer.writerow(("№", "Продукт", "Единица измерения", "Количество"))
+    for kind, number, row in _sections(rows):
+        if kind == INGREDIENT_ROW:
+            writer.writerow(
+                (number, row["product"], row["unit"], row["total"])
+            )
+        else:
+            if number == 1:
+                writer.writerow(())
+                writer.writerow(("№", "Рецепт", "Автор"))
+            writer.writerow((number, row["title"], row["username"]))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def render_json(rows):
+    yield f'{{"date": "{timezone.localdate().isoformat()}", "ingredients": ['
+    section = INGREDIENT_ROW
+    for kind, number, row in _sections(rows):
+        if kind != section:
+            section = kind
+            yield '], "recipes": ['
+        if kind == INGREDIENT_ROW:
+            item = {
+                "name": row["product"],
+                "measurement_unit": row["unit"],
+                "amount": row["total"],
+            }
+        else:
+            item = {"name": row["title"], "author": row["username"]}
+        yield ("" if number == 1 else ", ") + json.dumps(
+            item, ensure_ascii=False
+        )
+    if section == INGREDIENT_ROW:
+        yield '], "recipes": ['
+    yield "]}"
+
+
+def render_pdf(rows):
+    document = StreamingPDF(settings.PDF_FONT_PATH)
+    yield document.start()
+    for line in _text_lines(rows):
+        yield document.write_line(line)
+    yield document.finish()
+
+
+def buffered(chunks, size=OUTPUT_CHUNK_SIZE):
+    """Склеивает мелкие куски, чтобы не писать в сокет по строке."""
+    parts, length = [], 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        parts.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b"".join(parts)
+            parts, length = [], 0
+    if parts:
+        yield b"".join(parts)
+
+
+EXPORT_FORMATS = {
+    "txt": ("text/plain; charset=utf-8", render_txt),
+    "csv": ("text/csv; charset=utf-8", render_csv),
+    "json": ("application/json; charset=utf-8", render_json),
+    "pdf": ("application/pdf", render_pdf),
+}
@@ -0,0 +1,82 @@
+"""Общие данные тестов: пользователи, ингредиенты и рецепты."""
+import shutil
+import tempfile
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+from users.models import User
+
+PASSWORD = "Pa55word!"
+# PNG 1×1
+IMAGE = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA"
+    "DUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+INGREDIENTS = (
+    ("water", "вода", "мл"),
+    ("salt", "соль", "г"),
+    ("flour", "мука", "г"),
+    ("dill", "укроп", "г"),
+)
+
+
+def create_user(username, **fields):
+    return User.objects.create_user(
+        email=f"{username}@example.com",
+        username=username,
+        password=PASSWORD,
+        **{"first_name": "Имя", "last_name": "Фамилия", **fields},
+    )
+
+
+def create_recipe(author, name, amounts=(), **fields):
+    """Рецепт без обработки изображения; amounts — {ингредиент: кол-во}."""
+    recipe = Recipe.objects.create(
+        author=author,
+        name=name,
+        **{
+            "text": "Приготовить",
+            "cooking_time": 10,
+            "image": "recipes/images/dish.png",
+            **fields,
+        },
+    )
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(recipe=recipe, ingredient=ingredient, amount=amount)
+        for ingredient, amount in dict(amounts).items()
+    )
+    return recipe
+
+
+class FoodgramTestCase(TestCase):
+    """Читатель ``user`` с клиентом ``client``, автор ``author`` и
+    ингредиенты ``water``, ``salt``, ``flour`` и ``dill``.
+
+    Загруженные файлы пишутся во временный MEDIA_ROOT.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        cls.addClassCleanup(media.disable)
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user("reader")
+        cls.author = create_user("author")
+        for attribute, name, unit in INGREDIENTS:
+            setattr(
+                cls,
+                attribute,
+                Ingredient.objects.create(name=name, measurement_unit=unit),
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
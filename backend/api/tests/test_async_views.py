@@ -0,0 +1,151 @@
+from django.core.cache import cache
+from django.test import AsyncClient, override_settings
+from django.urls import include, path
+from rest_framework.authtoken.models import Token
+
+from api import async_views
+from api.async_views import async_read
+from api.urls import router_view
+from recipes.models import Favorite
+from users.models import Follow
+from .base import IMAGE, FoodgramTestCase, create_recipe
+
+# маршруты api.urls при ASYNC_READ_VIEWS; синхронные — под /sync/
+urlpatterns = [
+    path(
+        "api/ingredients/",
+        async_read(router_view("ingredient-list"))(
+            async_views.ingredient_list
+        ),
+    ),
+    path(
+        "api/recipes/",
+        async_read(router_view("recipe-list"))(async_views.recipe_list),
+    ),
+    path(
+        "api/recipes/<int:pk>/",
+        async_read(router_view("recipe-detail"))(async_views.recipe_detail),
+    ),
+    path(
+        "api/users/subscriptions/",
+        async_read(router_view("user-subscription-get-user-subscriptions"))(
+            async_views.subscriptions
+        ),
+    ),
+    path("sync/", include("configs_files.urls")),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewsTests(FoodgramTestCase):
+    """Асинхронные читающие эндпоинты (api.async_views)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.soup = create_recipe(cls.author, "Суп", {cls.water: 500})
+        cls.bread = create_recipe(cls.user, "Хлеб", {cls.flour: 300})
+        Favorite.objects.create(user=cls.user, recipe=cls.soup)
+        Follow.objects.create(user=cls.user, author=cls.author)
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.async_client = AsyncClient()
+        self.auth = {"Authorization": f"Token {self.token.key}"}
+
+    async def test_list_matches_sync_view(self):
+        for headers in ({}, self.auth):
+            with self.subTest(authenticated=bool(headers)):
+                response = await self.async_client.get(
+                    "/api/recipes/", headers=headers
+                )
+                self.assertEqual(response.status_code, 200)
+                expected = await self.async_client.get(
+                    "/sync/api/recipes/", headers=headers
+                )
+                self.assertEqual(
+                    response.json()["results"],
+                    expected.json()["results"],
+                )
+        favorited = {
+            recipe["id"]: recipe["is_favorited"]
+            for recipe in response.json()["results"]
+        }
+        self.assertEqual(
+            favorited, {self.soup.pk: True, self.bread.pk: False}
+        )
+
+    async def test_anonymous_list_cached(self):
+        first = await self.async_client.get("/api/recipes/")
+        second = await self.async_client.get("/api/recipes/")
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(first.content, second.content)
+
+    async def test_list_filtered_by_author(self):
+        response = await self.async_client.get(
+            "/api/recipes/", {"author": self.author.pk}, headers=self.auth
+        )
+        self.assertEqual(
+            [recipe["id"] for recipe in response.json()["results"]],
+            [self.soup.pk],
+        )
+
+    async def test_detail(self):
+        response = await self.async_client.get(
+            f"/api/recipes/{self.soup.pk}/", headers=self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["name"], "Суп")
+        self.assertTrue(response.json()["author"]["is_subscribed"])
+        missing = await self.async_client.get("/api/recipes/0/")
+        self.assertEqual(missing.status_code, 404)
+        self.assertIn("detail", missing.json())
+
+    async def test_invalid_token(self):
+        response = await self.async_client.get(
+            "/api/recipes/", headers={"Authorization": "Token invalid"}
+        )
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response["WWW-Authenticate"], "Token")
+
+    async def test_subscriptions(self):
+        anonymous = await self.async_client.get("/api/users/subscriptions/")
+        self.assertEqual(anonymous.status_code, 401)
+        response = await self.async_client.get(
+            "/api/users/subscriptions/", headers=self.auth
+        )
+        self.assertEqual(response.status_code, 200)
+        (author,) = response.json()["results"]
+        self.assertEqual(author["id"], self.author.pk)
+        self.assertEqual(
+            [recipe["id"] for recipe in author["recipes"]], [self.soup.pk]
+        )
+
+    async def test_ingredient_search(self):
+        response = await self.async_client.get(
+            "/api/ingredients/", {"name": "му"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [ingredient["id"] for ingredient in response.json()],
+            [self.flour.pk],
+        )
+
+    async def test_post_handled_by_sync_view(self):
+        response = await self.async_client.post(
+            "/api/recipes/",
+            {
+                "ingredients": [{"id": self.water.pk, "amount": 100}],
+                "name": "Чай",
+                "image": IMAGE,
+                "text": "Заварить",
+                "cooking_time": 5,
+            },
+            content_type="application/json",
+            headers=self.auth,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["name"], "Чай")
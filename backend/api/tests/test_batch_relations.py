@@ -0,0 +1,168 @@
+from recipes import shopping_list
+from recipes.models import Favorite, ShoppingCart, ShoppingListItem
+from users.models import Follow
+from .base import FoodgramTestCase, create_recipe, create_user
+
+MISSING_ID = 10 ** 9
+
+
+class BatchRelationTests(FoodgramTestCase):
+    """Пакетное добавление в избранное, корзину и подписки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.soup = create_recipe(
+            cls.author, "Суп", {cls.water: 500, cls.salt: 5}
+        )
+        cls.bread = create_recipe(
+            cls.author, "Хлеб", {cls.water: 200, cls.flour: 300}
+        )
+
+    def batch(self, method, url, ids, field="recipes"):
+        response = getattr(self.client, method)(
+            url, {field: ids}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        return [
+            (item["id"], item["status"]) for item in response.data["results"]
+        ]
+
+    def counters(self, recipe):
+        recipe.refresh_from_db()
+        return recipe.favorites_count, recipe.in_carts_count
+
+    def cart_totals(self):
+        return dict(
+            ShoppingListItem.objects.filter(user=self.user)
+            .values_list("ingredient", "amount")
+        )
+
+    def assert_cart_totals(self, expected):
+        self.assertEqual(self.cart_totals(), expected)
+        self.assertEqual(
+            {
+                row["ingredient"]: row["total"]
+                for row in shopping_list.live_totals()
+                if row["recipe__in_shopping_carts_of__user"] == self.user.pk
+            },
+            expected,
+        )
+
+    def test_duplicate_in_batch(self):
+        ids = [self.soup.pk, self.soup.pk]
+        self.assertEqual(
+            self.batch("post", "/api/recipes/favorite/", ids),
+            [(self.soup.pk, "added")],
+        )
+        self.assertEqual(Favorite.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(self.counters(self.soup), (1, 0))
+        self.assertEqual(
+            self.batch("delete", "/api/recipes/favorite/", ids),
+            [(self.soup.pk, "removed")],
+        )
+        self.assertEqual(self.counters(self.soup), (0, 0))
+
+    def test_existing_and_missing_ids(self):
+        ids = [MISSING_ID, self.soup.pk]
+        self.assertEqual(
+            self.batch("post", "/api/recipes/favorite/", ids),
+            [(MISSING_ID, "not_found"), (self.soup.pk, "added")],
+        )
+        self.assertEqual(
+            self.batch("delete", "/api/recipes/favorite/", ids),
+            [(MISSING_ID, "missing"), (self.soup.pk, "removed")],
+        )
+        self.assertFalse(Favorite.objects.filter(user=self.user).exists())
+
+    def test_related_and_new_recipes(self):
+        Favorite.objects.create(user=self.user, recipe=self.soup)
+        self.assertEqual(
+            self.batch(
+                "post", "/api/recipes/favorite/", [self.soup.pk, self.bread.pk]
+            ),
+            [(self.soup.pk, "exists"), (self.bread.pk, "added")],
+        )
+        self.assertEqual(self.counters(self.soup), (1, 0))
+        self.assertEqual(self.counters(self.bread), (1, 0))
+        self.assertEqual(
+            self.batch(
+                "delete", "/api/recipes/favorite/",
+                [self.bread.pk, self.bread.pk],
+            ),
+            [(self.bread.pk, "removed")],
+        )
+        self.assertEqual(
+            set(
+                Favorite.objects.filter(user=self.user)
+                .values_list("recipe", flat=True)
+            ),
+            {self.soup.pk},
+        )
+
+    def test_shopping_cart_totals(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.soup)
+        self.assert_cart_totals({self.water.pk: 500, self.salt.pk: 5})
+        self.assertEqual(
+            self.batch(
+                "post", "/api/recipes/shopping_cart/",
+                [self.soup.pk, self.bread.pk, self.bread.pk, MISSING_ID],
+            ),
+            [
+                (self.soup.pk, "exists"),
+                (self.bread.pk, "added"),
+                (MISSING_ID, "not_found"),
+            ],
+        )
+        self.assert_cart_totals(
+            {self.water.pk: 700, self.salt.pk: 5, self.flour.pk: 300}
+        )
+        self.assertEqual(self.counters(self.soup), (0, 1))
+        self.assertEqual(self.counters(self.bread), (0, 1))
+        self.assertEqual(
+            self.batch(
+                "delete", "/api/recipes/shopping_cart/",
+                [self.soup.pk, MISSING_ID],
+            ),
+            [(self.soup.pk, "removed"), (MISSING_ID, "missing")],
+        )
+        self.assert_cart_totals({self.water.pk: 200, self.flour.pk: 300})
+        self.assertEqual(self.counters(self.soup), (0, 0))
+        self.assertEqual(
+            self.batch(
+                "delete", "/api/recipes/shopping_cart/", [self.bread.pk]
+            ),
+            [(self.bread.pk, "removed")],
+        )
+        self.assert_cart_totals({})
+
+    def test_subscribe_batch(self):
+        other = create_user("other")
+        Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(
+            self.batch(
+                "post", "/api/users/subscribe/",
+                [self.author.pk, other.pk, other.pk, self.user.pk, MISSING_ID],
+                field="authors",
+            ),
+            [
+                (self.author.pk, "exists"),
+                (other.pk, "added"),
+                (self.user.pk, "not_found"),
+                (MISSING_ID, "not_found"),
+            ],
+        )
+        self.assertEqual(
+            self.batch(
+                "delete", "/api/users/subscribe/",
+                [other.pk, MISSING_ID], field="authors",
+            ),
+            [(other.pk, "removed"), (MISSING_ID, "missing")],
+        )
+        self.assertEqual(
+            list(
+                Follow.objects.filter(user=self.user)
+                .values_list("author", flat=True)
+            ),
+            [self.author.pk],
+        )
@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import Follow
+from .base import FoodgramTestCase, create_recipe, create_user
+
+URL = "/api/recipes/feed/"
+
+
+class FeedTests(FoodgramTestCase):
+    """Лента рецептов авторов из подписок."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.cook = create_user("cook")
+        stranger = create_user("stranger")
+        now = timezone.now()
+        recipes = []
+        for age, author, name in (
+            (1, cls.author, "Суп"),
+            (2, cls.cook, "Хлеб"),
+            (3, stranger, "Чай"),
+            (4, cls.author, "Пирог"),
+            (4, cls.cook, "Каша"),
+        ):
+            recipe = create_recipe(author, name)
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=now - timedelta(hours=age)
+            )
+            recipes.append(recipe)
+        cls.soup, cls.bread, _, cls.pie, cls.porridge = recipes
+        for author in (cls.author, cls.cook):
+            Follow.objects.create(user=cls.user, author=author)
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [recipe["id"] for recipe in response.data["results"]]
+
+    def test_followed_authors_newest_first(self):
+        self.assertEqual(
+            self.ids(self.client.get(URL)),
+            # одинаковое время публикации — по возрастанию id
+            [self.soup.pk, self.bread.pk, self.pie.pk, self.porridge.pk],
+        )
+
+    def test_cursor_pages(self):
+        response = self.client.get(URL, {"limit": 3})
+        self.assertEqual(
+            self.ids(response), [self.soup.pk, self.bread.pk, self.pie.pk]
+        )
+        self.assertIsNone(response.data["previous"])
+        response = self.client.get(response.data["next"])
+        self.assertEqual(self.ids(response), [self.porridge.pk])
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(
+            self.ids(self.client.get(response.data["previous"])),
+            [self.soup.pk, self.bread.pk, self.pie.pk],
+        )
+
+    def test_without_follows(self):
+        Follow.objects.filter(user=self.user).delete()
+        self.assertEqual(self.ids(self.client.get(URL)), [])
+
+    def test_anonymous(self):
+        self.assertEqual(APIClient().get(URL).status_code, 401)
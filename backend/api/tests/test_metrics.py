@@ -0,0 +1,105 @@
+import re
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from api import metrics
+from .base import FoodgramTestCase, create_recipe
+
+LIST_LABELS = ("RecipeViewSet", "list")
+
+
+class HistogramTests(SimpleTestCase):
+    def test_observe(self):
+        histogram = metrics.Histogram((1, 5))
+        for value in (0, 1, 3, 7):
+            histogram.observe(value)
+        # корзина le=1 включает границу, последняя — +Inf
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.sum, 11)
+        self.assertEqual(
+            list(metrics._histogram_lines("m", "V", "a", histogram)),
+            [
+                'm_bucket{view="V",action="a",le="1"} 2',
+                'm_bucket{view="V",action="a",le="5"} 3',
+                'm_bucket{view="V",action="a",le="+Inf"} 4',
+                'm_sum{view="V",action="a"} 11',
+                'm_count{view="V",action="a"} 4',
+            ],
+        )
+
+
+class RequestMetricsTests(FoodgramTestCase):
+    """Server-Timing, гистограммы /metrics и лог медленных запросов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        create_recipe(cls.author, "Суп", {cls.water: 500})
+
+    def setUp(self):
+        super().setUp()
+        # без заголовка Authorization список отдаётся из кэша ответов
+        cache.clear()
+
+    def requests_total(self, labels, status=200):
+        return metrics.registry.requests[(*labels, "GET", status)]
+
+    def test_server_timing(self):
+        response = self.client.get("/api/recipes/")
+        self.assertEqual(response.status_code, 200)
+        match = re.fullmatch(
+            r'db;desc="SQL x(\d+)";dur=[\d.]+, app;dur=[\d.]+, '
+            r"render;dur=[\d.]+, total;dur=[\d.]+",
+            response["Server-Timing"],
+        )
+        self.assertIsNotNone(match)
+        self.assertGreater(int(match[1]), 0)
+
+    def test_requests_counted_by_view_and_action(self):
+        before = self.requests_total(LIST_LABELS)
+        unresolved = self.requests_total(metrics.UNRESOLVED, 404)
+        self.client.get("/api/recipes/")
+        self.client.get("/api/no-such-page/")
+        self.assertEqual(self.requests_total(LIST_LABELS), before + 1)
+        self.assertEqual(
+            self.requests_total(metrics.UNRESOLVED, 404), unresolved + 1
+        )
+
+    def test_metrics_output(self):
+        self.client.get("/api/recipes/")
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        labels = 'view="RecipeViewSet",action="list"'
+        self.assertIn(
+            "foodgram_http_requests_total{"
+            f'{labels},method="GET",status="200"}} '
+            f"{self.requests_total(LIST_LABELS)}",
+            body,
+        )
+        for name in metrics.HISTOGRAMS:
+            self.assertIn(f"# TYPE {name} histogram", body)
+            count = re.search(
+                rf"^{name}_count{{{labels}}} (\d+)$", body, re.MULTILINE
+            )
+            infinity = re.search(
+                rf'^{name}_bucket{{{labels},le="\+Inf"}} (\d+)$',
+                body,
+                re.MULTILINE,
+            )
+            self.assertEqual(count[1], infinity[1])
+        self.assertIn("foodgram_recipe_response_cache_hits_total", body)
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_SAMPLE_RATE=1)
+    def test_slow_queries_logged_without_params(self):
+        with self.assertLogs("api.metrics", "WARNING") as logs:
+            self.client.get("/api/recipes/", {"name": "секретный"})
+        self.assertTrue(logs.output)
+        self.assertTrue(
+            all("RecipeViewSet.list" in line for line in logs.output)
+        )
+        self.assertFalse(
+            any("секретный" in line for line in logs.output)
+        )
@@ -0,0 +1,58 @@
+from recipes.models import Recipe
+from .base import FoodgramTestCase, create_recipe
+
+PAGE_LIMIT = 3
+
+
+class RecipeOrderingTests(FoodgramTestCase):
+    """Сортировка ?ordering= с повторяющимися значениями."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for number in range(8):
+            create_recipe(cls.author, "Суп" if number % 2 else "Борщ")
+        # у половины рецептов одинаковое число добавлений в избранное
+        Recipe.objects.filter(
+            pk__in=Recipe.objects.order_by("pk").values("pk")[:4]
+        ).update(favorites_count=2)
+
+    def pages(self, ordering):
+        ids = []
+        for page in range(1, 4):
+            response = self.client.get(
+                "/api/recipes/",
+                {"ordering": ordering, "limit": PAGE_LIMIT, "page": page},
+            )
+            self.assertEqual(response.status_code, 200)
+            ids.extend(recipe["id"] for recipe in response.data["results"])
+        return ids
+
+    def test_ties_broken_by_id(self):
+        recipes = list(Recipe.objects.values_list("pk", "favorites_count"))
+        for ordering, expected in (
+            (
+                "-favorites_count",
+                sorted(recipes, key=lambda row: (-row[1], -row[0])),
+            ),
+            (
+                "favorites_count",
+                sorted(recipes, key=lambda row: (row[1], row[0])),
+            ),
+        ):
+            with self.subTest(ordering=ordering):
+                self.assertEqual(
+                    self.pages(ordering), [pk for pk, _ in expected]
+                )
+
+    def test_pages_stable(self):
+        ids = self.pages("name")
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(ids, self.pages("name"))
+        self.assertEqual(
+            ids,
+            list(
+                Recipe.objects.order_by("name", "id")
+                .values_list("pk", flat=True)
+            ),
+        )
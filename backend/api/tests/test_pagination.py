@@ -0,0 +1,123 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from api.pagination import ApproximateCountPaginator
+from users.models import Follow
+from .base import FoodgramTestCase, create_recipe
+
+
+class CursorPaginationTests(FoodgramTestCase):
+    """Курсорная пагинация и параметры сортировки и поиска."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for name in ("Борщ", "Суп грибной", "Арбузный салат"):
+            create_recipe(cls.author, name)
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_cursor_pages_by_pub_date(self):
+        response = self.client.get("/api/recipes/", {"cursor": ""})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("count", response.data)
+        self.assertEqual(
+            [recipe["name"] for recipe in response.data["results"]],
+            ["Арбузный салат", "Суп грибной", "Борщ"],
+        )
+
+    def test_cursor_with_ordering_rejected(self):
+        response = self.client.get(
+            "/api/recipes/", {"cursor": "", "ordering": "name"}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("ordering", str(response.data["errors"]))
+
+    def test_cursor_with_search_rejected(self):
+        response = APIClient().get(
+            "/api/recipes/", {"cursor": "", "search": "суп"}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("search", str(response.data["errors"]))
+
+    def test_ordering_and_search_without_cursor(self):
+        response = self.client.get(
+            "/api/recipes/", {"ordering": "name", "search": "с"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe["name"] for recipe in response.data["results"]],
+            ["Арбузный салат", "Суп грибной"],
+        )
+
+    def test_subscriptions_cursor(self):
+        response = self.client.get(
+            "/api/users/subscriptions/", {"cursor": ""}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 1)
+
+
+@override_settings(APPROXIMATE_COUNT_THRESHOLD=3)
+class ApproximateCountTests(FoodgramTestCase):
+    """Приблизительное число рецептов выше порога точного подсчёта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for number in range(5):
+            create_recipe(cls.author, f"Рецепт {number}")
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def page(self, number, **params):
+        return self.client.get(
+            "/api/recipes/", {"limit": 2, "page": number, **params}
+        )
+
+    def test_exact_count_below_threshold(self):
+        with override_settings(APPROXIMATE_COUNT_THRESHOLD=10):
+            response = self.page(1)
+        self.assertEqual(response.data["count"], 5)
+        self.assertFalse(response.data["count_is_approximate"])
+
+    @mock.patch.object(
+        ApproximateCountPaginator, "_table_estimate", return_value=1000
+    )
+    def test_table_estimate_without_filters(self, table_estimate):
+        response = self.page(1)
+        self.assertEqual(response.data["count"], 1000)
+        self.assertTrue(response.data["count_is_approximate"])
+        self.assertIsNotNone(response.data["next"])
+        # следующая страница определяется по лишней строке, а не по оценке
+        last = self.page(3)
+        self.assertEqual(len(last.data["results"]), 1)
+        self.assertIsNone(last.data["next"])
+        self.assertEqual(self.page(4).status_code, 404)
+
+    def test_filtered_count_cached(self):
+        response = self.page(1, author=self.author.pk)
+        self.assertEqual(response.data["count"], 5)
+        self.assertTrue(response.data["count_is_approximate"])
+        create_recipe(self.author, "Рецепт 5")
+        response = self.page(1, author=self.author.pk)
+        self.assertEqual(response.data["count"], 5)
+        cache.clear()
+        response = self.page(1, author=self.author.pk)
+        self.assertEqual(response.data["count"], 6)
+
+    def test_estimate_below_bounded_count(self):
+        with mock.patch.object(
+            ApproximateCountPaginator, "_table_estimate", return_value=0
+        ):
+            response = self.page(1)
+        # устаревшая оценка не меньше числа уже найденных строк
+        self.assertEqual(response.data["count"], 4)
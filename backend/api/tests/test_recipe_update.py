@@ -0,0 +1,107 @@
+from recipes.models import (
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+)
+from .base import IMAGE, FoodgramTestCase, create_recipe, create_user
+
+
+class RecipeIngredientsUpdateTests(FoodgramTestCase):
+    """Изменение ингредиентов рецепта, который в корзине у другого."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.buyer = create_user("buyer")
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.author)
+        response = self.client.post(
+            "/api/recipes/",
+            self.payload({self.water: 500, self.salt: 5}),
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.recipe = Recipe.objects.get(pk=response.data["id"])
+        # другой рецепт в той же корзине: суммы по воде складываются
+        tea = create_recipe(self.author, "Чай", {self.water: 200})
+        for recipe in (self.recipe, tea):
+            ShoppingCart.objects.create(user=self.buyer, recipe=recipe)
+        self.rows = self.ingredient_rows()
+
+    def payload(self, amounts):
+        return {
+            "ingredients": [
+                {"id": ingredient.pk, "amount": amount}
+                for ingredient, amount in amounts.items()
+            ],
+            "name": "Суп",
+            "image": IMAGE,
+            "text": "Сварить",
+            "cooking_time": 10,
+        }
+
+    def update(self, amounts):
+        response = self.client.patch(
+            f"/api/recipes/{self.recipe.pk}/",
+            self.payload(amounts),
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def ingredient_rows(self):
+        return {
+            row.ingredient_id: (row.pk, row.amount)
+            for row in IngredientInRecipe.objects.filter(recipe=self.recipe)
+        }
+
+    def cart_totals(self):
+        return dict(
+            ShoppingListItem.objects.filter(user=self.buyer)
+            .values_list("ingredient", "amount")
+        )
+
+    def test_initial_cart_totals(self):
+        self.assertEqual(
+            self.cart_totals(), {self.water.pk: 700, self.salt.pk: 5}
+        )
+
+    def test_amount_change(self):
+        self.update({self.water: 300, self.salt: 5})
+        rows = self.ingredient_rows()
+        # строки обновлены на месте, а не пересозданы
+        self.assertEqual(
+            rows[self.water.pk], (self.rows[self.water.pk][0], 300)
+        )
+        self.assertEqual(rows[self.salt.pk], self.rows[self.salt.pk])
+        self.assertEqual(
+            self.cart_totals(), {self.water.pk: 500, self.salt.pk: 5}
+        )
+
+    def test_ingredient_removed(self):
+        self.update({self.water: 500})
+        self.assertEqual(
+            self.ingredient_rows(), {self.water.pk: self.rows[self.water.pk]}
+        )
+        self.assertEqual(self.cart_totals(), {self.water.pk: 700})
+
+    def test_ingredient_added(self):
+        response = self.update({self.water: 500, self.salt: 5, self.dill: 10})
+        rows = self.ingredient_rows()
+        self.assertEqual(rows[self.water.pk], self.rows[self.water.pk])
+        self.assertEqual(rows[self.salt.pk], self.rows[self.salt.pk])
+        self.assertEqual(rows[self.dill.pk][1], 10)
+        self.assertEqual(
+            self.cart_totals(),
+            {self.water.pk: 700, self.salt.pk: 5, self.dill.pk: 10},
+        )
+        self.assertEqual(len(response.data["ingredients"]), 3)
+        # новый ингредиент попадает в поисковый вектор
+        self.assertTrue(
+            Recipe.objects.filter(
+                pk=self.recipe.pk, search_vector="укроп"
+            ).exists()
+        )
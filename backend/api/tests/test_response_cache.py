@@ -0,0 +1,90 @@
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from api import response_cache
+from .base import PASSWORD, FoodgramTestCase, create_recipe
+
+
+class AuthorSavedTests(FoodgramTestCase):
+    """Версия списка рецептов при сохранении профиля автора."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        create_recipe(cls.author, "Суп", {cls.water: 500})
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.version = response_cache._version(
+            response_cache.LIST_VERSION_KEY
+        )
+
+    def list_version(self):
+        return cache.get(response_cache.LIST_VERSION_KEY)
+
+    def test_login_keeps_list_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = APIClient().post(
+                "/api/auth/token/login/",
+                {"email": self.author.email, "password": PASSWORD},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.author.refresh_from_db()
+        self.assertIsNotNone(self.author.last_login)
+        self.assertEqual(self.list_version(), self.version)
+
+    def test_profile_change_bumps_list_version(self):
+        self.author.first_name = "Пётр"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save(update_fields=["first_name"])
+        self.assertNotEqual(self.list_version(), self.version)
+
+    def test_author_without_recipes_keeps_list_version(self):
+        self.user.first_name = "Мария"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(self.list_version(), self.version)
+
+
+class CountersChangedTests(FoodgramTestCase):
+    """Список по популярности после добавления в избранное."""
+
+    url = "/api/recipes/?ordering=-favorites_count"
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.soup = create_recipe(cls.author, "Суп")
+        cls.bread = create_recipe(cls.author, "Хлеб")
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.anonymous = APIClient()
+
+    def ranked(self):
+        response = self.anonymous.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response["X-Cache"], [
+            recipe["id"] for recipe in response.data["results"]
+        ]
+
+    def test_favorite_refreshes_cached_list(self):
+        self.assertEqual(
+            self.ranked(),
+            ("MISS", [self.bread.pk, self.soup.pk]),
+        )
+        self.assertEqual(self.ranked()[0], "HIT")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/recipes/favorite/",
+                {"recipes": [self.soup.pk]},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.ranked(),
+            ("MISS", [self.soup.pk, self.bread.pk]),
+        )
@@ -0,0 +1,109 @@
+import csv
+import io
+import json
+import os
+from unittest import skipUnless
+
+from django.conf import settings
+from django.utils import timezone
+
+from recipes.models import ShoppingCart
+from .base import FoodgramTestCase, create_recipe, create_user
+
+URL = "/api/recipes/download_shopping_cart/"
+
+
+class ShoppingListExportTests(FoodgramTestCase):
+    """Выгрузка списка покупок в txt, csv, json и pdf."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cook = create_user("cook")
+        for recipe in (
+            create_recipe(cls.author, "Суп", {cls.water: 500, cls.salt: 5}),
+            create_recipe(cook, "Хлеб", {cls.flour: 300, cls.salt: 10}),
+        ):
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def download(self, export_format):
+        response = self.client.get(URL, {"format": export_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response["Content-Disposition"],
+            f'attachment; filename="shopping_list.{export_format}"',
+        )
+        return b"".join(response.streaming_content)
+
+    def test_txt(self):
+        self.assertEqual(
+            self.download("txt").decode(),
+            f"Список покупок Foodgram на {timezone.localdate():%d.%m.%Y}:\n"
+            "\n"
+            "Продукты:\n"
+            "1. Вода (мл) — 500\n"
+            "2. Мука (г) — 300\n"
+            "3. Соль (г) — 15\n"
+            "\n"
+            "Рецепты, для которых нужны эти продукты:\n"
+            "1. Суп — @author\n"
+            "2. Хлеб — @cook\n",
+        )
+
+    def test_csv(self):
+        content = self.download("csv").decode()
+        self.assertTrue(content.startswith("﻿"))
+        self.assertEqual(
+            list(csv.reader(io.StringIO(content[1:]))),
+            [
+                ["№", "Продукт", "Единица измерения", "Количество"],
+                ["1", "вода", "мл", "500"],
+                ["2", "мука", "г", "300"],
+                ["3", "соль", "г", "15"],
+                [],
+                ["№", "Рецепт", "Автор"],
+                ["1", "Суп", "author"],
+                ["2", "Хлеб", "cook"],
+            ],
+        )
+
+    def test_json(self):
+        self.assertEqual(
+            json.loads(self.download("json")),
+            {
+                "date": timezone.localdate().isoformat(),
+                "ingredients": [
+                    {"name": "вода", "measurement_unit": "мл", "amount": 500},
+                    {"name": "мука", "measurement_unit": "г", "amount": 300},
+                    {"name": "соль", "measurement_unit": "г", "amount": 15},
+                ],
+                "recipes": [
+                    {"name": "Суп", "author": "author"},
+                    {"name": "Хлеб", "author": "cook"},
+                ],
+            },
+        )
+
+    def test_empty_cart(self):
+        ShoppingCart.objects.filter(user=self.user).delete()
+        response = self.client.get(URL, {"format": "json"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("errors", response.data)
+
+    @skipUnless(
+        os.path.isfile(settings.PDF_FONT_PATH), "нет шрифта PDF_FONT_PATH"
+    )
+    def test_pdf_embeds_font_subset(self):
+        content = self.download("pdf")
+        self.assertTrue(content.startswith(b"%PDF-1.4"))
+        self.assertTrue(content.endswith(b"%%EOF\n"))
+        self.assertIn(b"/FontFile2", content)
+        # контуры неиспользованных глифов не встраиваются
+        self.assertLess(
+            len(content), os.path.getsize(settings.PDF_FONT_PATH) // 10
+        )
+
+    def test_unknown_format(self):
+        response = self.client.get(URL, {"format": "xml"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("errors", response.data)
@@ -0,0 +1,69 @@
+"""Приём изображений в multipart/form-data без base64 и без копий в памяти.
+
+ImageUploadHandler пишет файл во временный файл на диске по мере чтения
+тела запроса, по первому куску проверяет сигнатуру формата, а по сумме
+кусков — размер. Отклонённый файл дальше не пишется и попадает в данные
+запроса как RejectedUpload, чтобы поле сериализатора вернуло понятную
+ошибку валидации.
+"""
+import filetype
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from drf_extra_fields.fields import Base64ImageField
+
+ALLOWED_IMAGE_TYPES = Base64ImageField.ALLOWED_TYPES
+
+
+def image_too_large_message():
+    size = settings.MAX_IMAGE_UPLOAD_SIZE
+    if size >= 1024 * 1024:
+        limit = f"{size / (1024 * 1024):g} МБ"
+    else:
+        limit = f"{size / 1024:g} КБ"
+    return f"Размер изображения не должен превышать {limit}."
+
+
+class RejectedUpload(UploadedFile):
+    def __init__(self, name, error):
+        super().__init__(name=name, size=0)
+        self.error = error
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.error = None
+        self.extension = None
+
+    def _reject(self, error):
+        self.error = error
+        self.upload_interrupted()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error:
+            return None
+        if start == 0:
+            self.extension = filetype.guess_extension(raw_data)
+            if self.extension not in ALLOWED_IMAGE_TYPES:
+                self._reject("Загрузите изображение в формате JPEG, PNG, GIF или WebP.")
+                return None
+        if start + len(raw_data) > settings.MAX_IMAGE_UPLOAD_SIZE:
+            self._reject(image_too_large_message())
+            return None
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.error:
+            return RejectedUpload(self.file_name, self.error)
+        uploaded = super().file_complete(file_size)
+        uploaded.image_extension = self.extension
+        return uploaded
+
+
+class ImageUploadMixin:
+    """Подключает ImageUploadHandler к запросам вьюсета."""
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [ImageUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
@@ -1,6 +1,9 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
+from . import async_views
+from .async_views import async_read
 from .views import (
     IngredientViewSet,
     RecipeViewSet,
@@ -19,3 +22,42 @@ urlpatterns = [
     path("auth/", include("djoser.urls.authtoken")),
     path("", include("djoser.urls")),
 ]
+
+
+def router_view(name):
+    """Синхронное представление роутера для методов, кроме GET."""
+    return next(
+        pattern.callback for pattern in api_router.urls
+        if pattern.name == name
+    )
+
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = [
+        path(
+            "ingredients/",
+            async_read(router_view("ingredient-list"))(
+                async_views.ingredient_list
+            ),
+            name="ingredient-list-async",
+        ),
+        path(
+            "recipes/",
+            async_read(router_view("recipe-list"))(async_views.recipe_list),
+            name="recipe-list-async",
+        ),
+        path(
+            "recipes/<int:pk>/",
+            async_read(router_view("recipe-detail"))(
+                async_views.recipe_detail
+            ),
+            name="recipe-detail-async",
+        ),
+        path(
+            "users/subscriptions/",
+            async_read(router_view("user-subscription-get-user-subscriptions"))(
+                async_views.subscriptions
+            ),
+            name="user-subscription-subscriptions-async",
+        ),
+    ] + urlpatterns
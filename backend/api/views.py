@@ -1,38 +1,113 @@
+import os
+from functools import partial
+from itertools import chain
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import F, Sum
-from django.http import HttpResponse
+from django.db.models import (
+    Count,
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, status, viewsets
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from users import follows
 from users.models import Follow
-from .filters import IngredientFilter, RecipeFilter
-from .pagination import FoodgramPageNumberPagination
+from . import ingredient_catalog, response_cache
+from .constants import (
+    BATCH_ADDED,
+    BATCH_EXISTS,
+    BATCH_MISSING,
+    BATCH_NOT_FOUND,
+    BATCH_REMOVED,
+)
+from .filters import (
+    IngredientFilter,
+    RecipeFilter,
+    RecipeSearchFilter,
+    UniqueOrderingFilter,
+)
+from .negotiation import IgnoreFormatContentNegotiation
+from .pagination import (
+    FoodgramPageNumberPagination,
+    KeysetPaginationMixin,
+    RecipeKeysetPagination,
+    RecipePageNumberPagination,
+    SubscriptionKeysetPagination,
+    TrendingKeysetPagination,
+)
 from .permissions import IsAuthorOrAdminOrReadOnly
 from .serializers import (
     AvatarResponseSerializer as SetAvatarResponseSerializer,
     AvatarUploadSerializer as SetAvatarSerializer,
+    AuthorIdsSerializer,
     IngredientSerializer,
     RecipeReadSerializer,
     RecipeCreateUpdateSerializer,
+    RecipeIdsSerializer,
     RecipeShortSerializer,
+    ShoppingListItemSerializer,
     UserWithRecipesSerializer,
+    get_recipes_limit,
+)
+from .shopping_list import (
+    EXPORT_FORMATS,
+    INGREDIENT_ROW,
+    buffered,
+    shopping_list_rows,
 )
+from .uploads import ImageUploadMixin
+from recipes import ingredient_index, relations, renditions
 from recipes.models import (
     Favorite,
     Ingredient,
-    IngredientInRecipe,
     Recipe,
     ShoppingCart,
+    ShoppingListItem,
 )
 
 User = get_user_model()
 
 
+def batch_results(method, ids, add, remove, existing):
+    """Статусы элементов пакетного запроса в порядке переданных id.
+
+    add и remove выполняют изменение одним оператором и возвращают id
+    изменённых строк; existing нужен, чтобы отличить уже добавленное от
+    несуществующего.
+    """
+    if method == "POST":
+        added = add(ids)
+        found = set(
+            existing.filter(pk__in=set(ids) - added)
+            .values_list("pk", flat=True)
+        ) if len(added) < len(ids) else set()
+        statuses = {
+            pk: BATCH_ADDED if pk in added
+            else BATCH_EXISTS if pk in found
+            else BATCH_NOT_FOUND
+            for pk in ids
+        }
+    else:
+        removed = remove(ids)
+        statuses = {
+            pk: BATCH_REMOVED if pk in removed else BATCH_MISSING
+            for pk in ids
+        }
+    return [{"id": pk, "status": statuses[pk]} for pk in ids]
+
+
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -41,21 +116,79 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get("name")
+        if name is not None:
+            return Response(ingredient_index.search(name))
+
+        return ingredient_catalog.catalog_response(
+            request, ingredient_catalog.get_catalog()
+        )
+
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    ImageUploadMixin, KeysetPaginationMixin, viewsets.ModelViewSet
+):
     permission_classes = [IsAuthorOrAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    pagination_class = RecipePageNumberPagination
+    keyset_pagination_class = RecipeKeysetPagination
+    filter_backends = [
+        DjangoFilterBackend,
+        UniqueOrderingFilter,
+        RecipeSearchFilter,
+    ]
     filterset_class = RecipeFilter
-    search_fields = ["name"]
-    ordering_fields = ["pub_date", "name"]
-    ordering = ["-pub_date"]
-
-    queryset = Recipe.objects.select_related("author").prefetch_related(
-        "ingredient_amounts__ingredient",
-        "favorited_by",
-        "in_shopping_carts_of",
+    ordering_fields = ["pub_date", "name", "favorites_count"]
+    # как индекс (-pub_date, id) и курсорная пагинация
+    ordering = ["-pub_date", "id"]
+
+    # поисковый вектор нужен только в WHERE и ранге поиска
+    queryset = (
+        Recipe.objects.select_related("author")
+        .prefetch_related("ingredient_amounts__ingredient")
+        .defer("search_vector")
+    )
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef("pk"))
+            ),
+        )
+
+    def list(self, request, *args, **kwargs):
+        if not response_cache.is_cacheable(request):
+            return super().list(request, *args, **kwargs)
+        return self._cached_response(
+            response_cache.list_key(request),
+            super().list, request, *args, **kwargs,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        if not response_cache.is_cacheable(request):
+            return super().retrieve(request, *args, **kwargs)
+        return self._cached_response(
+            response_cache.detail_key(request, kwargs[self.lookup_field]),
+            super().retrieve, request, *args, **kwargs,
         )
 
+    def _cached_response(self, key, handler, request, *args, **kwargs):
+        data = response_cache.lookup(key)
+        if data is not None:
+            return Response(data, headers={"X-Cache": "HIT"})
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response_cache.store(key, response.data)
+        response["X-Cache"] = "MISS"
+        return response
+
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -69,6 +202,10 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
+        # как UpdateModelMixin: prefetch ингредиентов из get_object()
+        # устарел после обновления
+        if getattr(instance, "_prefetched_objects_cache", None):
+            instance._prefetched_objects_cache = {}
         read_serializer = RecipeReadSerializer(serializer.instance, context=self.get_serializer_context())
         return Response(read_serializer.data, status=status.HTTP_200_OK)
 
@@ -86,102 +223,165 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
-    @action(detail=True, methods=["post", "delete"], permission_classes=[IsAuthenticated])
-    def favorite(self, request, pk=None):
-        recipe = self.get_object()
-        user = request.user
-
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[IsAuthenticated],
+        filter_backends=[],
+        pagination_class=RecipeKeysetPagination,
+    )
+    def feed(self, request):
+        # при немногих подписках — по выборке из индекса
+        # (author_id, -pub_date, id) на автора и сортировка top-N по
+        # всем их рецептам; при многих — обход индекса (-pub_date, id) с
+        # полусоединением Follow, который останавливается на странице
+        queryset = self.get_queryset().filter(
+            author__in=Follow.objects.filter(user=request.user).values(
+                "author"
+            )
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        filter_backends=[DjangoFilterBackend],
+        pagination_class=TrendingKeysetPagination,
+        keyset_pagination_class=TrendingKeysetPagination,
+    )
+    def trending(self, request):
+        # таблицу трендов пересчитывает refresh_trending
+        queryset = self.filter_queryset(
+            self.get_queryset()
+            .filter(trending__isnull=False)
+            .annotate(trending_rank=F("trending__rank"))
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def _toggle_relation(self, request, model, exists_error, missing_error):
+        # без аннотаций и prefetch get_queryset(): нужен только сам рецепт
+        recipe = get_object_or_404(
+            Recipe.objects.defer("search_vector"),
+            pk=self.kwargs[self.lookup_field],
+        )
         if request.method == "POST":
-            if Favorite.objects.filter(user=user, recipe=recipe).exists():
+            if not relations.add(model, request.user.pk, [recipe.pk]):
                 return Response(
-                    {"errors": "Рецепт уже в избранном."},
+                    {"errors": exists_error},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            Favorite.objects.create(user=user, recipe=recipe)
             serializer = self.get_serializer(recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
+        if not relations.remove(model, request.user.pk, [recipe.pk]):
+            return Response(
+                {"errors": missing_error},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-        elif request.method == "DELETE":
-            favorite_instance = Favorite.objects.filter(user=user, recipe=recipe)
-            if not favorite_instance.exists():
-                return Response(
-                    {"errors": "Рецепта нет в избранном."},
-                    status=status.HTTP_400_BAD_REQUEST,
+    def _batch_relation(self, request, model):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(serializer.validated_data["recipes"]))
+        return Response(
+            {
+                "results": batch_results(
+                    request.method,
+                    recipe_ids,
+                    partial(relations.add, model, request.user.pk),
+                    partial(relations.remove, model, request.user.pk),
+                    Recipe.objects.all(),
                 )
-            favorite_instance.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-
-        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+            },
+            status=status.HTTP_200_OK,
+        )
 
     @action(detail=True, methods=["post", "delete"], permission_classes=[IsAuthenticated])
-    def shopping_cart(self, request, pk=None):
-        recipe = self.get_object()
-        user = request.user
+    def favorite(self, request, pk=None):
+        return self._toggle_relation(
+            request, Favorite,
+            "Рецепт уже в избранном.", "Рецепта нет в избранном.",
+        )
 
-        if request.method == "POST":
-            if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
-                return Response(
-                    {"errors": "Рецепт уже в списке покупок."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            ShoppingCart.objects.create(user=user, recipe=recipe)
-            serializer = self.get_serializer(recipe)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        permission_classes=[IsAuthenticated],
+        url_path="favorite",
+        url_name="favorite-batch",
+    )
+    def favorite_batch(self, request):
+        return self._batch_relation(request, Favorite)
 
-        elif request.method == "DELETE":
-            cart_item = ShoppingCart.objects.filter(user=user, recipe=recipe)
-            if not cart_item.exists():
-                return Response(
-                    {"errors": "Рецепта нет в списке покупок."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            cart_item.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
+    @action(detail=True, methods=["post", "delete"], permission_classes=[IsAuthenticated])
+    def shopping_cart(self, request, pk=None):
+        return self._toggle_relation(
+            request, ShoppingCart,
+            "Рецепт уже в списке покупок.", "Рецепта нет в списке покупок.",
+        )
 
-        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        permission_classes=[IsAuthenticated],
+        url_path="shopping_cart",
+        url_name="shopping-cart-batch",
+    )
+    def shopping_cart_batch(self, request):
+        return self._batch_relation(request, ShoppingCart)
 
     @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
-
-    def download_shopping_cart(self, request):
-        user = request.user
-
-        totals = (
-            IngredientInRecipe.objects.filter(recipe__in_shopping_carts_of__user=user)
-            .values(name=F("ingredient__name"), unit=F("ingredient__measurement_unit"))
-            .annotate(total=Sum("amount"))
-            .order_by("name")
+    def shopping_cart_summary(self, request):
+        items = (
+            ShoppingListItem.objects.filter(user=request.user)
+            .select_related("ingredient")
+            .order_by("ingredient__name")
         )
+        serializer = ShoppingListItemSerializer(items, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        permission_classes=[IsAuthenticated],
+        content_negotiation_class=IgnoreFormatContentNegotiation,
+    )
+    def download_shopping_cart(self, request):
+        export_format = request.query_params.get("format", "txt")
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"errors": f"Формат должен быть одним из: {', '.join(EXPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        content_type, render = EXPORT_FORMATS[export_format]
+        if export_format == "pdf" and not os.path.isfile(settings.PDF_FONT_PATH):
+            return Response(
+                {"errors": "Выгрузка в PDF недоступна: не найден шрифт."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
 
-        if not totals.exists():
+        rows = shopping_list_rows(request.user)
+        first_row = next(rows, None)
+        if first_row is None or first_row["kind"] != INGREDIENT_ROW:
+            rows.close()
             return Response(
                 {"errors": "Ваш список покупок пуст, или в рецептах нет ингредиентов."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        recipe_info = (
-            Recipe.objects.filter(in_shopping_carts_of__user=user)
-            .values_list("name", "author__username")
-            .order_by("name")
+        response = StreamingHttpResponse(
+            buffered(render(chain([first_row], rows))),
+            content_type=content_type,
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="shopping_list.{export_format}"'
         )
-
-        report_lines = [
-            f"Список покупок Foodgram на {timezone.localdate():%d.%m.%Y}:",
-            "\nПродукты:",
-        ]
-        for idx, row in enumerate(totals, 1):
-            report_lines.append(f"{idx}. {row['name'].capitalize()} ({row['unit']}) — {row['total']}")
-
-        report_lines.append("\nРецепты, для которых нужны эти продукты:")
-        for idx, (title, author_username) in enumerate(recipe_info, 1):
-            report_lines.append(f"{idx}. {title} — @{author_username}")
-
-        report_text = "\n".join(report_lines)
-
-        response = HttpResponse(report_text, content_type="text/plain; charset=utf-8")
-        response['Content-Disposition'] = 'attachment; filename="shopping_list.txt"'
         return response
 
-
     @action(detail=True, methods=["get"], permission_classes=[AllowAny], url_path="get-link")
     def get_link(self, request, pk=None):
         recipe = self.get_object()
@@ -192,7 +392,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response({"short-link": absolute_short_link_url}, status=status.HTTP_200_OK)
 
 
-class AvatarViewSet(viewsets.ViewSet):
+class AvatarViewSet(ImageUploadMixin, viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
 
     @action(detail=False, methods=["put"])
@@ -200,8 +400,7 @@ class AvatarViewSet(viewsets.ViewSet):
         user = request.user
         serializer = SetAvatarSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
-            if user.avatar:
-                user.avatar.delete(save=False)
+            renditions.discard(user.avatar)
             user.avatar = serializer.validated_data['avatar']
             user.save()
 
@@ -215,26 +414,62 @@ class AvatarViewSet(viewsets.ViewSet):
     def delete_avatar(self, request):
         user = request.user
         if user.avatar:
-            user.avatar.delete(save=True)
+            renditions.discard(user.avatar)
+            user.avatar = None
+            user.avatar_renditions = None
+            user.save(update_fields=["avatar", "avatar_renditions"])
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class UserSubscriptionViewSet(viewsets.ViewSet):
+class UserSubscriptionViewSet(
+    ImageUploadMixin, KeysetPaginationMixin, viewsets.ViewSet
+):
     permission_classes = [IsAuthenticated]
     pagination_class = FoodgramPageNumberPagination
+    keyset_pagination_class = SubscriptionKeysetPagination
     serializer_class = UserWithRecipesSerializer
 
+    @staticmethod
+    def with_recipes(authors_queryset, request):
+        """Добавляет авторам число рецептов и превью последних рецептов.
+
+        Превью ограничивается recipes_limit на стороне БД (оконная функция
+        в prefetch), поэтому объём загружаемых рецептов не зависит от того,
+        сколько рецептов у автора.
+        """
+        recipes_queryset = Recipe.objects.defer("search_vector").order_by(
+            "-pub_date", "-id"
+        )
+        recipes_limit = get_recipes_limit(request)
+        if recipes_limit is not None:
+            recipes_queryset = recipes_queryset[:recipes_limit]
+        # подзапрос, а не Count() с JOIN: COUNT(*) пагинации его отбрасывает
+        recipes_count = Subquery(
+            Recipe.objects.filter(author=OuterRef("pk"))
+            .order_by()
+            .values("author")
+            .annotate(total=Count("pk"))
+            .values("total")
+        )
+        return authors_queryset.annotate(
+            recipes_count=Coalesce(recipes_count, Value(0))
+        ).prefetch_related(
+            Prefetch(
+                "recipes",
+                queryset=recipes_queryset,
+                to_attr="recipes_preview",
+            )
+        )
+
     @action(detail=False, methods=["get"], url_path="subscriptions")
     def get_user_subscriptions(self, request):
         user = request.user
 
-        authors_queryset = (
-            User.objects.filter(follower__user=user)
-            .prefetch_related("recipes")
-            .order_by("username")
-        )
+        authors_queryset = self.with_recipes(
+            User.objects.filter(following__user=user), request
+        ).order_by("username", "id")
 
-        paginator = self.pagination_class()
+        paginator = self.paginator
         page = paginator.paginate_queryset(authors_queryset, request, view=self)
 
         serializer = self.serializer_class(page, many=True, context={"request": request})
@@ -246,8 +481,7 @@ class UserSubscriptionViewSet(viewsets.ViewSet):
         if request.method == "PUT":
             serializer = SetAvatarSerializer(data=request.data, context={'request': request})
             if serializer.is_valid():
-                if user.avatar:
-                    user.avatar.delete(save=False)
+                renditions.discard(user.avatar)
                 user.avatar = serializer.validated_data['avatar']
                 user.save()
 
@@ -258,12 +492,17 @@ class UserSubscriptionViewSet(viewsets.ViewSet):
 
         elif request.method == "DELETE":
             if user.avatar:
-                user.avatar.delete(save=True)
+                renditions.discard(user.avatar)
+                user.avatar = None
+                user.avatar_renditions = None
+                user.save(update_fields=["avatar", "avatar_renditions"])
             return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=["post", "delete"], url_path="subscribe")
     def manage_subscription(self, request, pk=None):
-        author = get_object_or_404(User, pk=pk)
+        author = get_object_or_404(
+            self.with_recipes(User.objects.all(), request), pk=pk
+        )
         user = request.user
 
         if user == author:
@@ -273,8 +512,7 @@ class UserSubscriptionViewSet(viewsets.ViewSet):
             )
 
         if request.method == "POST":
-            follow, created = Follow.objects.get_or_create(user=user, author=author)
-            if not created:
+            if not follows.follow(user.pk, [author.pk]):
                 return Response(
                     {"errors": "Вы уже подписаны на этого пользователя."},
                     status=status.HTTP_400_BAD_REQUEST,
@@ -282,14 +520,33 @@ class UserSubscriptionViewSet(viewsets.ViewSet):
             serializer = self.serializer_class(author, context={"request": request})
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        elif request.method == "DELETE":
-            deleted_count, _ = Follow.objects.filter(user=user, author=author).delete()
-            if not deleted_count:
-                return Response(
-                    {"errors": "Вы не были подписаны на этого пользователя."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            return Response(status=status.HTTP_204_NO_CONTENT)
+        if not follows.unfollow(user.pk, [author.pk]):
+            return Response(
+                {"errors": "Вы не были подписаны на этого пользователя."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+    @action(
+        detail=False,
+        methods=["post", "delete"],
+        url_path="subscribe",
+        url_name="subscribe-batch",
+    )
+    def subscribe_batch(self, request):
+        serializer = AuthorIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        author_ids = list(dict.fromkeys(serializer.validated_data["authors"]))
+        return Response(
+            {
+                "results": batch_results(
+                    request.method,
+                    author_ids,
+                    partial(follows.follow, request.user.pk),
+                    partial(follows.unfollow, request.user.pk),
+                    User.objects.exclude(pk=request.user.pk),
+                )
+            },
+            status=status.HTTP_200_OK,
+        )
 
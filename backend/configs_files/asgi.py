@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "configs_files.settings")
+# под ASGI читающие эндпоинты обслуживаются корутинами (api.async_views)
+os.environ.setdefault("ASYNC_READ_VIEWS", "True")
 
 application = get_asgi_application()
@@ -5,8 +5,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = os.getenv("SECRET_KEY", "django-insecure-default-key-change-me")
 
-#DEBUG = os.getenv("DJANGO_DEBUG", "False") == "True"
-DEBUG = True
+DEBUG = os.getenv("DJANGO_DEBUG", "False") == "True"
 
 ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "*").split(",")
 
@@ -17,6 +16,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework.authtoken",
     "djoser",
@@ -27,6 +27,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.metrics.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -68,6 +69,15 @@ DATABASES = {
     }
 }
 
+# Кэш общий для всех воркеров gunicorn; без REDIS_URL — локальный в памяти.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -101,6 +111,48 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 AUTH_USER_MODEL = "users.User"
 
+# Время жизни in-memory индекса ингредиентов в воркере (секунды).
+INGREDIENT_INDEX_TTL = int(os.getenv("INGREDIENT_INDEX_TTL", 300))
+# Cache-Control max-age для ответа со всем каталогом ингредиентов.
+INGREDIENT_CATALOG_MAX_AGE = int(os.getenv("INGREDIENT_CATALOG_MAX_AGE", 300))
+# Списки рецептов длиннее порога отдают приблизительный count: оценку
+# планировщика или закэшированный на указанное время COUNT(*).
+APPROXIMATE_COUNT_THRESHOLD = int(
+    os.getenv("APPROXIMATE_COUNT_THRESHOLD", 10000)
+)
+APPROXIMATE_COUNT_CACHE_TIMEOUT = int(
+    os.getenv("APPROXIMATE_COUNT_CACHE_TIMEOUT", 60)
+)
+# Время жизни закэшированных ответов для анонимных запросов к рецептам.
+RECIPE_RESPONSE_CACHE_TIMEOUT = int(
+    os.getenv("RECIPE_RESPONSE_CACHE_TIMEOUT", 600)
+)
+# Предельный размер загружаемого изображения (как client_max_body_size в nginx).
+MAX_IMAGE_UPLOAD_SIZE = int(
+    os.getenv("MAX_IMAGE_UPLOAD_SIZE", 10 * 1024 * 1024)
+)
+# Формат уменьшенных копий изображений в ответах API (webp или jpeg).
+IMAGE_RENDITION_FORMAT = os.getenv("IMAGE_RENDITION_FORMAT", "webp")
+# TrueType-шрифт с кириллицей для выгрузки списка покупок в PDF.
+PDF_FONT_PATH = os.getenv(
+    "PDF_FONT_PATH", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+)
+# SQL-запросы дольше порога (мс) пишутся в лог api.metrics; в лог
+# попадает указанная доля таких запросов.
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", 100))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv("SLOW_QUERY_SAMPLE_RATE", 0.1))
+# Асинхронные варианты читающих эндпоинтов (api.async_views); asgi.py
+# включает их по умолчанию, под WSGI они не нужны.
+ASYNC_READ_VIEWS = os.getenv("ASYNC_READ_VIEWS", "False") == "True"
+# Сколько запросов воркер ASGI обрабатывает одновременно (api.concurrency):
+# у каждого своё соединение с БД, поэтому значение, умноженное на число
+# воркеров, должно быть меньше max_connections PostgreSQL.
+ASGI_MAX_CONCURRENT_REQUESTS = int(
+    os.getenv("ASGI_MAX_CONCURRENT_REQUESTS", 20)
+)
+if ASYNC_READ_VIEWS:
+    MIDDLEWARE.insert(1, "api.concurrency.ConcurrencyLimitMiddleware")
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework.authentication.TokenAuthentication",
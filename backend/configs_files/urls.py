@@ -1,12 +1,22 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
-from recipes.views import recipe_short_redirect_view
+from api.metrics import metrics_view
+from recipes.views import (
+    async_recipe_short_redirect_view,
+    recipe_short_redirect_view,
+)
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
     path(
-        "s/<int:pk>/", recipe_short_redirect_view, name="recipe-short-redirect"
+        "s/<int:pk>/",
+        async_recipe_short_redirect_view
+        if settings.ASYNC_READ_VIEWS
+        else recipe_short_redirect_view,
+        name="recipe-short-redirect",
     ),
     path(
         "api/", include("api.urls")
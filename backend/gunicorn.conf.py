@@ -0,0 +1,17 @@
+"""Настройки gunicorn (читаются из текущего каталога автоматически).
+
+SERVER_MODE=asgi запускает приложение configs_files.asgi в воркерах
+uvicorn: читающие эндпоинты обслуживаются корутинами (api.async_views),
+и один воркер держит много одновременных соединений. По умолчанию —
+WSGI с синхронными воркерами.
+"""
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("GUNICORN_WORKERS", 1))
+
+if os.getenv("SERVER_MODE", "wsgi") == "asgi":
+    wsgi_app = "configs_files.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "configs_files.wsgi:application"
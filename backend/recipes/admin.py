@@ -8,6 +8,8 @@ from .models import (
     Favorite,
     ShoppingCart,
 )
+from . import shopping_list
+from .search import update_search_vector
 
 User = get_user_model()
 
@@ -41,16 +43,23 @@ class RecipeAdmin(admin.ModelAdmin):
         "cooking_time",
         "pub_date",
         "favorites_count",
+        "in_carts_count",
     )
     search_fields = ("name", "author__username")
     list_filter = ("author", "pub_date")
     inlines = [IngredientInRecipeInline]
-    readonly_fields = ("pub_date",)
-
-    def favorites_count(self, obj):
-        return obj.favorited_by.count()
-
-    favorites_count.short_description = "В избранном"
+    readonly_fields = ("pub_date", "favorites_count", "in_carts_count")
+
+    def save_related(self, request, form, formsets, change):
+        # инлайн меняет ингредиенты в обход сериализатора: вклад рецепта
+        # в списки покупок снимается по старому составу и прибавляется
+        # по новому
+        if change:
+            shopping_list.remove_recipe(form.instance.pk)
+        super().save_related(request, form, formsets, change)
+        if change:
+            shopping_list.add_recipe(form.instance.pk)
+        update_search_vector([form.instance.pk])
 
 
 @admin.register(Favorite)
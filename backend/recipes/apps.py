@@ -4,3 +4,29 @@ from django.apps import AppConfig
 class RecipesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "recipes"
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import post_delete, post_save, pre_delete
+
+        from . import (
+            ingredient_index,
+            popularity,
+            renditions,
+            search,
+            shopping_list,
+        )
+        from .models import Favorite, Ingredient, Recipe, ShoppingCart
+
+        post_save.connect(ingredient_index.invalidate, sender=Ingredient)
+        post_delete.connect(ingredient_index.invalidate, sender=Ingredient)
+        post_save.connect(search.on_ingredient_saved, sender=Ingredient)
+        post_save.connect(shopping_list.on_cart_saved, sender=ShoppingCart)
+        pre_delete.connect(shopping_list.on_cart_deleted, sender=ShoppingCart)
+        post_delete.connect(renditions.on_recipe_deleted, sender=Recipe)
+        post_delete.connect(
+            renditions.on_user_deleted, sender=get_user_model()
+        )
+        for model in (Favorite, ShoppingCart):
+            post_save.connect(popularity.on_relation_saved, sender=model)
+            post_delete.connect(popularity.on_relation_deleted, sender=model)
@@ -15,6 +15,16 @@ RECIPE_TEXT_FIELD = "Описание рецепта"
 RECIPE_INGREDIENTS_FIELD = "Ингредиенты"
 RECIPE_COOKING_TIME_FIELD = "Время приготовления (в минутах)"
 RECIPE_PUB_DATE_FIELD = "Дата публикации"
+RECIPE_SEARCH_VECTOR_FIELD = "Поисковый вектор"
+RECIPE_IMAGE_RENDITIONS_FIELD = "Уменьшенные копии изображения"
+RECIPE_FAVORITES_COUNT_FIELD = "В избранном"
+RECIPE_IN_CARTS_COUNT_FIELD = "В списках покупок"
+RECIPE_FAVORITES_COUNT_INDEX_NAME = "recipe_favorites_count_idx"
+RECIPE_RENDITIONS_PENDING_INDEX_NAME = "recipe_renditions_pending_idx"
+RECIPE_PUB_DATE_ID_INDEX_NAME = "recipe_pub_date_id_idx"
+RECIPE_AUTHOR_PUB_DATE_ID_INDEX_NAME = "recipe_author_pub_date_id_idx"
+RECIPE_SEARCH_VECTOR_INDEX_NAME = "recipe_search_vector_gin"
+RECIPE_NAME_TRIGRAM_INDEX_NAME = "recipe_name_trgm_gin"
 
 # IngredientInRecipe
 INGREDIENT_IN_RECIPE_VERBOSE_NAME = "Ингредиент в рецепте"
@@ -29,6 +39,7 @@ FAVORITE_VERBOSE_NAME = "Избранный рецепт"
 FAVORITE_VERBOSE_NAME_PLURAL = "Избранные рецепты"
 FAVORITE_USER_FIELD = "Пользователь"
 FAVORITE_RECIPE_FIELD = "Рецепт"
+FAVORITE_CREATED_AT_FIELD = "Дата добавления"
 FAVORITE_UNIQUE_CONSTRAINT_NAME = "unique_user_favorite_recipe"
 FAVORITE_STR_FORMAT = "добавил в избранное"
 
@@ -37,13 +48,59 @@ SHOPPING_CART_VERBOSE_NAME = "Рецепт в списке покупок"
 SHOPPING_CART_VERBOSE_NAME_PLURAL = "Рецепты в списках покупок"
 SHOPPING_CART_USER_FIELD = "Пользователь"
 SHOPPING_CART_RECIPE_FIELD = "Рецепт"
+SHOPPING_CART_CREATED_AT_FIELD = "Дата добавления"
 SHOPPING_CART_UNIQUE_CONSTRAINT_NAME = "unique_user_shopping_cart_recipe"
 SHOPPING_CART_STR_FORMAT = "добавил в список покупок"
 
+# ShoppingListItem
+SHOPPING_LIST_ITEM_VERBOSE_NAME = "Продукт в списке покупок"
+SHOPPING_LIST_ITEM_VERBOSE_NAME_PLURAL = "Продукты в списках покупок"
+SHOPPING_LIST_ITEM_USER_FIELD = "Пользователь"
+SHOPPING_LIST_ITEM_INGREDIENT_FIELD = "Ингредиент"
+SHOPPING_LIST_ITEM_AMOUNT_FIELD = "Общее количество"
+SHOPPING_LIST_ITEM_UNIQUE_CONSTRAINT_NAME = "unique_user_shopping_list_ingredient"
+
+# StaleFile
+STALE_FILE_VERBOSE_NAME = "Файл на удаление"
+STALE_FILE_VERBOSE_NAME_PLURAL = "Файлы на удаление"
+STALE_FILE_NAME_FIELD = "Путь в хранилище"
+STALE_FILE_CREATED_AT_FIELD = "Дата постановки в очередь"
+
+# TrendingRecipe
+TRENDING_RECIPE_VERBOSE_NAME = "Рецепт в трендах"
+TRENDING_RECIPE_VERBOSE_NAME_PLURAL = "Рецепты в трендах"
+TRENDING_RECIPE_RECIPE_FIELD = "Рецепт"
+TRENDING_RECIPE_SCORE_FIELD = "Оценка"
+TRENDING_RECIPE_RANK_FIELD = "Место"
+
+# Тренды: вес события убывает вдвое каждые TRENDING_HALF_LIFE_HOURS,
+# события старше TRENDING_WINDOW_DAYS не учитываются
+TRENDING_HALF_LIFE_HOURS = 48
+TRENDING_WINDOW_DAYS = 14
+TRENDING_FAVORITE_WEIGHT = 1.0
+TRENDING_SHOPPING_CART_WEIGHT = 2.0
+TRENDING_RECIPES_LIMIT = 1000
+
+# Уменьшенные копии изображений: размер -> ограничивающая рамка
+IMAGE_RENDITION_SIZES = {
+    "thumbnail": (160, 160),
+    "card": (640, 640),
+    "full": (1600, 1600),
+}
+# Расширение -> (формат Pillow, параметры сохранения)
+IMAGE_RENDITION_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+# Через сколько секунд строка, взятая воркером process_images, но так и не
+# обработанная (воркер упал), возвращается в очередь
+IMAGE_RENDITION_CLAIM_TIMEOUT = 600
+
 # Максимальная длина полей
 INGREDIENT_NAME_MAX_LENGTH = 128
 INGREDIENT_MEASUREMENT_UNIT_MAX_LENGTH = 64
 RECIPE_NAME_MAX_LENGTH = 256
+STALE_FILE_NAME_MAX_LENGTH = 255
 
 # Минимальные значения
 RECIPE_COOKING_TIME_MIN_VALUE = 1
@@ -0,0 +1,15 @@
+"""Слова для названий синтетических рецептов.
+
+Общие для команд, которые наполняют БД тестовыми данными: seed_data,
+check_query_plans и bench_recipe_search.
+"""
+DISHES = (
+    "суп", "салат", "пирог", "рагу", "запеканка", "омлет", "каша",
+    "soup", "salad", "pie", "stew", "pasta", "curry", "bowl",
+)
+ADJECTIVES = (
+    "домашний", "быстрый", "летний", "острый", "постный", "сырный",
+    "овощной", "куриный", "рыбный", "грибной", "сладкий", "пряный",
+    "лёгкий", "сытный", "праздничный", "деревенский", "весенний",
+    "зимний", "томатный", "ореховый",
+)
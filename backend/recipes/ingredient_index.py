@@ -0,0 +1,218 @@
+"""In-memory индекс каталога ингредиентов для автодополнения.
+
+Каталог небольшой (несколько тысяч строк) и меняется редко, поэтому
+каждый воркер держит его копию в памяти и отвечает на ``?name=`` без
+обращения к БД. Индекс состоит из отсортированного массива нормализованных
+названий (поиск по префиксу через bisect) и posting-списков биграмм и
+триграмм (поиск подстроки и опечаток).
+
+Индекс сбрасывается сигналами при изменении ``Ingredient`` в этом процессе;
+остальные воркеры перестраивают его по истечении INGREDIENT_INDEX_TTL.
+aget_index() и asearch() загружают каталог через async ORM для
+представлений под ASGI.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+from .models import Ingredient
+
+NGRAM_SIZE = 3
+SUBSTRING_MIN_QUERY_LENGTH = 2
+FUZZY_MIN_QUERY_LENGTH = 4
+FUZZY_LONG_QUERY_LENGTH = 6
+FUZZY_MAX_CANDIDATES = 50
+FUZZY_MAX_EXACT_MATCHES = 10
+
+
+def normalize(value):
+    return " ".join(value.lower().replace("ё", "е").split())
+
+
+def ngrams(value, size=NGRAM_SIZE, anchored=False):
+    if anchored:
+        value = "^" + value
+    return {value[pos:pos + size] for pos in range(len(value) - size + 1)}
+
+
+def prefix_distance(query, key, limit):
+    """Минимальное расстояние Левенштейна от query до префиксов key.
+
+    Возвращает ``limit + 1``, если расстояние больше limit.
+    """
+    key = key[:len(query) + limit]
+    previous = list(range(len(key) + 1))
+    for row, query_char in enumerate(query, 1):
+        current = [row]
+        for column, key_char in enumerate(key, 1):
+            current.append(min(
+                previous[column] + 1,
+                current[column - 1] + 1,
+                previous[column - 1] + (query_char != key_char),
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous)
+
+
+class IngredientIndex:
+    def __init__(self, rows):
+        rows = sorted(
+            ((normalize(name), pk, name, unit) for pk, name, unit in rows),
+            key=lambda row: (row[0], row[1]),
+        )
+        self.keys = [row[0] for row in rows]
+        self.items = [
+            {"id": pk, "name": name, "measurement_unit": unit}
+            for _, pk, name, unit in rows
+        ]
+        postings = defaultdict(lambda: array("I"))
+        for position, key in enumerate(self.keys):
+            grams = ngrams(key, anchored=True)
+            grams.update(ngrams(key, size=SUBSTRING_MIN_QUERY_LENGTH))
+            for gram in grams:
+                postings[gram].append(position)
+        self.postings = dict(postings)
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _prefix_positions(self, query):
+        position = bisect_left(self.keys, query)
+        while position < len(self.keys) and self.keys[position].startswith(
+            query
+        ):
+            yield position
+            position += 1
+
+    def _substring_positions(self, query, exclude):
+        if len(query) < SUBSTRING_MIN_QUERY_LENGTH:
+            return []
+        grams = ngrams(query) or {query}
+        candidate_lists = sorted(
+            (self.postings.get(gram, ()) for gram in grams), key=len
+        )
+        candidates = set(candidate_lists[0])
+        for postings in candidate_lists[1:]:
+            candidates.intersection_update(postings)
+        matches = (
+            (self.keys[position].find(query), position)
+            for position in candidates
+            if position not in exclude
+        )
+        return [
+            position for offset, position in sorted(matches) if offset > 0
+        ]
+
+    def _fuzzy_positions(self, query, exclude):
+        if len(query) < FUZZY_MIN_QUERY_LENGTH:
+            return []
+        limit = 2 if len(query) >= FUZZY_LONG_QUERY_LENGTH else 1
+        grams = ngrams(query, anchored=True)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        # q-gram lemma: при k правках общих триграмм не меньше n - q * k.
+        required = max(1, len(grams) - NGRAM_SIZE * limit)
+        # префикс ключа короче len(query) - limit не уложится в limit правок
+        min_length = len(query) - limit
+        scored = []
+        for position, count in shared.items():
+            if (
+                count < required
+                or position in exclude
+                or len(self.keys[position]) < min_length
+            ):
+                continue
+            key = self.keys[position]
+            distance = prefix_distance(query, key, limit)
+            if distance <= limit:
+                # опечатка в первой букве редка: такие ключи ниже
+                scored.append((distance, key[0] != query[0], -count, position))
+        # отбор после проверки всех кандидатов: порядок Counter при равном
+        # числе общих n-грамм зависит от хэшей и не должен влиять на выдачу
+        scored.sort()
+        return [position for *_, position in scored[:FUZZY_MAX_CANDIDATES]]
+
+    def search(self, query):
+        """Префиксные совпадения, затем подстроки, затем опечатки.
+
+        Поиск с опечатками выполняется, только если точных совпадений мало.
+        """
+        query = normalize(query)
+        if not query:
+            return list(self.items)
+        positions = list(self._prefix_positions(query))
+        seen = set(positions)
+        substring = self._substring_positions(query, seen)
+        positions.extend(substring)
+        seen.update(substring)
+        if len(positions) < FUZZY_MAX_EXACT_MATCHES:
+            positions.extend(self._fuzzy_positions(query, seen))
+        return [self.items[position] for position in positions]
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def _is_stale(index):
+    return (
+        index is None
+        or time.monotonic() - index.built_at > settings.INGREDIENT_INDEX_TTL
+    )
+
+
+def get_index():
+    global _index
+    index = _index
+    if _is_stale(index):
+        with _lock:
+            if _index is index:
+                _index = IngredientIndex(
+                    Ingredient.objects.values_list(
+                        "id", "name", "measurement_unit"
+                    )
+                )
+            index = _index
+    return index
+
+
+async def aget_index():
+    """Как get_index(), но без блокировки цикла событий на время загрузки.
+
+    Параллельные запросы могут построить индекс одновременно; в процессе
+    остаётся тот, что был сохранён первым.
+    """
+    global _index
+    index = _index
+    if _is_stale(index):
+        built = IngredientIndex([
+            row async for row in Ingredient.objects.values_list(
+                "id", "name", "measurement_unit"
+            )
+        ])
+        with _lock:
+            if _index is index:
+                _index = built
+            index = _index
+    return index
+
+
+def search(query):
+    return get_index().search(query)
+
+
+async def asearch(query):
+    return (await aget_index()).search(query)
+
+
+def invalidate(**kwargs):
+    global _index
+    _index = None
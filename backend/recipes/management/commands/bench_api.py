@@ -0,0 +1,340 @@
+import json
+import random
+import re
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, Recipe
+
+User = get_user_model()
+
+BENCH_PREFIX = "bench_api_"
+PASSWORD = "Bench-Pa55word"
+# картинка из postman_collection/foodgram.postman_collection.json
+IMAGE = (
+    "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAgMAAABieywaAAAACV"
+    "BMVEUAAAD///9fX1/S0ecCAAAACXBIWXMAAA7EAAAOxAGVKw4bAAAACklEQVQImWNoAAAAgg"
+    "CByxOyYQAAAABJRU5ErkJggg=="
+)
+SQL_COUNT = re.compile(r'db;desc="SQL x(\d+)"')
+SAMPLE_SIZE = 5000
+
+
+class Flow:
+    """Один проход по сценарию коллекции Postman от имени нового пользователя."""
+
+    def __init__(self, command, rng, number):
+        self.command = command
+        self.rng = rng
+        self.client = APIClient()
+        self.email = f"{BENCH_PREFIX}{number}@example.com"
+        self.username = f"{BENCH_PREFIX}{number}"
+
+    def request(self, name, method, url, data=None, expected=200):
+        started = time.perf_counter()
+        response = getattr(self.client, method)(url, data, format="json")
+        if hasattr(response, "streaming_content"):
+            b"".join(response.streaming_content)
+        elapsed = (time.perf_counter() - started) * 1000
+        match = SQL_COUNT.search(response.get("Server-Timing", ""))
+        self.command.record(
+            name,
+            elapsed,
+            int(match.group(1)) if match else None,
+            response.status_code == expected,
+        )
+        if response.status_code != expected:
+            raise FlowError(name, response.status_code)
+        return response
+
+    def run(self):
+        command, rng = self.command, self.rng
+        self.request(
+            "signup", "post", "/api/users/",
+            {
+                "email": self.email,
+                "username": self.username,
+                "first_name": "Замер",
+                "last_name": "Скорости",
+                "password": PASSWORD,
+            },
+            expected=201,
+        )
+        token = self.request(
+            "token_login", "post", "/api/auth/token/login/",
+            {"email": self.email, "password": PASSWORD},
+        ).data["auth_token"]
+        self.request("recipe_list_anon", "get", "/api/recipes/")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token}")
+        self.request("recipe_list", "get", "/api/recipes/")
+        recipe_id = rng.choice(command.recipe_ids)
+        self.request("recipe_detail", "get", f"/api/recipes/{recipe_id}/")
+        self.request(
+            "recipe_create", "post", "/api/recipes/",
+            {
+                "ingredients": [
+                    {"id": pk, "amount": rng.randint(1, 500)}
+                    for pk in rng.sample(command.ingredient_ids, 3)
+                ],
+                "image": IMAGE,
+                "name": f"Рецепт замера {self.username}",
+                "text": "Приготовить и замерить",
+                "cooking_time": rng.randint(1, 120),
+            },
+            expected=201,
+        )
+        for recipe_id in rng.sample(command.recipe_ids, 3):
+            self.request(
+                "favorite", "post", f"/api/recipes/{recipe_id}/favorite/",
+                expected=201,
+            )
+            self.request(
+                "shopping_cart", "post",
+                f"/api/recipes/{recipe_id}/shopping_cart/",
+                expected=201,
+            )
+        self.request(
+            "download_shopping_cart", "get",
+            "/api/recipes/download_shopping_cart/",
+        )
+        for author_id in rng.sample(command.author_ids, 3):
+            self.request(
+                "subscribe", "post", f"/api/users/{author_id}/subscribe/",
+                expected=201,
+            )
+        self.request(
+            "subscriptions", "get", "/api/users/subscriptions/?recipes_limit=3"
+        )
+        self.request(
+            "ingredient_search", "get",
+            f"/api/ingredients/?name={rng.choice(command.ingredient_prefixes)}",
+        )
+
+
+class FlowError(Exception):
+    pass
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный замер основных сценариев API (по коллекции Postman) "
+        "внутри процесса: p50/p95/p99, запросов в секунду и SQL-запросов "
+        "на запрос для каждого эндпоинта, сравнение с сохранённым JSON. "
+        "Нужна наполненная БД (seed_data); созданные данные удаляются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int, default=4,
+            help="Параллельных пользователей (по умолчанию 4)",
+        )
+        parser.add_argument(
+            "--iterations", type=int, default=20,
+            help="Проходов сценария на пользователя (по умолчанию 20)",
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=2,
+            help="Проходов для прогрева, не входящих в замер "
+                 "(по умолчанию 2)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=1,
+            help="Зерно выбора рецептов, авторов и ингредиентов",
+        )
+        parser.add_argument(
+            "--save", help="Сохранить результаты в JSON для сравнения",
+        )
+        parser.add_argument(
+            "--compare", help="Сравнить с результатами из JSON",
+        )
+        parser.add_argument(
+            "--tolerance", type=float, default=0.25,
+            help="Допустимый рост p95 относительно --compare "
+                 "(по умолчанию 0.25 — на 25%%)",
+        )
+
+    def record(self, name, elapsed, queries, ok):
+        if not self.measuring:
+            return
+        with self.lock:
+            result = self.results[name]
+            result["latency"].append(elapsed)
+            if queries is not None:
+                result["queries"].append(queries)
+            result["errors"] += not ok
+
+    def _sample(self):
+        self.recipe_ids = list(
+            Recipe.objects.order_by("-pk").values_list("pk", flat=True)[
+                :SAMPLE_SIZE
+            ]
+        )
+        self.author_ids = list(
+            User.objects.filter(recipes__pk__in=self.recipe_ids)
+            .exclude(username__startswith=BENCH_PREFIX)
+            .distinct()
+            .values_list("pk", flat=True)
+        )
+        self.ingredient_ids = list(
+            Ingredient.objects.values_list("pk", flat=True)[:SAMPLE_SIZE]
+        )
+        self.ingredient_prefixes = sorted({
+            name[:3] for name in Ingredient.objects.values_list(
+                "name", flat=True
+            )[:SAMPLE_SIZE]
+        })
+        if (
+            len(self.recipe_ids) < 3
+            or len(self.author_ids) < 3
+            or len(self.ingredient_ids) < 3
+        ):
+            raise CommandError(
+                "Мало данных для замера: сначала выполните load_ingredients "
+                "и seed_data."
+            )
+
+    def _worker(self, worker, iterations, offset):
+        rng = random.Random(f"{self.seed}:{worker}:{offset}")
+        try:
+            for iteration in range(iterations):
+                number = f"{worker}_{offset + iteration}"
+                try:
+                    Flow(self, rng, number).run()
+                except FlowError as error:
+                    with self.lock:
+                        self.failed.append(error.args)
+        finally:
+            connection.close()
+
+    def _run(self, iterations, offset):
+        with ThreadPoolExecutor(self.concurrency) as pool:
+            list(pool.map(
+                lambda worker: self._worker(worker, iterations, offset),
+                range(self.concurrency),
+            ))
+
+    def _report(self, elapsed):
+        report = {
+            "concurrency": self.concurrency,
+            "requests_per_second": round(
+                sum(len(r["latency"]) for r in self.results.values())
+                / elapsed, 1,
+            ),
+            "endpoints": {},
+        }
+        self.stdout.write(
+            f"{'эндпоинт':<24}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}"
+            f"{'rps':>8}{'SQL':>6}{'ошибок':>8}"
+        )
+        for name, result in self.results.items():
+            latency = result["latency"]
+            endpoint = report["endpoints"][name] = {
+                "count": len(latency),
+                "p50": round(statistics.median(latency), 2),
+                "p95": round(percentile(latency, 0.95), 2),
+                "p99": round(percentile(latency, 0.99), 2),
+                "requests_per_second": round(len(latency) / elapsed, 1),
+                "queries": max(result["queries"], default=None),
+                "errors": result["errors"],
+            }
+            queries = endpoint["queries"]
+            self.stdout.write(
+                f"{name:<24}{endpoint['count']:>6}{endpoint['p50']:>9.1f}"
+                f"{endpoint['p95']:>9.1f}{endpoint['p99']:>9.1f}"
+                f"{endpoint['requests_per_second']:>8.1f}"
+                f"{'-' if queries is None else queries:>6}"
+                f"{endpoint['errors']:>8}"
+            )
+        self.stdout.write(
+            f"Всего: {report['requests_per_second']} запросов/с "
+            f"за {elapsed:.1f} с при {self.concurrency} потоках"
+        )
+        return report
+
+    def _compare(self, report, path, tolerance):
+        with open(path, encoding="utf-8") as file:
+            baseline = json.load(file)["endpoints"]
+        regressions = []
+        for name, endpoint in report["endpoints"].items():
+            previous = baseline.get(name)
+            if previous is None:
+                continue
+            if endpoint["p95"] > previous["p95"] * (1 + tolerance):
+                regressions.append(
+                    f"{name}: p95 {previous['p95']} → {endpoint['p95']} мс"
+                )
+            if (
+                endpoint["queries"] is not None
+                and previous["queries"] is not None
+                and endpoint["queries"] > previous["queries"]
+            ):
+                regressions.append(
+                    f"{name}: SQL-запросов {previous['queries']} → "
+                    f"{endpoint['queries']}"
+                )
+        return regressions
+
+    def _cleanup(self):
+        # удаление через ORM: сигналы поправят счётчики и списки покупок
+        users = User.objects.filter(username__startswith=BENCH_PREFIX)
+        count = users.count()
+        for user in users.iterator():
+            user.delete()
+        self.stdout.write(f"Удалено пользователей замера: {count}.")
+
+    def handle(self, *args, **options):
+        if min(options["concurrency"], options["iterations"]) < 1:
+            raise CommandError(
+                "--concurrency и --iterations должны быть положительными."
+            )
+        if options["warmup"] < 0:
+            raise CommandError("--warmup не может быть отрицательным.")
+        self.concurrency = options["concurrency"]
+        self.seed = options["seed"]
+        self.lock = threading.Lock()
+        self.results = defaultdict(
+            lambda: {"latency": [], "queries": [], "errors": 0}
+        )
+        self.failed = []
+        if User.objects.filter(username__startswith=BENCH_PREFIX).exists():
+            self._cleanup()
+        self._sample()
+        try:
+            self.measuring = False
+            self._run(options["warmup"], 0)
+            self.measuring = True
+            started = time.perf_counter()
+            self._run(options["iterations"], options["warmup"])
+            elapsed = time.perf_counter() - started
+        finally:
+            self._cleanup()
+        for name, status in self.failed[:10]:
+            self.stderr.write(f"Сценарий прерван на {name}: HTTP {status}")
+        report = self._report(elapsed)
+        if options["save"]:
+            with open(options["save"], "w", encoding="utf-8") as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Результаты сохранены в {options['save']}.")
+        if options["compare"]:
+            regressions = self._compare(
+                report, options["compare"], options["tolerance"]
+            )
+            if regressions:
+                raise CommandError(
+                    "Регрессии относительно "
+                    f"{options['compare']}:\n" + "\n".join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS("Регрессий нет."))
@@ -0,0 +1,335 @@
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from api.constants import PAGE_SIZE
+from recipes.models import Ingredient, Recipe
+from users.models import Follow
+from .bench_api import percentile
+
+User = get_user_model()
+
+BENCH_USERNAME = "bench_asgi"
+SAMPLE_SIZE = 5000
+FOLLOWS = 10
+LIST_PAGES = 5
+MODES = ("wsgi", "asgi")
+STARTUP_TIMEOUT = 30
+
+
+def http_request(path, token=None):
+    lines = [
+        f"GET {path} HTTP/1.1",
+        "Host: localhost",
+        "Accept: application/json",
+        "Connection: close",
+    ]
+    if token:
+        lines.append(f"Authorization: Token {token}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode()
+
+
+async def fetch(port, request, timeout):
+    """Один запрос по новому соединению; статус ответа."""
+    async def exchange():
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        try:
+            writer.write(request)
+            await writer.drain()
+            response = await reader.read()
+        finally:
+            writer.close()
+        return int(response.split(b" ", 2)[1])
+
+    return await asyncio.wait_for(exchange(), timeout)
+
+
+class Server:
+    """gunicorn с одним воркером в режиме SERVER_MODE (gunicorn.conf.py)."""
+
+    def __init__(self, mode, port):
+        self.mode = mode
+        self.port = port
+
+    def __enter__(self):
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py"],
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                "SERVER_MODE": self.mode,
+                "GUNICORN_BIND": f"127.0.0.1:{self.port}",
+                "GUNICORN_WORKERS": "1",
+            },
+            stdout=self.log,
+            stderr=subprocess.STDOUT,
+        )
+        return self
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.log.close()
+
+    def output(self):
+        self.log.seek(0)
+        return self.log.read().decode(errors="replace")[-2000:]
+
+    async def wait_ready(self):
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                if await fetch(self.port, http_request("/metrics"), 5) == 200:
+                    return
+            except (OSError, asyncio.TimeoutError):
+                pass
+            await asyncio.sleep(0.2)
+        raise CommandError(
+            f"Сервер {self.mode} не запустился:\n{self.output()}"
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнение WSGI и ASGI (SERVER_MODE=asgi) по числу одновременных "
+        "соединений на один воркер gunicorn: для каждого уровня "
+        "--connections запросы к читающим эндпоинтам идут по HTTP в течение "
+        "--duration секунд, ёмкость — наибольший уровень без ошибок с p95 "
+        "не выше --latency-budget. Нужна наполненная БД (seed_data)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--connections", default="1,10,50,100,200",
+            help="Уровни одновременных соединений через запятую "
+                 "(по умолчанию 1,10,50,100,200)",
+        )
+        parser.add_argument(
+            "--duration", type=float, default=10,
+            help="Секунд на уровень (по умолчанию 10)",
+        )
+        parser.add_argument(
+            "--warmup", type=float, default=2,
+            help="Секунд прогрева каждого сервера (по умолчанию 2)",
+        )
+        parser.add_argument(
+            "--latency-budget", type=float, default=1000,
+            help="Допустимый p95, мс (по умолчанию 1000)",
+        )
+        parser.add_argument(
+            "--timeout", type=float, default=30,
+            help="Таймаут запроса, с; превышение считается ошибкой",
+        )
+        parser.add_argument(
+            "--modes", default=",".join(MODES),
+            help="Режимы через запятую (по умолчанию wsgi,asgi)",
+        )
+        parser.add_argument(
+            "--port", type=int, default=8765,
+            help="Порт первого сервера, следующие — по порядку",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=1,
+            help="Зерно выбора рецептов и ингредиентов",
+        )
+        parser.add_argument(
+            "--save", help="Сохранить результаты в JSON",
+        )
+
+    def _prepare(self):
+        recipe_ids = list(
+            Recipe.objects.order_by("-pk").values_list("pk", flat=True)[
+                :SAMPLE_SIZE
+            ]
+        )
+        prefixes = sorted({
+            name[:3] for name in Ingredient.objects.values_list(
+                "name", flat=True
+            )[:SAMPLE_SIZE]
+        })
+        if not recipe_ids or not prefixes:
+            raise CommandError(
+                "Мало данных для замера: сначала выполните load_ingredients "
+                "и seed_data."
+            )
+        pages = min(LIST_PAGES, -(-len(recipe_ids) // PAGE_SIZE))
+        user = User.objects.create_user(
+            username=BENCH_USERNAME,
+            email=f"{BENCH_USERNAME}@example.com",
+            password=None,
+            first_name="Замер",
+            last_name="ASGI",
+        )
+        token = Token.objects.create(user=user).key
+        authors = (
+            Recipe.objects.filter(pk__in=recipe_ids[:SAMPLE_SIZE // 10])
+            .order_by()
+            .values_list("author_id", flat=True)
+            .distinct()[:FOLLOWS]
+        )
+        Follow.objects.bulk_create(
+            [Follow(user=user, author_id=author) for author in authors]
+        )
+        # (имя, путь, токен, ожидаемый статус)
+        self.scenarios = [
+            ("recipe_list_anon", lambda rng: "/api/recipes/", None, 200),
+            (
+                "recipe_list",
+                lambda rng: f"/api/recipes/?page={rng.randint(1, pages)}",
+                token, 200,
+            ),
+            (
+                "recipe_detail",
+                lambda rng: f"/api/recipes/{rng.choice(recipe_ids)}/",
+                token, 200,
+            ),
+            (
+                "ingredient_search",
+                lambda rng: "/api/ingredients/?name="
+                + quote(rng.choice(prefixes)),
+                None, 200,
+            ),
+            (
+                "subscriptions",
+                lambda rng: "/api/users/subscriptions/?recipes_limit=3",
+                token, 200,
+            ),
+            (
+                "short_link",
+                lambda rng: f"/s/{rng.choice(recipe_ids)}/",
+                None, 302,
+            ),
+        ]
+
+    def _cleanup(self):
+        # удаление через ORM: сигналы поправят счётчики подписок
+        for user in User.objects.filter(username=BENCH_USERNAME):
+            user.delete()
+
+    async def _client(self, port, rng, deadline, results):
+        while time.monotonic() < deadline:
+            name, path, token, expected = rng.choice(self.scenarios)
+            request = http_request(path(rng), token)
+            started = time.perf_counter()
+            try:
+                ok = await fetch(port, request, self.timeout) == expected
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                ok = False
+            results.append(((time.perf_counter() - started) * 1000, ok))
+
+    async def _level(self, port, connections, duration, seed):
+        results = []
+        deadline = time.monotonic() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            self._client(
+                port, random.Random(f"{seed}:{client}"), deadline, results
+            )
+            for client in range(connections)
+        ))
+        elapsed = time.perf_counter() - started
+        latency = [elapsed_ms for elapsed_ms, _ in results]
+        return {
+            "connections": connections,
+            "requests": len(results),
+            "requests_per_second": round(len(results) / elapsed, 1),
+            "p50": round(statistics.median(latency), 1) if latency else None,
+            "p95": round(percentile(latency, 0.95), 1) if latency else None,
+            "p99": round(percentile(latency, 0.99), 1) if latency else None,
+            "errors": sum(not ok for _, ok in results),
+        }
+
+    async def _run_mode(self, mode, port, levels, options):
+        self.stdout.write(f"{mode.upper()}: один воркер gunicorn, порт {port}")
+        self.stdout.write(
+            f"{'соединений':>11}{'запросов':>10}{'rps':>9}{'p50':>9}"
+            f"{'p95':>9}{'p99':>9}{'ошибок':>8}"
+        )
+        report = []
+        with Server(mode, port) as server:
+            await server.wait_ready()
+            await self._level(port, 1, options["warmup"], "warmup")
+            for connections in levels:
+                level = await self._level(
+                    port, connections, options["duration"], options["seed"]
+                )
+                report.append(level)
+                self.stdout.write(
+                    f"{connections:>11}{level['requests']:>10}"
+                    f"{level['requests_per_second']:>9.1f}"
+                    f"{level['p50'] or 0:>9.1f}{level['p95'] or 0:>9.1f}"
+                    f"{level['p99'] or 0:>9.1f}{level['errors']:>8}"
+                )
+        return report
+
+    def _capacity(self, report, budget):
+        capacity = 0
+        for level in report:
+            if (
+                level["errors"]
+                or level["p95"] is None
+                or level["p95"] > budget
+            ):
+                break
+            capacity = level["connections"]
+        return capacity
+
+    def handle(self, *args, **options):
+        try:
+            levels = sorted({
+                int(value) for value in options["connections"].split(",")
+            })
+        except ValueError:
+            raise CommandError("--connections: ожидались целые числа.")
+        if not levels or levels[0] < 1:
+            raise CommandError("--connections должны быть положительными.")
+        modes = options["modes"].split(",")
+        if set(modes) - set(MODES):
+            raise CommandError(f"--modes: допустимы {', '.join(MODES)}.")
+        self.timeout = options["timeout"]
+        self._cleanup()
+        self._prepare()
+        report = {}
+        try:
+            for number, mode in enumerate(modes):
+                report[mode] = asyncio.run(self._run_mode(
+                    mode, options["port"] + number, levels, options
+                ))
+        finally:
+            self._cleanup()
+        capacity = {
+            mode: self._capacity(levels_report, options["latency_budget"])
+            for mode, levels_report in report.items()
+        }
+        for mode, connections in capacity.items():
+            self.stdout.write(
+                f"Ёмкость {mode.upper()}: {connections} одновременных "
+                f"соединений на воркер (p95 ≤ {options['latency_budget']:g} "
+                "мс, без ошибок)"
+            )
+        if options["save"]:
+            with open(options["save"], "w", encoding="utf-8") as file:
+                json.dump(
+                    {"levels": report, "capacity": capacity},
+                    file, ensure_ascii=False, indent=2,
+                )
+            self.stdout.write(f"Результаты сохранены в {options['save']}.")
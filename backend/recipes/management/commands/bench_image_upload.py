@@ -0,0 +1,105 @@
+import base64
+import io
+import json
+import os
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from PIL import Image
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import RecipeViewSet
+from recipes.models import Ingredient, Recipe
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает пиковую память и время создания рецепта с "
+        "изображением в base64 (JSON) и файлом (multipart/form-data)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--size", type=int, default=1500,
+            help="Сторона тестового изображения в пикселях (по умолчанию 1500)",
+        )
+
+    def _image(self, size):
+        buffer = io.BytesIO()
+        Image.frombytes("RGB", (size, size), os.urandom(size * size * 3)).save(
+            buffer, "JPEG", quality=95
+        )
+        return buffer.getvalue()
+
+    def _measure(self, label, request):
+        view = RecipeViewSet.as_view({"post": "create"})
+        tracemalloc.start()
+        started = time.perf_counter()
+        response = view(request)
+        elapsed = (time.perf_counter() - started) * 1000
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        request.close()
+        if response.status_code != 201:
+            raise CommandError(f"{label}: {response.status_code} {response.data}")
+        recipe = Recipe.objects.get(pk=response.data["id"])
+        default_storage.delete(recipe.image.name)
+        self.stdout.write(
+            f"{label:<10} пик памяти={peak / 1024 / 1024:7.2f} МБ  "
+            f"время={elapsed:7.1f} мс"
+        )
+
+    def handle(self, *args, **options):
+        user = User.objects.order_by("pk").first()
+        ingredient = Ingredient.objects.order_by("pk").first()
+        if user is None or ingredient is None:
+            raise CommandError(
+                "Нужны хотя бы один пользователь и загруженные ингредиенты."
+            )
+        image = self._image(options["size"])
+        self.stdout.write(f"Изображение: {len(image) / 1024 / 1024:.2f} МБ")
+        fields = {
+            "name": "Замер загрузки",
+            "text": "Рецепт для замера загрузки изображения",
+            "cooking_time": 1,
+        }
+        ingredients = [{"id": ingredient.pk, "amount": 1}]
+        factory = APIRequestFactory()
+        json_request = factory.post(
+            "/api/recipes/",
+            {
+                **fields,
+                "ingredients": ingredients,
+                "image": "data:image/jpeg;base64,"
+                + base64.b64encode(image).decode(),
+            },
+            format="json",
+        )
+        multipart_request = factory.post(
+            "/api/recipes/",
+            {
+                **fields,
+                "ingredients": json.dumps(ingredients),
+                "image": io.BytesIO(image),
+            },
+            format="multipart",
+        )
+        for request in (json_request, multipart_request):
+            force_authenticate(request, user=user)
+        try:
+            with transaction.atomic():
+                self._measure("base64", json_request)
+                self._measure("multipart", multipart_request)
+                raise Rollback
+        except Rollback:
+            pass
@@ -0,0 +1,86 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import ingredient_index
+from recipes.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает скорость автодополнения ингредиентов: "
+        "запрос istartswith к БД и in-memory индекс"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--queries", type=int, default=500,
+            help="Количество поисковых запросов (по умолчанию 500)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=42,
+            help="Seed генератора запросов",
+        )
+
+    def _make_queries(self, names, count, seed):
+        rng = random.Random(seed)
+        queries = []
+        for _ in range(count):
+            name = rng.choice(names)
+            query = name[:rng.randint(2, min(len(name), 8))]
+            if len(query) > 4 and rng.random() < 0.2:
+                pos = rng.randrange(1, len(query))
+                query = query[:pos] + query[pos + 1:]
+            queries.append(query)
+        return queries
+
+    def _measure(self, label, queries, search):
+        timings = []
+        results = 0
+        for query in queries:
+            started = time.perf_counter()
+            results += len(search(query))
+            timings.append((time.perf_counter() - started) * 1_000_000)
+        timings.sort()
+        self.stdout.write(
+            f"{label:<8} avg={statistics.mean(timings):9.1f} мкс  "
+            f"p50={timings[len(timings) // 2]:9.1f} мкс  "
+            f"p95={timings[int(len(timings) * 0.95)]:9.1f} мкс  "
+            f"найдено={results}"
+        )
+        return statistics.mean(timings)
+
+    def handle(self, *args, **options):
+        names = list(Ingredient.objects.values_list("name", flat=True))
+        if not names:
+            raise CommandError(
+                "Каталог ингредиентов пуст, выполните load_ingredients."
+            )
+        queries = self._make_queries(
+            names, options["queries"], options["seed"]
+        )
+
+        started = time.perf_counter()
+        ingredient_index.invalidate()
+        index = ingredient_index.get_index()
+        self.stdout.write(
+            f"Индекс: {len(index)} ингредиентов, "
+            f"{len(index.postings)} n-грамм, построен за "
+            f"{(time.perf_counter() - started) * 1000:.1f} мс"
+        )
+
+        orm_avg = self._measure(
+            "ORM",
+            queries,
+            lambda query: list(
+                Ingredient.objects.filter(name__istartswith=query).values(
+                    "id", "name", "measurement_unit"
+                )
+            ),
+        )
+        index_avg = self._measure("index", queries, index.search)
+        self.stdout.write(
+            self.style.SUCCESS(f"Ускорение: x{orm_avg / index_avg:.1f}")
+        )
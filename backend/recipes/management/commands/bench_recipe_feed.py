@@ -0,0 +1,155 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import RecipeViewSet
+from recipes.models import Recipe
+from users.models import Follow
+
+User = get_user_model()
+
+BENCH_PREFIX = "bench_feed_"
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет ленту рецептов подписок (/api/recipes/feed/) при разном "
+        "числе подписок на синтетических данных; данные откатываются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--follows", type=int, default=10000,
+            help="Максимальное число подписок читателя (по умолчанию 10000)",
+        )
+        parser.add_argument(
+            "--recipes-per-author", type=int, default=5,
+            help="Рецептов у каждого автора (по умолчанию 5)",
+        )
+        parser.add_argument(
+            "--requests", type=int, default=50,
+            help="Запросов на каждую точку замера (по умолчанию 50)",
+        )
+        parser.add_argument(
+            "--pages", type=int, default=10,
+            help="На сколько страниц уходить по курсору (по умолчанию 10)",
+        )
+
+    def _generate(self, follows, recipes_per_author):
+        users = User._meta.db_table
+        recipes = Recipe._meta.db_table
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {users} (password, is_superuser, username, "
+                "first_name, last_name, email, is_staff, is_active, "
+                "date_joined) "
+                "SELECT '!', false, %s || g, 'Автор', 'Замера', "
+                "%s || g || '@example.com', false, true, now() "
+                "FROM generate_series(1, %s) g",
+                [BENCH_PREFIX, BENCH_PREFIX, follows],
+            )
+            cursor.execute(
+                f"INSERT INTO {recipes} (author_id, name, image, text, "
+                "cooking_time, pub_date, favorites_count, in_carts_count) "
+                "SELECT u.id, 'Рецепт ' || u.id || '-' || k, "
+                "'recipes/images/bench.png', 'Синтетический рецепт', 10, "
+                "now() - (random() * 365) * interval '1 day', 0, 0 "
+                f"FROM {users} u CROSS JOIN generate_series(1, %s) k "
+                "WHERE u.username LIKE %s",
+                [recipes_per_author, f"{BENCH_PREFIX}%"],
+            )
+            cursor.execute(f"ANALYZE {users}")
+            cursor.execute(f"ANALYZE {recipes}")
+        self.stdout.write(
+            f"Сгенерировано авторов: {follows}, рецептов: "
+            f"{follows * recipes_per_author} "
+            f"за {time.perf_counter() - started:.1f} с"
+        )
+        return list(
+            User.objects.filter(username__startswith=BENCH_PREFIX)
+            .order_by("?")
+            .values_list("pk", flat=True)
+        )
+
+    def _reader(self, author_ids):
+        reader = User.objects.create(
+            username=f"{BENCH_PREFIX}reader_{len(author_ids)}",
+            email=f"{BENCH_PREFIX}reader_{len(author_ids)}@example.com",
+        )
+        Follow.objects.bulk_create(
+            [Follow(user=reader, author_id=pk) for pk in author_ids],
+            batch_size=5000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {Follow._meta.db_table}")
+        return reader
+
+    def _measure(self, reader, requests, pages):
+        factory = APIRequestFactory()
+        view = RecipeViewSet.as_view({"get": "feed"})
+        first, deep, queries = [], [], 0
+        for _ in range(requests):
+            url = "/api/recipes/feed/"
+            for page in range(pages):
+                request = factory.get(url)
+                force_authenticate(request, user=reader)
+                reset_queries()
+                started = time.perf_counter()
+                response = view(request)
+                elapsed = (time.perf_counter() - started) * 1000
+                if response.status_code != 200:
+                    raise CommandError(
+                        f"Лента вернула {response.status_code}."
+                    )
+                (first if page == 0 else deep).append(elapsed)
+                queries = max(queries, len(connection.queries))
+                url = response.data["next"]
+                if url is None:
+                    break
+        return first, deep, queries
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Замер доступен только для PostgreSQL.")
+        if options["follows"] < 1 or options["recipes_per_author"] < 1:
+            raise CommandError(
+                "--follows и --recipes-per-author должны быть положительными."
+            )
+        connection.force_debug_cursor = True
+        try:
+            with transaction.atomic():
+                author_ids = self._generate(
+                    options["follows"], options["recipes_per_author"]
+                )
+                points = sorted({
+                    count
+                    for count in (10, 100, 1000, options["follows"])
+                    if count <= options["follows"]
+                })
+                for count in points:
+                    reader = self._reader(author_ids[:count])
+                    first, deep, queries = self._measure(
+                        reader, options["requests"], options["pages"]
+                    )
+                    deep = deep or first
+                    self.stdout.write(
+                        f"подписок={count:>6}  "
+                        f"p50 первая={statistics.median(first):7.2f} мс  "
+                        f"p50 глубокая={statistics.median(deep):7.2f} мс  "
+                        f"max={max(first + deep):7.2f} мс  "
+                        f"SQL-запросов={queries}"
+                    )
+                raise Rollback
+        except Rollback:
+            self.stdout.write("Синтетические данные откачены.")
+        finally:
+            connection.force_debug_cursor = False
@@ -0,0 +1,159 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.constants import PAGE_SIZE
+from api.filters import RecipeSearchFilter
+from recipes.fixtures_data import DISHES
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class LegacySearchView:
+    """Настройки прежнего поиска: SearchFilter по названию."""
+
+    search_fields = ["name"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает прежний поиск рецептов (ILIKE по названию) "
+        "с полнотекстовым; может сгенерировать синтетические рецепты"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--generate", type=int, default=0,
+            help="Сгенерировать столько рецептов перед замером",
+        )
+        parser.add_argument(
+            "--keep", action="store_true",
+            help="Не откатывать сгенерированные рецепты",
+        )
+        parser.add_argument(
+            "--queries", type=int, default=200,
+            help="Количество поисковых запросов (по умолчанию 200)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=42,
+            help="Seed генератора запросов",
+        )
+
+    def _generate(self, count):
+        author = User.objects.order_by("pk").first()
+        ingredient_ids = list(Ingredient.objects.values_list("pk", flat=True))
+        if author is None or not ingredient_ids:
+            raise CommandError(
+                "Нужны хотя бы один пользователь и загруженные ингредиенты."
+            )
+        recipes = Recipe._meta.db_table
+        amounts = IngredientInRecipe._meta.db_table
+        ingredients = Ingredient._meta.db_table
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {recipes} "
+                "(author_id, name, image, text, cooking_time, pub_date) "
+                "SELECT %s, "
+                "  (%s::text[])[1 + g %% cardinality(%s::text[])] "
+                "  || ' №' || g, "
+                "  'recipes/images/bench.png', "
+                "  'Синтетический рецепт ' || g || ' для замера поиска', "
+                "  1 + g %% 120, now() - g * interval '1 minute' "
+                "FROM generate_series(1, %s) g",
+                [author.pk, list(DISHES), list(DISHES), count],
+            )
+            cursor.execute(
+                f"INSERT INTO {amounts} (recipe_id, ingredient_id, amount) "
+                "SELECT r.id, (%s::bigint[])[1 + (r.id * k) %% %s], 1 + k "
+                f"FROM {recipes} r CROSS JOIN (VALUES (7), (13), (31)) v(k) "
+                f"WHERE r.image = 'recipes/images/bench.png' "
+                "ON CONFLICT DO NOTHING",
+                [ingredient_ids, len(ingredient_ids)],
+            )
+            cursor.execute(f"ANALYZE {recipes}")
+            cursor.execute(f"ANALYZE {amounts}")
+            cursor.execute(f"ANALYZE {ingredients}")
+        call_command("rebuild_search_vectors", "--missing", stdout=self.stdout)
+        with connection.cursor() as cursor:
+            cursor.execute(f"ANALYZE {recipes}")
+        self.stdout.write(
+            f"Сгенерировано рецептов: {count} "
+            f"за {time.perf_counter() - started:.1f} с"
+        )
+
+    def _make_queries(self, count, seed):
+        rng = random.Random(seed)
+        words = [
+            word
+            for name in Ingredient.objects.order_by("?").values_list(
+                "name", flat=True
+            )[:500]
+            for word in name.split()
+            if len(word) >= 3
+        ] + list(DISHES)
+        queries = []
+        for _ in range(count):
+            word = rng.choice(words)
+            queries.append(word[:rng.randint(3, len(word))])
+        return queries
+
+    def _measure(self, label, queries, backend, view):
+        factory = APIRequestFactory()
+        timings = []
+        found = 0
+        for query in queries:
+            request = Request(factory.get("/", {"search": query}))
+            started = time.perf_counter()
+            queryset = backend.filter_queryset(
+                request, Recipe.objects.order_by("-pub_date"), view
+            )
+            found += queryset.count()
+            list(queryset[:PAGE_SIZE])
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        self.stdout.write(
+            f"{label:<10} avg={statistics.mean(timings):8.2f} мс  "
+            f"p50={timings[len(timings) // 2]:8.2f} мс  "
+            f"p95={timings[int(len(timings) * 0.95)]:8.2f} мс  "
+            f"найдено={found}"
+        )
+        return statistics.mean(timings)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Замер доступен только для PostgreSQL.")
+        try:
+            with transaction.atomic():
+                if options["generate"]:
+                    self._generate(options["generate"])
+                self.stdout.write(f"Рецептов: {Recipe.objects.count()}")
+                queries = self._make_queries(
+                    options["queries"], options["seed"]
+                )
+                legacy_avg = self._measure(
+                    "ILIKE", queries, SearchFilter(), LegacySearchView()
+                )
+                fts_avg = self._measure(
+                    "FTS", queries, RecipeSearchFilter(), None
+                )
+                self.stdout.write(
+                    self.style.SUCCESS(f"Ускорение: x{legacy_avg / fts_avg:.1f}")
+                )
+                if options["generate"] and not options["keep"]:
+                    raise Rollback
+        except Rollback:
+            self.stdout.write("Сгенерированные рецепты откачены.")
@@ -0,0 +1,382 @@
+import io
+import json
+import re
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+)
+from recipes.constants import (
+    TRENDING_FAVORITE_WEIGHT,
+    TRENDING_HALF_LIFE_HOURS,
+    TRENDING_RECIPES_LIMIT,
+    TRENDING_SHOPPING_CART_WEIGHT,
+    TRENDING_WINDOW_DAYS,
+)
+from recipes.fixtures_data import ADJECTIVES, DISHES
+from recipes.popularity import COUNTERS
+from recipes import trending
+from users.models import Follow
+
+User = get_user_model()
+
+BASELINE_PATH = Path(__file__).with_name("query_plans.json")
+PREFIX = "plan_"
+# узлы, которые читают вход целиком, даже если выше стоит LIMIT
+BLOCKING_NODES = {
+    "Aggregate", "Hash", "Materialize", "Sort", "SetOp", "WindowAgg",
+}
+# iterator() в PostgreSQL читает через серверный курсор
+DECLARE_CURSOR = re.compile(
+    r'^DECLARE "[^"]+" NO SCROLL CURSOR WITH(?:OUT)? HOLD FOR ', re.I
+)
+# (название, путь, параметры, от имени читателя[, таблицы, которые
+# допустимо читать целиком])
+ENDPOINTS = (
+    ("recipes", "/api/recipes/", {}, False),
+    ("recipes_auth", "/api/recipes/", {}, True),
+    ("recipes_page", "/api/recipes/", {"page": 50}, False),
+    ("recipes_cursor", "/api/recipes/", {"cursor": ""}, False),
+    ("recipes_author", "/api/recipes/", {"author": "{author}"}, False),
+    ("recipes_favorited", "/api/recipes/", {"is_favorited": 1}, True),
+    ("recipes_in_cart", "/api/recipes/", {"is_in_shopping_cart": 1}, True),
+    ("recipes_popular", "/api/recipes/", {"ordering": "-favorites_count"}, False),
+    ("recipes_search", "/api/recipes/", {"search": "грибной салат"}, False),
+    ("recipes_search_prefix", "/api/recipes/", {"search": "гриб сал"}, False),
+    ("recipe_detail", "/api/recipes/{recipe}/", {}, True),
+    ("recipes_feed", "/api/recipes/feed/", {}, True),
+    ("recipes_trending", "/api/recipes/trending/", {}, False),
+    ("shopping_cart_summary", "/api/recipes/shopping_cart_summary/", {}, True),
+    ("download_shopping_cart", "/api/recipes/download_shopping_cart/", {}, True),
+    # COUNT(*) подписок: при сотне подписок планировщик выбирает hash join
+    # по всей таблице пользователей, и по оценке это дешевле, чем сотня
+    # обращений к первичному ключу
+    (
+        "subscriptions", "/api/users/subscriptions/", {"recipes_limit": 3},
+        True, {"users_user"},
+    ),
+    ("subscriptions_cursor", "/api/users/subscriptions/", {"cursor": ""}, True),
+    ("ingredients_search", "/api/ingredients/", {"name": "соль"}, False),
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+def full_scans(plan, bounded=False):
+    """Узлы Seq Scan, которые читают таблицу целиком.
+
+    Чтение под LIMIT без сортировки или агрегации между ними
+    останавливается после нужного числа строк и ошибкой не считается.
+    Внутренняя сторона Nested Loop перечитывается на каждую внешнюю строку.
+    """
+    node_type = plan["Node Type"]
+    if node_type == "Limit":
+        bounded = True
+    elif node_type in BLOCKING_NODES:
+        bounded = False
+    if node_type == "Seq Scan" and not bounded:
+        yield plan
+    for child in plan.get("Plans", ()):
+        yield from full_scans(
+            child,
+            bounded and child.get("Parent Relationship") != "Inner",
+        )
+
+
+class Command(BaseCommand):
+    help = (
+        "Наполняет БД данными реалистичного объёма, вызывает основные "
+        "эндпоинты API и проверяет EXPLAIN их SQL-запросов: нет "
+        "последовательного чтения больших таблиц, стоимость не выросла "
+        "относительно сохранённой. Данные откатываются"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale", type=float, default=1.0,
+            help="Множитель объёма данных (1 — 100 000 рецептов)",
+        )
+        parser.add_argument(
+            "--min-rows", type=int, default=10000,
+            help="Таблица считается большой от стольких строк "
+                 "(по умолчанию 10000)",
+        )
+        parser.add_argument(
+            "--max-cost-ratio", type=float, default=3.0,
+            help="Допустимый рост стоимости плана относительно "
+                 "сохранённой (по умолчанию в 3 раза)",
+        )
+        parser.add_argument(
+            "--baseline", default=str(BASELINE_PATH),
+            help="JSON со стоимостями планов",
+        )
+        parser.add_argument(
+            "--update-baseline", action="store_true",
+            help="Записать текущие стоимости в --baseline",
+        )
+
+    def _seed(self, scale):
+        counts = {
+            "users": int(20000 * scale),
+            "recipes": int(100000 * scale),
+            "favorites": int(200000 * scale),
+            "carts": int(30000 * scale),
+            "follows": int(100000 * scale),
+        }
+        users = User._meta.db_table
+        recipes = Recipe._meta.db_table
+        ingredients = Ingredient._meta.db_table
+        amounts = IngredientInRecipe._meta.db_table
+        follows = Follow._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT setseed(0.42)")
+            cursor.execute(
+                f"INSERT INTO {ingredients} (name, measurement_unit) "
+                "SELECT 'ингредиент ' || g, 'г' FROM generate_series(1, 2000) g "
+                "ON CONFLICT DO NOTHING"
+            )
+            cursor.execute(
+                f"INSERT INTO {users} (password, is_superuser, username, "
+                "first_name, last_name, email, is_staff, is_active, "
+                "date_joined) "
+                "SELECT '!', false, %s || g, 'Имя', 'Фамилия', "
+                "%s || g || '@example.com', false, true, now() "
+                "FROM generate_series(1, %s) g",
+                [PREFIX, PREFIX, counts["users"]],
+            )
+            cursor.execute(
+                f"SELECT min(id), max(id) FROM {users} WHERE username LIKE %s",
+                [f"{PREFIX}%"],
+            )
+            first_user, last_user = cursor.fetchone()
+            # поисковый вектор только по названию: для плана этого достаточно
+            cursor.execute(
+                f"INSERT INTO {recipes} (author_id, name, image, text, "
+                "cooking_time, pub_date, favorites_count, in_carts_count, "
+                "search_vector) "
+                "SELECT author_id, name, 'recipes/images/plan.png', "
+                "'Рецепт для проверки планов', 1 + g %% 120, "
+                "now() - random() * interval '365 days', 0, 0, "
+                "setweight(to_tsvector('russian', name), 'A') || "
+                "setweight(to_tsvector('english', name), 'A') "
+                "FROM (SELECT g, %s + floor(random() * %s)::int AS author_id, "
+                "(%s::text[])[1 + (g / 14) %% cardinality(%s::text[])] "
+                "|| ' ' || "
+                "(%s::text[])[1 + g %% cardinality(%s::text[])] "
+                "|| ' №' || g AS name "
+                "FROM generate_series(1, %s) g) AS generated",
+                [
+                    first_user, counts["users"],
+                    list(ADJECTIVES), list(ADJECTIVES),
+                    list(DISHES), list(DISHES),
+                    counts["recipes"],
+                ],
+            )
+            cursor.execute(f"SELECT id FROM {ingredients}")
+            ingredient_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                f"INSERT INTO {amounts} (recipe_id, ingredient_id, amount) "
+                "SELECT r.id, "
+                "(%s::bigint[])[1 + (r.id * 7 + k * 13) %% %s], 1 + k "
+                f"FROM {recipes} r CROSS JOIN generate_series(1, 5) k "
+                "WHERE r.image = 'recipes/images/plan.png' "
+                "ON CONFLICT DO NOTHING",
+                [ingredient_ids, len(ingredient_ids)],
+            )
+            cursor.execute(
+                f"SELECT min(id) FROM {recipes} "
+                "WHERE image = 'recipes/images/plan.png'"
+            )
+            first_recipe = cursor.fetchone()[0]
+            for model, total in (
+                (Favorite, counts["favorites"]), (ShoppingCart, counts["carts"])
+            ):
+                cursor.execute(
+                    f"INSERT INTO {model._meta.db_table} "
+                    "(user_id, recipe_id, created_at) "
+                    "SELECT %s + floor(random() * %s)::int, "
+                    "%s + floor(random() * %s)::int, "
+                    "now() - random() * interval '30 days' "
+                    "FROM generate_series(1, %s) "
+                    "ON CONFLICT DO NOTHING",
+                    [
+                        first_user, counts["users"],
+                        first_recipe, counts["recipes"], total,
+                    ],
+                )
+            cursor.execute(
+                f"INSERT INTO {follows} (user_id, author_id, created_at) "
+                "SELECT u, a, now() FROM ("
+                "SELECT %s + floor(random() * %s)::int AS u, "
+                "%s + floor(random() * %s)::int AS a "
+                "FROM generate_series(1, %s)"
+                ") pairs WHERE u <> a ON CONFLICT DO NOTHING",
+                [
+                    first_user, counts["users"], first_user, counts["users"],
+                    counts["follows"],
+                ],
+            )
+        reader = User.objects.get(pk=last_user)
+        author = User.objects.get(pk=first_user)
+        sample = list(range(first_recipe, first_recipe + 300))
+        Favorite.objects.bulk_create(
+            [Favorite(user=reader, recipe_id=pk) for pk in sample[:200]],
+            ignore_conflicts=True,
+        )
+        ShoppingCart.objects.bulk_create(
+            [ShoppingCart(user=reader, recipe_id=pk) for pk in sample[200:]],
+            ignore_conflicts=True,
+        )
+        Follow.objects.bulk_create(
+            [
+                Follow(user=reader, author_id=pk)
+                for pk in range(first_user, first_user + 100)
+            ],
+            ignore_conflicts=True,
+        )
+        call_command("rebuild_shopping_lists", stdout=io.StringIO())
+        with connection.cursor() as cursor:
+            for model, counter in COUNTERS.items():
+                cursor.execute(
+                    f"UPDATE {recipes} SET {counter} = counts.total FROM ("
+                    "SELECT recipe_id, count(*) AS total "
+                    f"FROM {model._meta.db_table} GROUP BY recipe_id"
+                    f") AS counts WHERE {recipes}.id = counts.recipe_id"
+                )
+        trending.refresh(
+            TRENDING_HALF_LIFE_HOURS,
+            TRENDING_WINDOW_DAYS,
+            TRENDING_RECIPES_LIMIT,
+            TRENDING_FAVORITE_WEIGHT,
+            TRENDING_SHOPPING_CART_WEIGHT,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.stdout.write(
+            "Данные: " + ", ".join(f"{k}={v}" for k, v in counts.items())
+        )
+        return reader, author, first_recipe
+
+    def _table_rows(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT relname, reltuples FROM pg_class "
+                "WHERE relkind = 'r' AND relnamespace = "
+                "'public'::regnamespace"
+            )
+            return dict(cursor.fetchall())
+
+    def _plans(self, client, path, params):
+        with CaptureQueriesContext(connection) as captured:
+            response = client.get(path, params)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        if response.status_code != 200:
+            raise CommandError(f"{path} вернул {response.status_code}.")
+        plans = []
+        with connection.cursor() as cursor:
+            for query in captured.captured_queries:
+                sql = DECLARE_CURSOR.sub("", query["sql"].lstrip())
+                if not sql.upper().startswith(("SELECT", "(SELECT")):
+                    continue
+                cursor.execute("EXPLAIN (FORMAT JSON) " + sql)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                plans.append(plan[0]["Plan"])
+        return plans
+
+    def _check(self, name, plans, baseline, allowed, table_rows, options):
+        problems = []
+        for number, plan in enumerate(plans, 1):
+            for node in full_scans(plan):
+                relation = node["Relation Name"]
+                if (
+                    relation not in allowed
+                    and table_rows.get(relation, 0) >= options["min_rows"]
+                ):
+                    problems.append(
+                        f"{name}, запрос {number}: Seq Scan по {relation} "
+                        f"(~{int(table_rows[relation])} строк)"
+                    )
+        if baseline is None:
+            return problems
+        if len(plans) > len(baseline):
+            problems.append(
+                f"{name}: SQL-запросов {len(plans)}, было {len(baseline)}"
+            )
+        for number, (plan, cost) in enumerate(zip(plans, baseline), 1):
+            if plan["Total Cost"] > max(cost, 1) * options["max_cost_ratio"]:
+                problems.append(
+                    f"{name}, запрос {number}: стоимость "
+                    f"{plan['Total Cost']:.0f}, было {cost:.0f}"
+                )
+        return problems
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Проверка доступна только для PostgreSQL.")
+        baseline_path = Path(options["baseline"])
+        baseline = {}
+        if baseline_path.exists() and not options["update_baseline"]:
+            baseline = json.loads(baseline_path.read_text())
+        costs, problems = {}, []
+        dummy_cache = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.dummy.DummyCache"
+            }
+        }
+        try:
+            with transaction.atomic(), override_settings(CACHES=dummy_cache):
+                reader, author, recipe = self._seed(options["scale"])
+                table_rows = self._table_rows()
+                anonymous, client = APIClient(), APIClient()
+                client.force_authenticate(reader)
+                for name, path, params, as_reader, *allowed in ENDPOINTS:
+                    params = {
+                        key: str(value).format(author=author.pk)
+                        for key, value in params.items()
+                    }
+                    plans = self._plans(
+                        client if as_reader else anonymous,
+                        path.format(recipe=recipe),
+                        params,
+                    )
+                    costs[name] = [plan["Total Cost"] for plan in plans]
+                    found = self._check(
+                        name, plans, baseline.get(name),
+                        allowed[0] if allowed else set(),
+                        table_rows, options,
+                    )
+                    problems += found
+                    self.stdout.write(
+                        f"{name:<24} запросов={len(plans):>2}  "
+                        f"макс. стоимость={max(costs[name], default=0):>10.1f}"
+                        f"  {'ОШИБКА' if found else 'ok'}"
+                    )
+                raise Rollback
+        except Rollback:
+            pass
+        if options["update_baseline"]:
+            baseline_path.write_text(
+                json.dumps(costs, indent=2, ensure_ascii=False) + "\n"
+            )
+            self.stdout.write(f"Стоимости планов записаны в {baseline_path}")
+        if problems:
+            raise CommandError(
+                "Планы запросов ухудшились:\n" + "\n".join(problems)
+            )
+        self.stdout.write(self.style.SUCCESS("Планы запросов в порядке."))
@@ -1,65 +1,219 @@
+import csv
+import io
 import json
 import os
-from django.core.management.base import BaseCommand
-from django.db import IntegrityError
+import re
+import time
+from itertools import islice
+
 from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.constants import (
+    INGREDIENT_MEASUREMENT_UNIT_MAX_LENGTH,
+    INGREDIENT_NAME_MAX_LENGTH,
+)
 from recipes.models import Ingredient
 
+DEFAULT_BATCH_SIZE = 5000
+READ_CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r"\s*")
 
-class Command(BaseCommand):
-    help = "Загружает ингредиенты из JSON файла в базу данных"
 
-    def handle(self, *args, **options):
-        file_path = os.path.join(settings.BASE_DIR, "data", "ingredients.json")
-        self.stdout.write(self.style.SUCCESS(f"Ищем файл по пути: {file_path}"))
+def normalize(value):
+    return " ".join(value.split()).lower()
 
-        if not os.path.exists(file_path):
-            self.stdout.write(self.style.ERROR(f"Файл {file_path} не найден."))
-            return
 
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                ingredients_data = json.load(f)
-        except json.JSONDecodeError:
-            self.stdout.write(self.style.ERROR(f"Ошибка декодирования JSON в файле {file_path}."))
-            return
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f"Произошла ошибка при чтении файла: {e}"))
+def iter_json_array(file):
+    """Потоково читает JSON-массив объектов, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer, pos = "", 0
+    started = eof = False
+    while True:
+        pos = WHITESPACE.match(buffer, pos).end()
+        if pos < len(buffer):
+            char = buffer[pos]
+            if not started:
+                if char != "[":
+                    raise CommandError("Ожидался JSON-массив объектов.")
+                started = True
+                pos += 1
+                continue
+            if char == ",":
+                pos += 1
+                continue
+            if char == "]":
+                return
+            try:
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise CommandError("Ошибка декодирования JSON.")
+            else:
+                yield item
+                continue
+        elif eof:
+            if started:
+                raise CommandError("JSON-массив не закрыт.")
             return
+        chunk = file.read(READ_CHUNK_SIZE)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+
+def iter_rows(file, file_format):
+    if file_format == "json":
+        for item in iter_json_array(file):
+            if not isinstance(item, dict):
+                yield None
+                continue
+            yield item.get("name"), item.get("measurement_unit")
+    else:
+        for row in csv.reader(file):
+            if row == ["name", "measurement_unit"]:
+                continue
+            yield tuple(row) if len(row) == 2 else None
+
+
+class CsvStream(io.RawIOBase):
+    """Файлоподобный объект, отдающий строки в CSV для COPY FROM STDIN."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.buffer = b""
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            lines = io.StringIO()
+            writer = csv.writer(lines)
+            writer.writerows(islice(self.rows, 1000))
+            chunk = lines.getvalue().encode()
+            if not chunk:
+                break
+            self.buffer += chunk
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
 
-        count_added = 0
-        count_skipped = 0
 
-        for item in ingredients_data:
+class Command(BaseCommand):
+    help = (
+        "Загружает ингредиенты из JSON или CSV файла в базу данных "
+        "пакетами, пропуская уже существующие"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            default=os.path.join(settings.BASE_DIR, "data", "ingredients.csv"),
+            help="Путь к файлу (по умолчанию data/ingredients.csv)",
+        )
+        parser.add_argument(
+            "--format",
+            choices=("json", "csv"),
+            help="Формат файла (по умолчанию определяется по расширению)",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Размер пакета вставки (по умолчанию {DEFAULT_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--copy",
+            action="store_true",
+            help="Загрузить через COPY во временную таблицу (PostgreSQL)",
+        )
+
+    def _clean_rows(self, rows, stats):
+        for row in rows:
+            stats["read"] += 1
             try:
-                name = item["name"].strip().lower()
-                measurement_unit = item["measurement_unit"].strip().lower()
+                name, measurement_unit = (normalize(value) for value in row)
+            except (AttributeError, TypeError):
+                stats["invalid"] += 1
+                continue
+            if (
+                not name
+                or not measurement_unit
+                or len(name) > INGREDIENT_NAME_MAX_LENGTH
+                or len(measurement_unit) > INGREDIENT_MEASUREMENT_UNIT_MAX_LENGTH
+            ):
+                stats["invalid"] += 1
+                continue
+            yield name, measurement_unit
+
+    def _load_batches(self, rows, batch_size):
+        batches = 0
+        while True:
+            batch = [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in islice(rows, batch_size)
+            ]
+            if not batch:
+                return
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+            batches += 1
+            if self.verbosity > 1:
+                self.stdout.write(f"Пакет {batches}: {len(batch)} строк")
 
-                ingredient, created = Ingredient.objects.get_or_create(
-                    name=name,
-                    measurement_unit=measurement_unit,
-                )
+    def _load_copy(self, rows):
+        if connection.vendor != "postgresql":
+            raise CommandError("Режим --copy доступен только для PostgreSQL.")
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMP TABLE ingredient_staging "
+                "(name text, measurement_unit text) ON COMMIT DROP"
+            )
+            cursor.cursor.copy_expert(
+                "COPY ingredient_staging (name, measurement_unit) "
+                "FROM STDIN WITH (FORMAT csv)",
+                CsvStream(rows),
+            )
+            cursor.execute(
+                f"INSERT INTO {table} (name, measurement_unit) "
+                "SELECT DISTINCT name, measurement_unit "
+                "FROM ingredient_staging "
+                "ON CONFLICT (name, measurement_unit) DO NOTHING"
+            )
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        file_path = options["path"]
+        file_format = options["format"] or (
+            "json" if file_path.lower().endswith(".json") else "csv"
+        )
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size должен быть положительным.")
+        if not os.path.exists(file_path):
+            raise CommandError(f"Файл {file_path} не найден.")
+        self.stdout.write(f"Загружаем {file_format.upper()}: {file_path}")
 
-                if created:
-                    self.stdout.write(self.style.SUCCESS(f"Добавлен ингредиент: {ingredient.name}"))
-                    count_added += 1
+        stats = {"read": 0, "invalid": 0}
+        started = time.perf_counter()
+        count_before = Ingredient.objects.count()
+        with open(file_path, encoding="utf-8", newline="") as file:
+            rows = self._clean_rows(iter_rows(file, file_format), stats)
+            with transaction.atomic():
+                if options["copy"]:
+                    self._load_copy(rows)
                 else:
-                    self.stdout.write(self.style.WARNING(f"Ингредиент уже существует (пропущен): {ingredient.name}"))
-                    count_skipped += 1
-
-            except IntegrityError as e:
-                self.stdout.write(self.style.ERROR(f'Ошибка целостности для {item.get("name", "(нет имени")}: {e}'))
-                count_skipped += 1
-            except KeyError:
-                self.stdout.write(self.style.ERROR(f'Отсутствует "name" или "measurement_unit" в записи: {item}'))
-                count_skipped += 1
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Не удалось добавить ингредиент {item.get("name", "(нет имени)")} : {e}'))
-                count_skipped += 1
+                    self._load_batches(rows, options["batch_size"])
+        count_added = Ingredient.objects.count() - count_before
+        elapsed = time.perf_counter() - started
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"Загрузка ингредиентов завершена. Добавлено: {count_added}, "
-                f"Пропущено (уже существовали или ошибка): {count_skipped}"
+                f"Загрузка ингредиентов завершена за {elapsed:.2f} с. "
+                f"Прочитано: {stats['read']}, добавлено: {count_added}, "
+                f"пропущено (уже существовали или дубликаты): "
+                f"{stats['read'] - stats['invalid'] - count_added}, "
+                f"некорректных строк: {stats['invalid']}"
             )
         )
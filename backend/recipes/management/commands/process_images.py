@@ -0,0 +1,85 @@
+import multiprocessing
+import signal
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from recipes.constants import IMAGE_RENDITION_CLAIM_TIMEOUT
+from recipes.models import Recipe
+from recipes.renditions import (
+    delete_stale,
+    release_stale_claims,
+    render_next,
+)
+
+User = get_user_model()
+
+STALE_BATCH_SIZE = 100
+
+
+def work(once, interval):
+    """Цикл одного воркера: копии изображений, затем удаление файлов."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    release_at = 0
+    while True:
+        # строки упавших воркеров: проверка читает таблицу целиком,
+        # поэтому выполняется не чаще раза за таймаут
+        if time.monotonic() >= release_at:
+            release_stale_claims(Recipe.objects.all(), "image")
+            release_stale_claims(User.objects.all(), "avatar")
+            release_at = time.monotonic() + IMAGE_RENDITION_CLAIM_TIMEOUT
+        busy = (
+            render_next(Recipe.objects.all(), "image")
+            or render_next(User.objects.all(), "avatar")
+            or delete_stale(STALE_BATCH_SIZE)
+        )
+        if not busy:
+            if once:
+                return
+            time.sleep(interval)
+
+
+class Command(BaseCommand):
+    help = (
+        "Запускает пул воркеров, которые готовят уменьшенные копии "
+        "изображений рецептов и аватаров и удаляют заменённые файлы"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, default=2,
+            help="Количество процессов-воркеров (по умолчанию 2)",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=2.0,
+            help="Пауза при пустой очереди, секунды (по умолчанию 2)",
+        )
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Обработать очередь и завершиться",
+        )
+
+    def handle(self, *args, **options):
+        if options["workers"] < 1:
+            raise CommandError("--workers должен быть положительным.")
+        # у каждого процесса должно быть своё соединение с БД
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(
+                target=work, args=(options["once"], options["interval"])
+            )
+            for _ in range(options["workers"])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Запущено воркеров: {len(processes)}")
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
+                process.join()
+        self.stdout.write(self.style.SUCCESS("Воркеры остановлены."))
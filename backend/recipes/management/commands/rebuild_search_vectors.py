@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import Recipe
+from recipes.search import update_search_vector
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает поисковые векторы рецептов пакетами по id "
+        "(после загрузки данных в обход ORM)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f"Рецептов в пакете (по умолчанию {DEFAULT_BATCH_SIZE})",
+        )
+        parser.add_argument(
+            "--missing",
+            action="store_true",
+            help="Только рецепты без поискового вектора",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size должен быть положительным.")
+        recipes = Recipe.objects.order_by("pk")
+        if options["missing"]:
+            recipes = recipes.filter(search_vector__isnull=True)
+        last_pk, updated = 0, 0
+        while True:
+            batch = list(
+                recipes.filter(pk__gt=last_pk).values_list("pk", flat=True)[
+                    :batch_size
+                ]
+            )
+            if not batch:
+                break
+            with transaction.atomic():
+                update_search_vector(batch)
+            last_pk = batch[-1]
+            updated += len(batch)
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Обновлено: {updated}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Поисковые векторы пересчитаны: {updated}.")
+        )
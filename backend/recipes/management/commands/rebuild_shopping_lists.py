@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from recipes.models import ShoppingListItem
+from recipes.shopping_list import live_totals
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет агрегированные списки покупок с корзинами и рецептами "
+        "и исправляет расхождения"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только проверить, ничего не исправляя",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            # select_for_update не мешает вставке новых строк: add_recipe
+            # из другой транзакции создал бы строку, которую затем повторно
+            # вставил бы bulk_create. SHARE ROW EXCLUSIVE останавливает
+            # изменения агрегата (и второй запуск команды) до конца
+            # транзакции, чтение списков покупок не блокируется.
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"LOCK TABLE {ShoppingListItem._meta.db_table} "
+                    "IN SHARE ROW EXCLUSIVE MODE"
+                )
+            expected = {
+                (row["recipe__in_shopping_carts_of__user"], row["ingredient"]):
+                    row["total"]
+                for row in live_totals().iterator()
+            }
+            actual = {
+                (user_id, ingredient_id): (pk, amount)
+                for pk, user_id, ingredient_id, amount
+                in ShoppingListItem.objects.values_list(
+                    "pk", "user_id", "ingredient_id", "amount"
+                ).iterator()
+            }
+
+            to_delete = [
+                pk for key, (pk, _) in actual.items() if key not in expected
+            ]
+            to_update = [
+                ShoppingListItem(pk=actual[key][0], amount=total)
+                for key, total in expected.items()
+                if key in actual and actual[key][1] != total
+            ]
+            to_create = [
+                ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id, amount=total
+                )
+                for (user_id, ingredient_id), total in expected.items()
+                if (user_id, ingredient_id) not in actual
+            ]
+            self.stdout.write(
+                f"Строк в агрегате: {len(actual)}, ожидается: {len(expected)}. "
+                f"Лишних: {len(to_delete)}, с неверной суммой: "
+                f"{len(to_update)}, недостающих: {len(to_create)}."
+            )
+            if not (to_delete or to_update or to_create):
+                self.stdout.write(self.style.SUCCESS("Расхождений нет."))
+                return
+            if options["check"]:
+                raise CommandError("Агрегат списков покупок расходится с данными.")
+
+            ShoppingListItem.objects.filter(pk__in=to_delete).delete()
+            ShoppingListItem.objects.bulk_update(
+                to_update, ["amount"], batch_size=1000
+            )
+            ShoppingListItem.objects.bulk_create(to_create, batch_size=1000)
+        self.stdout.write(self.style.SUCCESS("Агрегат списков покупок исправлен."))
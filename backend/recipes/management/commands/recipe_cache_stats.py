@@ -0,0 +1,27 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from api import response_cache
+
+
+class Command(BaseCommand):
+    help = "Показывает попадания и промахи кэша ответов по рецептам"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Обнулить счётчики после вывода",
+        )
+
+    def handle(self, *args, **options):
+        stats = response_cache.stats()
+        total = stats["hits"] + stats["misses"]
+        ratio = stats["hits"] / total * 100 if total else 0
+        self.stdout.write(
+            f"Попаданий: {stats['hits']}, промахов: {stats['misses']}, "
+            f"доля попаданий: {ratio:.1f}%"
+        )
+        if options["reset"]:
+            cache.delete_many((response_cache.HITS_KEY, response_cache.MISSES_KEY))
+            self.stdout.write(self.style.SUCCESS("Счётчики обнулены."))
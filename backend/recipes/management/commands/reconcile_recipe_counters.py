@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from recipes.models import Recipe
+from recipes.popularity import COUNTERS, live_counts
+from recipes.signals import counters_changed
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет счётчики избранного и списков покупок у рецептов "
+        "с таблицами связей и исправляет расхождения"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Только проверить, ничего не исправляя",
+        )
+
+    def handle(self, *args, **options):
+        mismatch = Q()
+        for counter, expression in live_counts().items():
+            mismatch |= ~Q(**{counter: expression})
+        with transaction.atomic():
+            ids = list(
+                Recipe.objects.select_for_update()
+                .filter(mismatch)
+                .values_list("pk", flat=True)
+            )
+            self.stdout.write(
+                f"Рецептов с неверными счётчиками: {len(ids)}."
+            )
+            if not ids:
+                self.stdout.write(self.style.SUCCESS("Расхождений нет."))
+                return
+            if options["check"]:
+                raise CommandError(
+                    "Счётчики популярности расходятся с данными."
+                )
+            Recipe.objects.filter(pk__in=ids).update(**live_counts())
+            counters_changed.send(sender=Recipe, recipe_ids=ids)
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Исправлены счётчики: " + ", ".join(COUNTERS.values()) + "."
+            )
+        )
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.constants import (
+    TRENDING_FAVORITE_WEIGHT,
+    TRENDING_HALF_LIFE_HOURS,
+    TRENDING_RECIPES_LIMIT,
+    TRENDING_SHOPPING_CART_WEIGHT,
+    TRENDING_WINDOW_DAYS,
+)
+from recipes.trending import refresh
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает тренды рецептов по недавним добавлениям "
+        "в избранное и списки покупок"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--half-life", type=float, default=TRENDING_HALF_LIFE_HOURS,
+            help="Период полураспада веса события, часы "
+                 f"(по умолчанию {TRENDING_HALF_LIFE_HOURS})",
+        )
+        parser.add_argument(
+            "--window", type=int, default=TRENDING_WINDOW_DAYS,
+            help="Учитывать события за последние N дней "
+                 f"(по умолчанию {TRENDING_WINDOW_DAYS})",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=TRENDING_RECIPES_LIMIT,
+            help="Сколько мест хранить "
+                 f"(по умолчанию {TRENDING_RECIPES_LIMIT})",
+        )
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Повторять пересчёт каждые N секунд (по умолчанию один раз)",
+        )
+
+    def handle(self, *args, **options):
+        if options["half_life"] <= 0 or options["window"] < 1:
+            raise CommandError(
+                "--half-life и --window должны быть положительными."
+            )
+        if options["limit"] < 1:
+            raise CommandError("--limit должен быть положительным.")
+        while True:
+            started = time.perf_counter()
+            count = refresh(
+                options["half_life"],
+                options["window"],
+                options["limit"],
+                TRENDING_FAVORITE_WEIGHT,
+                TRENDING_SHOPPING_CART_WEIGHT,
+            )
+            self.stdout.write(
+                f"Рецептов в трендах: {count}, "
+                f"{(time.perf_counter() - started) * 1000:.0f} мс."
+            )
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,476 @@
+import bisect
+import io
+import itertools
+import json
+import os
+import random
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image
+
+from api import response_cache
+from recipes import renditions, search, trending
+from recipes.constants import (
+    TRENDING_FAVORITE_WEIGHT,
+    TRENDING_HALF_LIFE_HOURS,
+    TRENDING_RECIPES_LIMIT,
+    TRENDING_SHOPPING_CART_WEIGHT,
+    TRENDING_WINDOW_DAYS,
+)
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingListItem,
+)
+from recipes.fixtures_data import ADJECTIVES, DISHES
+from recipes.popularity import live_counts
+from recipes.storage import content_addressed_storage
+from users.models import Follow
+from .load_ingredients import CsvStream
+
+User = get_user_model()
+
+FIRST_NAMES = (
+    "Анна", "Иван", "Мария", "Пётр", "Ольга", "Сергей", "Елена", "Дмитрий",
+)
+LAST_NAMES = (
+    "Иванова", "Смирнов", "Кузнецова", "Попов", "Соколова", "Лебедев",
+)
+PUB_DATE_DAYS = 365
+RELATION_DAYS = 90
+DERIVED_BATCH_SIZE = 10000
+
+
+class Zipf:
+    """Случайные значения с вероятностью, пропорциональной 1 / ранг ** s.
+
+    Ранги раздаются значениям в случайном порядке, поэтому популярные
+    авторы и рецепты не совпадают с первыми id.
+    """
+
+    def __init__(self, values, exponent, rng):
+        self.values = array("q", values)
+        rng.shuffle(self.values)
+        self.cumulative = array(
+            "d",
+            itertools.accumulate(
+                rank ** -exponent for rank in range(1, len(self.values) + 1)
+            ),
+        )
+
+    def sample(self, rng):
+        return self.values[
+            bisect.bisect_left(
+                self.cumulative, rng.random() * self.cumulative[-1]
+            )
+        ]
+
+    def distinct(self, rng, count, exclude=None):
+        """До count разных значений (кроме exclude)."""
+        chosen = set()
+        for _ in range(count * 20):
+            if len(chosen) == count:
+                break
+            value = self.sample(rng)
+            if value != exclude:
+                chosen.add(value)
+        return chosen
+
+
+def quotas(total, owners, exponent, cap, rng):
+    """Число связей у каждого из owners владельцев, в сумме около total.
+
+    Активность распределена по Zipf, но не больше cap на владельца:
+    то, что не поместилось у самых активных, делится между остальными.
+    """
+    weights = [rank ** -exponent for rank in range(1, owners + 1)]
+    remaining, capped = sum(weights), 0
+    scale = 0
+    while capped < owners:
+        scale = (total - capped * cap) / remaining
+        if weights[capped] * scale <= cap:
+            break
+        remaining -= weights[capped]
+        capped += 1
+    result = []
+    for rank, weight in enumerate(weights):
+        expected = cap if rank < capped else weight * scale
+        whole = int(expected)
+        result.append(whole + (rng.random() < expected - whole))
+    rng.shuffle(result)
+    return result
+
+
+def reserve_ids(model, count):
+    """Первый id из count id, зарезервированных в последовательности."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT pg_get_serial_sequence(%s, 'id')", [model._meta.db_table]
+        )
+        sequence = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT setval(%s, nextval(%s) + %s - 1) - %s + 1",
+            [sequence, sequence, count, count],
+        )
+        return cursor.fetchone()[0]
+
+
+def copy_rows(model, columns, rows):
+    with connection.cursor() as cursor:
+        cursor.cursor.copy_expert(
+            f"COPY {model._meta.db_table} ({', '.join(columns)}) "
+            "FROM STDIN WITH (FORMAT csv)",
+            CsvStream(iter(rows)),
+        )
+    return len(rows)
+
+
+class Command(BaseCommand):
+    help = (
+        "Генерирует пользователей, рецепты, ингредиенты рецептов, "
+        "избранное, корзины и подписки с распределением Zipf для "
+        "нагрузочных проверок. Данные пишутся через COPY параллельными "
+        "пакетами и одинаковы при одинаковом --seed"
+    )
+
+    def add_arguments(self, parser):
+        for name, default, help_text in (
+            ("users", 100000, "Пользователей"),
+            ("recipes", 1000000, "Рецептов"),
+            ("favorites", 1000000, "Записей избранного"),
+            ("carts", 200000, "Рецептов в корзинах"),
+            ("follows", 500000, "Подписок"),
+        ):
+            parser.add_argument(
+                f"--{name}", type=int, default=default,
+                help=f"{help_text} (по умолчанию {default})",
+            )
+        parser.add_argument(
+            "--ingredients", default="3-12",
+            help="Ингредиентов в рецепте, от-до (по умолчанию 3-12)",
+        )
+        parser.add_argument(
+            "--zipf", type=float, default=1.0,
+            help="Показатель распределения Zipf (по умолчанию 1.0)",
+        )
+        parser.add_argument(
+            "--max-per-user", type=int, default=2000,
+            help="Предел избранного, корзины и подписок у одного "
+                 "пользователя (по умолчанию 2000)",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=1,
+            help="Зерно генератора; входит в имена пользователей "
+                 "(по умолчанию 1)",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=min(os.cpu_count() or 1, 8),
+            help="Параллельных соединений с БД",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=50000,
+            help="Строк в одном COPY (по умолчанию 50000)",
+        )
+
+    def _parse_options(self, options):
+        try:
+            low, high = map(int, options["ingredients"].split("-"))
+        except ValueError:
+            raise CommandError("--ingredients задаётся как от-до, например 3-12.")
+        if not 1 <= low <= high:
+            raise CommandError("--ingredients: нужно 1 <= от <= до.")
+        if min(options["users"], options["recipes"]) < 2:
+            raise CommandError("Нужно хотя бы два пользователя и два рецепта.")
+        if min(
+            options["favorites"], options["carts"], options["follows"]
+        ) < 0:
+            raise CommandError("Объёмы связей не могут быть отрицательными.")
+        if min(
+            options["workers"], options["chunk_size"], options["max_per_user"]
+        ) < 1:
+            raise CommandError(
+                "--workers, --chunk-size и --max-per-user должны быть "
+                "положительными."
+            )
+        if options["zipf"] <= 0:
+            raise CommandError("--zipf должен быть положительным.")
+        return low, high
+
+    def _run(self, title, tasks):
+        """Выполняет задачи в пуле потоков; у каждого потока своё соединение."""
+        def run(task):
+            function, *args = task
+            try:
+                with transaction.atomic():
+                    return function(*args)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(self.workers) as pool:
+            rows = sum(pool.map(run, tasks))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{title}: {rows} строк за {elapsed:.1f} с "
+            f"({rows / max(elapsed, 1e-6):.0f} строк/с)"
+        )
+        return rows
+
+    def _rng(self, *parts):
+        return random.Random(":".join(map(str, (self.seed, *parts))))
+
+    def _timestamp(self, rng, days):
+        return (
+            self.now - timedelta(seconds=rng.random() * days * 86400)
+        ).isoformat()
+
+    def _placeholder_image(self):
+        """Одна картинка на все рецепты и её уже готовые копии."""
+        buffer = io.BytesIO()
+        Image.new("RGB", (1200, 800), (230, 180, 120)).save(buffer, "PNG")
+        recipe = Recipe(
+            image=content_addressed_storage.save(
+                "recipes/images/seed.png", ContentFile(buffer.getvalue())
+            )
+        )
+        return recipe.image.name, renditions.render(recipe.image)
+
+    def _users(self, first_id, start, stop):
+        rng = self._rng("users", start)
+        rows = [
+            (
+                first_id + index, "!", False, f"{self.prefix}{index}",
+                rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES),
+                f"{self.prefix}{index}@example.com", False, True,
+                self._timestamp(rng, PUB_DATE_DAYS),
+            )
+            for index in range(start, stop)
+        ]
+        return copy_rows(
+            User,
+            (
+                "id", "password", "is_superuser", "username", "first_name",
+                "last_name", "email", "is_staff", "is_active", "date_joined",
+            ),
+            rows,
+        )
+
+    def _recipes(self, first_id, start, stop):
+        """Рецепты и их ингредиенты; текст упоминает ингредиенты."""
+        rng = self._rng("recipes", start)
+        recipes, amounts = [], []
+        for index in range(start, stop):
+            recipe_id = first_id + index
+            chosen = sorted(
+                self.ingredients.distinct(
+                    rng, rng.randint(*self.ingredients_per_recipe)
+                )
+            )
+            amounts.extend(
+                (recipe_id, ingredient_id, rng.randint(1, 500))
+                for ingredient_id in chosen
+            )
+            names = ", ".join(self.ingredient_names[pk] for pk in chosen)
+            recipes.append((
+                recipe_id,
+                self.authors.sample(rng),
+                f"{rng.choice(ADJECTIVES)} {rng.choice(DISHES)} №{index}",
+                self.image,
+                self.image_renditions,
+                f"Смешайте {names} и готовьте до готовности.",
+                rng.randint(1, 180),
+                self._timestamp(rng, PUB_DATE_DAYS),
+                0,
+                0,
+            ))
+        copy_rows(
+            Recipe,
+            (
+                "id", "author_id", "name", "image", "image_renditions",
+                "text", "cooking_time", "pub_date", "favorites_count",
+                "in_carts_count",
+            ),
+            recipes,
+        )
+        return len(recipes) + copy_rows(
+            IngredientInRecipe,
+            ("recipe_id", "ingredient_id", "amount"),
+            amounts,
+        )
+
+    def _relations(self, model, targets, start, owner_quotas):
+        rng = self._rng(model._meta.model_name, start)
+        owner_field = "user_id"
+        target_field = "author_id" if model is Follow else "recipe_id"
+        rows = []
+        for offset, quota in enumerate(owner_quotas):
+            owner = self.first_user + start + offset
+            rows.extend(
+                (owner, target, self._timestamp(rng, RELATION_DAYS))
+                for target in sorted(
+                    targets.distinct(
+                        rng, quota, owner if model is Follow else None
+                    )
+                )
+            )
+        return copy_rows(
+            model, (owner_field, target_field, "created_at"), rows
+        )
+
+    def _relation_tasks(self, model, total, targets, targets_count):
+        cap = min(self.max_per_user, targets_count // 2)
+        if total > cap * self.users:
+            raise CommandError(
+                f"{model._meta.verbose_name_plural}: {total} не помещается "
+                f"при {self.users} пользователях и пределе {cap} на "
+                "пользователя."
+            )
+        owner_quotas = quotas(
+            total, self.users, self.exponent, cap, self._rng("quotas", model._meta.model_name)
+        )
+        tasks, start, rows = [], 0, 0
+        for index, quota in enumerate(owner_quotas):
+            rows += quota
+            if rows >= self.chunk_size or index == len(owner_quotas) - 1:
+                tasks.append((
+                    self._relations, model, targets, start,
+                    owner_quotas[start:index + 1],
+                ))
+                start, rows = index + 1, 0
+        return tasks
+
+    def _search_vectors(self, start, stop):
+        search.update_search_vector(range(start, stop))
+        return stop - start
+
+    def _counters(self, start, stop):
+        return Recipe.objects.filter(pk__range=(start, stop - 1)).update(
+            **live_counts()
+        )
+
+    def _shopping_lists(self, start, stop):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {ShoppingListItem._meta.db_table} "
+                "(user_id, ingredient_id, amount) "
+                "SELECT cart.user_id, amounts.ingredient_id, "
+                "SUM(amounts.amount) "
+                f"FROM {ShoppingCart._meta.db_table} cart "
+                f"JOIN {IngredientInRecipe._meta.db_table} amounts "
+                "ON amounts.recipe_id = cart.recipe_id "
+                "WHERE cart.user_id >= %s AND cart.user_id < %s "
+                "GROUP BY cart.user_id, amounts.ingredient_id",
+                [start, stop],
+            )
+            return cursor.rowcount
+
+    @staticmethod
+    def _ranges(start, stop, size):
+        return [
+            (bound, min(bound + size, stop))
+            for bound in range(start, stop, size)
+        ]
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Генерация доступна только для PostgreSQL.")
+        self.ingredients_per_recipe = self._parse_options(options)
+        self.seed = options["seed"]
+        self.users = options["users"]
+        self.exponent = options["zipf"]
+        self.max_per_user = options["max_per_user"]
+        self.workers = options["workers"]
+        self.chunk_size = options["chunk_size"]
+        self.prefix = f"seed{self.seed}_"
+        self.ingredient_names = dict(
+            Ingredient.objects.order_by("pk").values_list("pk", "name")
+        )
+        if len(self.ingredient_names) < self.ingredients_per_recipe[1]:
+            raise CommandError(
+                "Ингредиентов в БД меньше, чем нужно на рецепт: сначала "
+                "выполните load_ingredients."
+            )
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(
+                f"Данные с --seed {self.seed} уже загружены; выберите "
+                "другое зерно."
+            )
+        started = time.perf_counter()
+        self.now = timezone.now()
+        rng = self._rng("ranks")
+        self.first_user = reserve_ids(User, self.users)
+        first_recipe = reserve_ids(Recipe, options["recipes"])
+        user_ids = range(self.first_user, self.first_user + self.users)
+        recipe_ids = range(first_recipe, first_recipe + options["recipes"])
+        # одни и те же ранги: плодовитые авторы чаще получают подписчиков
+        self.authors = Zipf(user_ids, self.exponent, rng)
+        recipes_by_popularity = Zipf(recipe_ids, self.exponent, rng)
+        self.ingredients = Zipf(self.ingredient_names, self.exponent, rng)
+        self.image, image_renditions = self._placeholder_image()
+        self.image_renditions = json.dumps(image_renditions)
+
+        self._run("Пользователи", [
+            (self._users, self.first_user, start, stop)
+            for start, stop in self._ranges(0, self.users, self.chunk_size)
+        ])
+        average = sum(self.ingredients_per_recipe) / 2 + 1
+        self._run("Рецепты и ингредиенты рецептов", [
+            (self._recipes, first_recipe, start, stop)
+            for start, stop in self._ranges(
+                0, options["recipes"], max(int(self.chunk_size / average), 1)
+            )
+        ])
+        self._run("Избранное, корзины и подписки", [
+            *self._relation_tasks(
+                Favorite, options["favorites"], recipes_by_popularity,
+                options["recipes"],
+            ),
+            *self._relation_tasks(
+                ShoppingCart, options["carts"], recipes_by_popularity,
+                options["recipes"],
+            ),
+            *self._relation_tasks(
+                Follow, options["follows"], self.authors, self.users,
+            ),
+        ])
+        recipe_batches = self._ranges(
+            recipe_ids.start, recipe_ids.stop, DERIVED_BATCH_SIZE
+        )
+        self._run("Поисковые векторы", [
+            (self._search_vectors, start, stop)
+            for start, stop in recipe_batches
+        ])
+        self._run("Счётчики популярности", [
+            (self._counters, start, stop) for start, stop in recipe_batches
+        ])
+        self._run("Списки покупок", [
+            (self._shopping_lists, start, stop)
+            for start, stop in self._ranges(
+                user_ids.start, user_ids.stop, DERIVED_BATCH_SIZE
+            )
+        ])
+        trending.refresh(
+            TRENDING_HALF_LIFE_HOURS, TRENDING_WINDOW_DAYS,
+            TRENDING_RECIPES_LIMIT, TRENDING_FAVORITE_WEIGHT,
+            TRENDING_SHOPPING_CART_WEIGHT,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        response_cache.bump()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Данные с --seed {self.seed} загружены за "
+                f"{time.perf_counter() - started:.1f} с."
+            )
+        )
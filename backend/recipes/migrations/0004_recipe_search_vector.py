@@ -0,0 +1,54 @@
+# Generated by Django 5.0.6 on 2026-10-18 04:19
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+# копия recipes.search.search_vector_expression на момент миграции
+SEARCH_CONFIGS = ("russian", "english")
+
+
+def fill_search_vectors(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    IngredientInRecipe = apps.get_model("recipes", "IngredientInRecipe")
+    ingredient_names = Subquery(
+        IngredientInRecipe.objects.filter(recipe=OuterRef("pk"))
+        .order_by()
+        .values("recipe")
+        .annotate(names=StringAgg("ingredient__name", " "))
+        .values("names")
+    )
+    vector = None
+    for config in SEARCH_CONFIGS:
+        part = (
+            SearchVector("name", weight="A", config=config)
+            + SearchVector("text", weight="B", config=config)
+            + SearchVector(ingredient_names, weight="C", config=config)
+        )
+        vector = part if vector is None else vector + part
+    Recipe.objects.update(search_vector=vector)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_shoppinglistitem'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='recipe_search_vector_gin'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.6 on 2026-10-18 04:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaleFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Путь в хранилище')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата постановки в очередь')),
+            ],
+            options={
+                'verbose_name': 'Файл на удаление',
+                'verbose_name_plural': 'Файлы на удаление',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='image_renditions',
+            field=models.JSONField(blank=True, editable=False, null=True, verbose_name='Уменьшенные копии изображения'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(('image_renditions__isnull', True)), fields=['id'], name='recipe_renditions_pending_idx'),
+        ),
+    ]
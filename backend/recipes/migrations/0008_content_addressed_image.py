@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 04:33
+
+import recipes.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(db_index=True, storage=recipes.storage.get_image_storage, upload_to='recipes/images/', verbose_name='Картинка рецепта'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.6 on 2026-10-18 04:35
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+
+    def count(model_name):
+        model = apps.get_model("recipes", model_name)
+        return Coalesce(
+            Subquery(
+                model.objects.filter(recipe=OuterRef("pk"))
+                .order_by()
+                .values("recipe")
+                .annotate(total=Count("pk"))
+                .values("total")
+            ),
+            Value(0),
+        )
+
+    Recipe.objects.update(
+        favorites_count=count("Favorite"),
+        in_carts_count=count("ShoppingCart"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_content_addressed_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_count_idx'),
+        ),
+    ]
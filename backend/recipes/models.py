@@ -1,6 +1,9 @@
-from django.db import models
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
+from django.db import models
+from django.db.models.functions import Upper
 
 from .constants import (
     INGREDIENT_VERBOSE_NAME,
@@ -17,6 +20,16 @@ from .constants import (
     RECIPE_INGREDIENTS_FIELD,
     RECIPE_COOKING_TIME_FIELD,
     RECIPE_PUB_DATE_FIELD,
+    RECIPE_SEARCH_VECTOR_FIELD,
+    RECIPE_IMAGE_RENDITIONS_FIELD,
+    RECIPE_FAVORITES_COUNT_FIELD,
+    RECIPE_IN_CARTS_COUNT_FIELD,
+    RECIPE_FAVORITES_COUNT_INDEX_NAME,
+    RECIPE_RENDITIONS_PENDING_INDEX_NAME,
+    RECIPE_PUB_DATE_ID_INDEX_NAME,
+    RECIPE_AUTHOR_PUB_DATE_ID_INDEX_NAME,
+    RECIPE_SEARCH_VECTOR_INDEX_NAME,
+    RECIPE_NAME_TRIGRAM_INDEX_NAME,
     INGREDIENT_IN_RECIPE_VERBOSE_NAME,
     INGREDIENT_IN_RECIPE_VERBOSE_NAME_PLURAL,
     INGREDIENT_IN_RECIPE_RECIPE_FIELD,
@@ -27,20 +40,39 @@ from .constants import (
     FAVORITE_VERBOSE_NAME_PLURAL,
     FAVORITE_USER_FIELD,
     FAVORITE_RECIPE_FIELD,
+    FAVORITE_CREATED_AT_FIELD,
     FAVORITE_UNIQUE_CONSTRAINT_NAME,
     FAVORITE_STR_FORMAT,
     SHOPPING_CART_VERBOSE_NAME,
     SHOPPING_CART_VERBOSE_NAME_PLURAL,
     SHOPPING_CART_USER_FIELD,
     SHOPPING_CART_RECIPE_FIELD,
+    SHOPPING_CART_CREATED_AT_FIELD,
     SHOPPING_CART_UNIQUE_CONSTRAINT_NAME,
     SHOPPING_CART_STR_FORMAT,
+    SHOPPING_LIST_ITEM_VERBOSE_NAME,
+    SHOPPING_LIST_ITEM_VERBOSE_NAME_PLURAL,
+    SHOPPING_LIST_ITEM_USER_FIELD,
+    SHOPPING_LIST_ITEM_INGREDIENT_FIELD,
+    SHOPPING_LIST_ITEM_AMOUNT_FIELD,
+    SHOPPING_LIST_ITEM_UNIQUE_CONSTRAINT_NAME,
+    STALE_FILE_VERBOSE_NAME,
+    STALE_FILE_VERBOSE_NAME_PLURAL,
+    STALE_FILE_NAME_FIELD,
+    STALE_FILE_CREATED_AT_FIELD,
     INGREDIENT_NAME_MAX_LENGTH,
     INGREDIENT_MEASUREMENT_UNIT_MAX_LENGTH,
     RECIPE_NAME_MAX_LENGTH,
+    STALE_FILE_NAME_MAX_LENGTH,
+    TRENDING_RECIPE_VERBOSE_NAME,
+    TRENDING_RECIPE_VERBOSE_NAME_PLURAL,
+    TRENDING_RECIPE_RECIPE_FIELD,
+    TRENDING_RECIPE_SCORE_FIELD,
+    TRENDING_RECIPE_RANK_FIELD,
     RECIPE_COOKING_TIME_MIN_VALUE,
     INGREDIENT_AMOUNT_MIN_VALUE,
 )
+from .storage import get_image_storage
 
 User = get_user_model()
 
@@ -76,6 +108,8 @@ class Recipe(models.Model):
         on_delete=models.CASCADE,
         related_name="recipes",
         verbose_name=RECIPE_AUTHOR_FIELD,
+        # поиск по автору покрывает индекс (author, -pub_date, id)
+        db_index=False,
     )
     name = models.CharField(
         RECIPE_NAME_FIELD,
@@ -83,7 +117,12 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         RECIPE_IMAGE_FIELD,
-        upload_to="recipes/images/"
+        upload_to="recipes/images/",
+        storage=get_image_storage,
+        db_index=True,
+    )
+    image_renditions = models.JSONField(
+        RECIPE_IMAGE_RENDITIONS_FIELD, null=True, blank=True, editable=False
     )
     text = models.TextField(RECIPE_TEXT_FIELD)
     ingredients = models.ManyToManyField(
@@ -97,15 +136,67 @@ class Recipe(models.Model):
         validators=[MinValueValidator(RECIPE_COOKING_TIME_MIN_VALUE)]
     )
     pub_date = models.DateTimeField(RECIPE_PUB_DATE_FIELD, auto_now_add=True)
+    search_vector = SearchVectorField(
+        RECIPE_SEARCH_VECTOR_FIELD, null=True, editable=False
+    )
+    # поддерживаются recipes.popularity в транзакции изменения связи
+    favorites_count = models.PositiveIntegerField(
+        RECIPE_FAVORITES_COUNT_FIELD, default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        RECIPE_IN_CARTS_COUNT_FIELD, default=0, editable=False
+    )
 
     class Meta:
         verbose_name = RECIPE_VERBOSE_NAME
         verbose_name_plural = RECIPE_VERBOSE_NAME_PLURAL
         ordering = ["-pub_date"]
+        indexes = [
+            models.Index(
+                fields=["-pub_date", "id"],
+                name=RECIPE_PUB_DATE_ID_INDEX_NAME,
+            ),
+            # лента подписок и рецепты автора
+            models.Index(
+                fields=["author", "-pub_date", "id"],
+                name=RECIPE_AUTHOR_PUB_DATE_ID_INDEX_NAME,
+            ),
+            # admin добавляет -pk к сортировке, API сортирует по префиксу
+            models.Index(
+                fields=["-favorites_count", "-id"],
+                name=RECIPE_FAVORITES_COUNT_INDEX_NAME,
+            ),
+            models.Index(
+                fields=["id"],
+                condition=models.Q(image_renditions__isnull=True),
+                name=RECIPE_RENDITIONS_PENDING_INDEX_NAME,
+            ),
+            GinIndex(
+                fields=["search_vector"],
+                name=RECIPE_SEARCH_VECTOR_INDEX_NAME,
+            ),
+            # icontains в PostgreSQL сравнивает UPPER(name) LIKE UPPER(...)
+            GinIndex(
+                OpClass(Upper("name"), name="gin_trgm_ops"),
+                name=RECIPE_NAME_TRIGRAM_INDEX_NAME,
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.image and not self.image._committed:
+            # имя файла становится известно только после записи в хранилище
+            self.image.save(self.image.name, self.image.file, save=False)
+        if (
+            self.image_renditions
+            and self.image_renditions.get("source") != self.image.name
+        ):
+            # изображение сменилось: копии сделает воркер process_images
+            self.image_renditions = None
+        super().save(*args, **kwargs)
+
 
 class IngredientInRecipe(models.Model):
     recipe = models.ForeignKey(
@@ -148,6 +239,8 @@ class Favorite(models.Model):
         on_delete=models.CASCADE,
         related_name="favorite_recipes",
         verbose_name=FAVORITE_USER_FIELD,
+        # покрывается уникальным ограничением (user, ...)
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Recipe,
@@ -155,6 +248,9 @@ class Favorite(models.Model):
         related_name="favorited_by",
         verbose_name=FAVORITE_RECIPE_FIELD,
     )
+    created_at = models.DateTimeField(
+        FAVORITE_CREATED_AT_FIELD, auto_now_add=True, db_index=True
+    )
 
     class Meta:
         verbose_name = FAVORITE_VERBOSE_NAME
@@ -175,6 +271,8 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         related_name="shopping_cart_recipes",
         verbose_name=SHOPPING_CART_USER_FIELD,
+        # покрывается уникальным ограничением (user, ...)
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Recipe,
@@ -182,6 +280,9 @@ class ShoppingCart(models.Model):
         related_name="in_shopping_carts_of",
         verbose_name=SHOPPING_CART_RECIPE_FIELD,
     )
+    created_at = models.DateTimeField(
+        SHOPPING_CART_CREATED_AT_FIELD, auto_now_add=True, db_index=True
+    )
 
     class Meta:
         verbose_name = SHOPPING_CART_VERBOSE_NAME
@@ -194,3 +295,80 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return SHOPPING_CART_STR_FORMAT.format(self.user.username, self.recipe.name)
+
+
+class ShoppingListItem(models.Model):
+    """Сумма ингредиента по всем рецептам в списке покупок пользователя.
+
+    Поддерживается при добавлении и удалении рецептов из ShoppingCart
+    и при изменении ингредиентов рецепта (см. recipes.shopping_list).
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="shopping_list_items",
+        verbose_name=SHOPPING_LIST_ITEM_USER_FIELD,
+        # покрывается уникальным ограничением (user, ...)
+        db_index=False,
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name="shopping_list_items",
+        verbose_name=SHOPPING_LIST_ITEM_INGREDIENT_FIELD,
+    )
+    amount = models.PositiveIntegerField(SHOPPING_LIST_ITEM_AMOUNT_FIELD)
+
+    class Meta:
+        verbose_name = SHOPPING_LIST_ITEM_VERBOSE_NAME
+        verbose_name_plural = SHOPPING_LIST_ITEM_VERBOSE_NAME_PLURAL
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient"],
+                name=SHOPPING_LIST_ITEM_UNIQUE_CONSTRAINT_NAME,
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.ingredient} — {self.amount}"
+
+
+class StaleFile(models.Model):
+    """Файл хранилища, который воркер process_images удалит в фоне."""
+
+    name = models.CharField(
+        STALE_FILE_NAME_FIELD, max_length=STALE_FILE_NAME_MAX_LENGTH, unique=True
+    )
+    created_at = models.DateTimeField(
+        STALE_FILE_CREATED_AT_FIELD, auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = STALE_FILE_VERBOSE_NAME
+        verbose_name_plural = STALE_FILE_VERBOSE_NAME_PLURAL
+
+    def __str__(self):
+        return self.name
+
+
+class TrendingRecipe(models.Model):
+    """Место рецепта в трендах; таблицу целиком заменяет refresh_trending."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="trending",
+        verbose_name=TRENDING_RECIPE_RECIPE_FIELD,
+    )
+    score = models.FloatField(TRENDING_RECIPE_SCORE_FIELD)
+    rank = models.PositiveIntegerField(TRENDING_RECIPE_RANK_FIELD, unique=True)
+
+    class Meta:
+        verbose_name = TRENDING_RECIPE_VERBOSE_NAME
+        verbose_name_plural = TRENDING_RECIPE_VERBOSE_NAME_PLURAL
+        ordering = ["rank"]
+
+    def __str__(self):
+        return f"{self.rank}. {self.recipe_id}"
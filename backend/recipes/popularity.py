@@ -0,0 +1,54 @@
+"""Счётчики популярности рецепта: favorites_count и in_carts_count.
+
+Счётчики меняются выражением F() в той же транзакции, что и вставка или
+удаление строки Favorite/ShoppingCart, поэтому сортировка по
+популярности и список рецептов в админке не считают COUNT() по связям.
+Массовые операции в обход сигналов должны вызывать ``increment`` сами;
+расхождения исправляет команда ``reconcile_recipe_counters``. Оба пути
+отправляют сигнал counters_changed (кэш ответов API).
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Favorite, Recipe, ShoppingCart
+from .signals import counters_changed
+
+COUNTERS = {
+    Favorite: "favorites_count",
+    ShoppingCart: "in_carts_count",
+}
+
+
+def increment(model, recipe_ids, delta):
+    """Прибавляет delta к счётчику связи model у рецептов recipe_ids."""
+    counter = COUNTERS[model]
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        **{counter: F(counter) + delta}
+    )
+    counters_changed.send(sender=Recipe, recipe_ids=recipe_ids)
+
+
+def live_counts():
+    """Выражения для пересчёта счётчиков по таблицам связей."""
+    return {
+        counter: Coalesce(
+            Subquery(
+                model.objects.filter(recipe=OuterRef("pk"))
+                .order_by()
+                .values("recipe")
+                .annotate(total=Count("pk"))
+                .values("total")
+            ),
+            Value(0),
+        )
+        for model, counter in COUNTERS.items()
+    }
+
+
+def on_relation_saved(sender, instance, created, **kwargs):
+    if created:
+        increment(sender, [instance.recipe_id], 1)
+
+
+def on_relation_deleted(sender, instance, **kwargs):
+    increment(sender, [instance.recipe_id], -1)
@@ -0,0 +1,47 @@
+"""Избранное и корзина: добавление и удаление одним SQL-оператором.
+
+Вставка идёт через INSERT ... ON CONFLICT DO NOTHING RETURNING, удаление —
+через DELETE ... RETURNING, поэтому повторный или одновременный запрос не
+падает с IntegrityError, а просто не получает строку обратно. Сигналы при
+этом не отправляются: счётчики популярности и агрегированный список
+покупок обновляются здесь явно, в той же транзакции.
+"""
+from django.db import connection, transaction
+
+from . import popularity, shopping_list
+from .models import Recipe, ShoppingCart
+
+
+def add(model, user_id, recipe_ids):
+    """Добавляет существующие рецепты; возвращает id добавленных."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {model._meta.db_table} "
+            "(user_id, recipe_id, created_at) "
+            f"SELECT %s, id, now() FROM {Recipe._meta.db_table} "
+            "WHERE id = ANY(%s) ORDER BY id "
+            "ON CONFLICT DO NOTHING RETURNING recipe_id",
+            [user_id, sorted(recipe_ids)],
+        )
+        added = {row[0] for row in cursor.fetchall()}
+        if added:
+            popularity.increment(model, added, 1)
+            if model is ShoppingCart:
+                shopping_list.add_recipes(user_id, added)
+    return added
+
+
+def remove(model, user_id, recipe_ids):
+    """Удаляет рецепты из связи пользователя; возвращает id удалённых."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {model._meta.db_table} "
+            "WHERE user_id = %s AND recipe_id = ANY(%s) RETURNING recipe_id",
+            [user_id, sorted(recipe_ids)],
+        )
+        removed = {row[0] for row in cursor.fetchall()}
+        if removed:
+            popularity.increment(model, removed, -1)
+            if model is ShoppingCart:
+                shopping_list.remove_recipes(user_id, removed)
+    return removed
@@ -0,0 +1,216 @@
+"""Фоновая подготовка уменьшенных копий изображений рецептов и аватаров.
+
+Запрос только сохраняет оригинал и сбрасывает ``<поле>_renditions`` в
+NULL. Воркер ``process_images`` забирает такую строку через
+SELECT ... FOR UPDATE SKIP LOCKED и в той же короткой транзакции помечает
+её как взятую в работу, так что блокировка снимается до обработки. Копии
+thumbnail, card и full в WebP и JPEG без метаданных делаются вне
+транзакции, а их имена записываются в JSON условным UPDATE: только если
+оригинал за это время не заменили. Пока копий нет, API отдаёт оригинал.
+Строки упавшего воркера возвращаются в очередь по истечении
+IMAGE_RENDITION_CLAIM_TIMEOUT. Копии привязаны к имени оригинала, а оно
+задаётся содержимым (ContentAddressedStorage), поэтому для одинаковых
+изображений копии делаются один раз. Заменённые файлы не удаляются в запросе, а
+ставятся в очередь StaleFile; воркер удаляет файл вместе с копиями,
+только если на него больше никто не ссылается.
+"""
+import io
+import os
+import time
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .constants import (
+    IMAGE_RENDITION_CLAIM_TIMEOUT,
+    IMAGE_RENDITION_FORMATS,
+    IMAGE_RENDITION_SIZES,
+)
+from .models import StaleFile
+from .signals import image_rendered
+
+READY, FAILED, PROCESSING = "ready", "failed", "processing"
+
+
+def rendition_name(source_name, size, extension):
+    top = source_name.split("/", 1)[0]
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    return os.path.join(top, "renditions", stem, f"{size}.{extension}")
+
+
+def all_rendition_names(source_name):
+    return [
+        rendition_name(source_name, size, extension)
+        for size in IMAGE_RENDITION_SIZES
+        for extension in IMAGE_RENDITION_FORMATS
+    ]
+
+
+def _encode(image, image_format, options):
+    if image_format == "JPEG" and image.mode != "RGB":
+        background = Image.new("RGB", image.size, "white")
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    buffer = io.BytesIO()
+    # без exif= и icc_profile= метаданные оригинала не переносятся
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def render(field_file):
+    """Сохраняет копии изображения и возвращает их имена по размерам.
+
+    Если копии этого содержимого уже есть (то же изображение у другого
+    рецепта или пользователя), Pillow не вызывается и ничего не пишется.
+    """
+    renditions = {
+        "status": READY,
+        "source": field_file.name,
+        **{
+            size: {
+                extension: rendition_name(field_file.name, size, extension)
+                for extension in IMAGE_RENDITION_FORMATS
+            }
+            for size in IMAGE_RENDITION_SIZES
+        },
+    }
+    if all(map(default_storage.exists, all_rendition_names(field_file.name))):
+        return renditions
+    with field_file.open("rb") as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+    for size, box in IMAGE_RENDITION_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail(box, Image.LANCZOS)
+        for extension, (image_format, options) in (
+            IMAGE_RENDITION_FORMATS.items()
+        ):
+            name = renditions[size][extension]
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            default_storage.save(
+                name, ContentFile(_encode(resized, image_format, options))
+            )
+    return renditions
+
+
+def rendition_url(field_file, size):
+    """URL копии нужного размера или оригинала, если копии ещё нет."""
+    renditions = getattr(
+        field_file.instance, f"{field_file.field.name}_renditions", None
+    )
+    if renditions and renditions.get("status") == READY:
+        name = renditions[size].get(settings.IMAGE_RENDITION_FORMAT)
+        if name:
+            return default_storage.url(name)
+    return field_file.url
+
+
+def discard(field_file):
+    """Ставит файл в очередь на удаление воркером (если он не нужен)."""
+    if field_file:
+        StaleFile.objects.bulk_create(
+            [StaleFile(name=field_file.name)], ignore_conflicts=True
+        )
+
+
+def is_referenced(name):
+    from django.contrib.auth import get_user_model
+
+    from .models import Recipe
+
+    return (
+        Recipe.objects.filter(image=name).exists()
+        or get_user_model().objects.filter(avatar=name).exists()
+    )
+
+
+def _claim(queryset, field_name):
+    """Берёт в работу одну ожидающую строку; None, если таких нет."""
+    renditions_field = f"{field_name}_renditions"
+    with transaction.atomic():
+        instance = (
+            queryset.filter(**{f"{renditions_field}__isnull": True})
+            .exclude(**{f"{field_name}__isnull": True})
+            .exclude(**{field_name: ""})
+            .select_for_update(skip_locked=True)
+            .only("pk", field_name)
+            .order_by("pk")
+            .first()
+        )
+        if instance is not None:
+            queryset.filter(pk=instance.pk).update(**{renditions_field: {
+                "status": PROCESSING,
+                "source": getattr(instance, field_name).name,
+                "claimed_at": time.time(),
+            }})
+    return instance
+
+
+def render_next(queryset, field_name):
+    """Обрабатывает одну ожидающую строку; False, если таких нет."""
+    instance = _claim(queryset, field_name)
+    if instance is None:
+        return False
+    field_file = getattr(instance, field_name)
+    try:
+        renditions = render(field_file)
+    except (OSError, ValueError, Image.DecompressionBombError) as error:
+        renditions = {
+            "status": FAILED,
+            "source": field_file.name,
+            "error": str(error),
+        }
+    # замена оригинала во время обработки сбросила статус: новые копии
+    # сделает следующий проход, а эти не записываются
+    updated = queryset.filter(
+        pk=instance.pk, **{field_name: field_file.name}
+    ).update(**{f"{field_name}_renditions": renditions})
+    if updated:
+        image_rendered.send(sender=queryset.model, instance=instance)
+    return True
+
+
+def release_stale_claims(queryset, field_name):
+    """Возвращает в очередь строки, которые воркер взял и не обработал."""
+    renditions_field = f"{field_name}_renditions"
+    return queryset.filter(**{
+        f"{renditions_field}__status": PROCESSING,
+        f"{renditions_field}__claimed_at__lt": (
+            time.time() - IMAGE_RENDITION_CLAIM_TIMEOUT
+        ),
+    }).update(**{renditions_field: None})
+
+
+def delete_stale(batch_size):
+    """Разбирает пачку очереди на удаление; возвращает её размер.
+
+    Строки очереди заблокированы до коммита, поэтому запрос, который
+    снова сохраняет тот же файл, дождётся удаления и запишет его заново.
+    """
+    with transaction.atomic():
+        stale = list(
+            StaleFile.objects.select_for_update(skip_locked=True)
+            .order_by("pk")[:batch_size]
+        )
+        for stale_file in stale:
+            if is_referenced(stale_file.name):
+                continue
+            for name in (
+                stale_file.name, *all_rendition_names(stale_file.name)
+            ):
+                default_storage.delete(name)
+        StaleFile.objects.filter(pk__in=[item.pk for item in stale]).delete()
+    return len(stale)
+
+
+def on_recipe_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: discard(instance.image))
+
+
+def on_user_deleted(sender, instance, **kwargs):
+    transaction.on_commit(lambda: discard(instance.avatar))
@@ -0,0 +1,74 @@
+"""Полнотекстовый поиск рецептов (PostgreSQL).
+
+В Recipe.search_vector хранится tsvector по названию (вес A), описанию (B)
+и названиям ингредиентов (C), построенный сразу для русской и английской
+конфигураций. Вектор пересчитывается явно после сохранения рецепта вместе
+с ингредиентами (bulk_create не отправляет сигналы) и при переименовании
+ингредиента.
+"""
+import re
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchVector
+from django.db.models import OuterRef, Subquery
+
+SEARCH_CONFIGS = ("russian", "english")
+WORD = re.compile(r"\w+")
+
+
+def search_vector_expression():
+    """Выражение tsvector для UPDATE рецептов (OuterRef на pk рецепта).
+
+    Миграция 0004 хранит собственную копию: правки здесь на неё не влияют.
+    """
+    from .models import IngredientInRecipe
+
+    ingredient_names = Subquery(
+        IngredientInRecipe.objects.filter(recipe=OuterRef("pk"))
+        .order_by()
+        .values("recipe")
+        .annotate(names=StringAgg("ingredient__name", " "))
+        .values("names")
+    )
+    vector = None
+    for config in SEARCH_CONFIGS:
+        part = (
+            SearchVector("name", weight="A", config=config)
+            + SearchVector("text", weight="B", config=config)
+            + SearchVector(ingredient_names, weight="C", config=config)
+        )
+        vector = part if vector is None else vector + part
+    return vector
+
+
+def update_search_vector(recipe_ids):
+    from .models import Recipe
+
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        search_vector=search_vector_expression()
+    )
+
+
+def search_query(text):
+    """tsquery из слов запроса с поиском по префиксу; None, если слов нет.
+
+    Слова берутся по \\w+, поэтому синтаксис to_tsquery в них не попадает.
+    """
+    words = WORD.findall(text.lower())
+    if not words:
+        return None
+    raw = " & ".join(f"{word}:*" for word in words)
+    query = None
+    for config in SEARCH_CONFIGS:
+        part = SearchQuery(raw, search_type="raw", config=config)
+        query = part if query is None else query | part
+    return query
+
+
+def on_ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        from .models import Recipe
+
+        update_search_vector(
+            Recipe.objects.filter(ingredients=instance).values("pk")
+        )
@@ -0,0 +1,133 @@
+"""Поддержка агрегированного списка покупок (ShoppingListItem).
+
+Каждое изменение корзины или ингредиентов рецепта из корзины применяется к
+агрегату набором SQL-операций в той же транзакции, поэтому чтение списка
+покупок стоит O(числа разных ингредиентов) и не требует пересчёта Sum().
+"""
+from django.db import connection
+from django.db.models import Exists, F, OuterRef, Subquery, Sum
+
+from .models import IngredientInRecipe, ShoppingCart, ShoppingListItem
+
+
+def _contributions(recipe_id):
+    """Вклад рецепта в строку агрегата (OuterRef на user и ingredient)."""
+    return IngredientInRecipe.objects.filter(
+        recipe_id=recipe_id,
+        ingredient=OuterRef("ingredient"),
+        recipe__in_shopping_carts_of__user=OuterRef("user"),
+    )
+
+
+def add_recipe(recipe_id, user_id=None):
+    """Прибавляет ингредиенты рецепта к спискам пользователей.
+
+    Без user_id — ко всем пользователям, у которых рецепт в корзине.
+    ORM не умеет инкремент в INSERT ... ON CONFLICT, поэтому upsert
+    выполняется одним SQL-запросом.
+    """
+    items = ShoppingListItem._meta.db_table
+    sql = (
+        f"INSERT INTO {items} (user_id, ingredient_id, amount) "
+        "SELECT cart.user_id, amounts.ingredient_id, amounts.amount "
+        f"FROM {ShoppingCart._meta.db_table} cart "
+        f"JOIN {IngredientInRecipe._meta.db_table} amounts "
+        "ON amounts.recipe_id = cart.recipe_id "
+        "WHERE cart.recipe_id = %s"
+    )
+    params = [recipe_id]
+    if user_id is not None:
+        sql += " AND cart.user_id = %s"
+        params.append(user_id)
+    sql += (
+        " ON CONFLICT (user_id, ingredient_id) "
+        f"DO UPDATE SET amount = {items}.amount + EXCLUDED.amount"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def remove_recipe(recipe_id, user_id=None):
+    """Вычитает ингредиенты рецепта из списков пользователей.
+
+    Вызывается, пока строка корзины ещё существует. Строки, сумма которых
+    обнуляется, удаляются.
+    """
+    items = ShoppingListItem.objects.all()
+    if user_id is not None:
+        items = items.filter(user_id=user_id)
+    contributions = _contributions(recipe_id)
+    items.filter(
+        Exists(contributions.filter(amount__gte=OuterRef("amount")))
+    ).delete()
+    items.filter(Exists(contributions)).update(
+        amount=F("amount") - Subquery(contributions.values("amount")[:1])
+    )
+
+
+def add_recipes(user_id, recipe_ids):
+    """Прибавляет к списку пользователя ингредиенты нескольких рецептов.
+
+    В отличие от add_recipe не читает корзину: вызывается после вставки
+    строк корзины в обход сигналов (recipes.relations).
+    """
+    items = ShoppingListItem._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {items} (user_id, ingredient_id, amount) "
+            "SELECT %s, ingredient_id, SUM(amount) "
+            f"FROM {IngredientInRecipe._meta.db_table} "
+            "WHERE recipe_id = ANY(%s) GROUP BY ingredient_id "
+            "ON CONFLICT (user_id, ingredient_id) "
+            f"DO UPDATE SET amount = {items}.amount + EXCLUDED.amount",
+            [user_id, list(recipe_ids)],
+        )
+
+
+def remove_recipes(user_id, recipe_ids):
+    """Вычитает из списка пользователя ингредиенты нескольких рецептов.
+
+    Строки корзины к этому моменту уже удалены, поэтому вклад считается
+    по ингредиентам рецептов. Обнуляющиеся строки удаляются в том же
+    запросе: DELETE и UPDATE затрагивают разные строки.
+    """
+    items = ShoppingListItem._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "WITH contributions AS ("
+            "SELECT ingredient_id, SUM(amount) AS total "
+            f"FROM {IngredientInRecipe._meta.db_table} "
+            "WHERE recipe_id = ANY(%s) GROUP BY ingredient_id"
+            "), emptied AS ("
+            f"DELETE FROM {items} USING contributions "
+            f"WHERE {items}.user_id = %s "
+            f"AND {items}.ingredient_id = contributions.ingredient_id "
+            f"AND {items}.amount <= contributions.total"
+            f") UPDATE {items} SET amount = {items}.amount - contributions.total "
+            "FROM contributions "
+            f"WHERE {items}.user_id = %s "
+            f"AND {items}.ingredient_id = contributions.ingredient_id "
+            f"AND {items}.amount > contributions.total",
+            [list(recipe_ids), user_id, user_id],
+        )
+
+
+def live_totals():
+    """Актуальные суммы, посчитанные по корзинам и рецептам."""
+    return (
+        IngredientInRecipe.objects.filter(
+            recipe__in_shopping_carts_of__isnull=False
+        )
+        .values("recipe__in_shopping_carts_of__user", "ingredient")
+        .annotate(total=Sum("amount"))
+        .order_by()
+    )
+
+
+def on_cart_saved(sender, instance, created, **kwargs):
+    if created:
+        add_recipe(instance.recipe_id, instance.user_id)
+
+
+def on_cart_deleted(sender, instance, **kwargs):
+    remove_recipe(instance.recipe_id, instance.user_id)
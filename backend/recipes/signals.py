@@ -0,0 +1,10 @@
+"""Сигналы об изменениях, которые записываются в обход Model.save()."""
+from django.dispatch import Signal
+
+# Копии изображения записаны UPDATE (renditions.render_next). instance —
+# строка рецепта или пользователя, у которой загружены pk и изображение.
+image_rendered = Signal()
+
+# Счётчики популярности рецептов recipe_ids изменены UPDATE
+# (popularity.increment, reconcile_recipe_counters).
+counters_changed = Signal()
@@ -0,0 +1,44 @@
+"""Хранилище изображений с адресацией по содержимому.
+
+Имя файла — sha256 его байтов (``<каталог>/<2 символа>/<хеш>.<расширение>``),
+поэтому одинаковые изображения хранятся один раз, а повторная загрузка
+того же изображения не пишет на диск ничего. Файл удаляется воркером
+process_images только когда на него не ссылается ни одна строка
+(см. renditions.delete_stale).
+"""
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], f"{digest}{extension}")
+
+    def save(self, name, content, max_length=None):
+        from .models import StaleFile
+
+        name = self.content_name(name, content)
+        # файл мог быть поставлен в очередь на удаление: забираем его
+        # обратно; если воркер уже удаляет его, delete() дождётся коммита
+        StaleFile.objects.filter(name=name).delete()
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def get_image_storage():
+    return content_addressed_storage
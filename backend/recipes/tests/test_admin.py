@@ -0,0 +1,53 @@
+from api.tests.base import PASSWORD, FoodgramTestCase, create_recipe
+from recipes.models import IngredientInRecipe, ShoppingCart, ShoppingListItem
+from users.models import User
+
+
+class RecipeAdminTests(FoodgramTestCase):
+    """Список покупок при изменении ингредиентов через админку."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.admin = User.objects.create_superuser(
+            email="admin@example.com",
+            username="admin",
+            first_name="Админ",
+            last_name="Админов",
+            password=PASSWORD,
+        )
+        cls.recipe = create_recipe(cls.admin, "Суп", {cls.water: 500})
+        cls.row = IngredientInRecipe.objects.get(recipe=cls.recipe)
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipe)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def test_inline_change_updates_shopping_list(self):
+        response = self.client.post(
+            f"/admin/recipes/recipe/{self.recipe.pk}/change/",
+            {
+                "author": self.admin.pk,
+                "name": "Суп",
+                "text": "Приготовить",
+                "cooking_time": 10,
+                "ingredient_amounts-TOTAL_FORMS": 2,
+                "ingredient_amounts-INITIAL_FORMS": 1,
+                "ingredient_amounts-0-id": self.row.pk,
+                "ingredient_amounts-0-recipe": self.recipe.pk,
+                "ingredient_amounts-0-ingredient": self.water.pk,
+                "ingredient_amounts-0-amount": 300,
+                "ingredient_amounts-1-recipe": self.recipe.pk,
+                "ingredient_amounts-1-ingredient": self.salt.pk,
+                "ingredient_amounts-1-amount": 5,
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            dict(
+                ShoppingListItem.objects.filter(user=self.user)
+                .values_list("ingredient", "amount")
+            ),
+            {self.water.pk: 300, self.salt.pk: 5},
+        )
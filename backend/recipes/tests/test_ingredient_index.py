@@ -0,0 +1,78 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from recipes.ingredient_index import IngredientIndex
+
+CATALOG = [
+    "сахар", "сахар ванильный", "соль", "морская соль", "морковь",
+    "чеснок", "чеснок молодой", "виноград", "картофель", "помидоры",
+]
+# много ключей с одной общей с "сохар" триграммой, как и у "сахар"
+NOISE = [f"посох {number}" for number in range(100)]
+
+SEARCH_SCRIPT = """
+import json, sys
+import django
+django.setup()
+from recipes.ingredient_index import IngredientIndex
+rows, queries = json.load(sys.stdin)
+index = IngredientIndex(rows)
+print(json.dumps([
+    [item["name"] for item in index.search(query)] for query in queries
+]))
+"""
+
+
+def catalog_rows(names):
+    return [(pk, name, "г") for pk, name in enumerate(names, 1)]
+
+
+def names(index, query):
+    return [item["name"] for item in index.search(query)]
+
+
+class IngredientIndexTests(SimpleTestCase):
+    """Ранжирование и поиск с опечатками в индексе ингредиентов."""
+
+    def setUp(self):
+        self.index = IngredientIndex(catalog_rows(CATALOG + NOISE))
+
+    def test_prefix_then_substring(self):
+        self.assertEqual(names(self.index, "Сол"), ["соль", "морская соль"])
+
+    def test_typo_queries(self):
+        for query, expected in (
+            ("сохар", ["сахар", "сахар ванильный"]),
+            ("чисног", ["чеснок", "чеснок молодой"]),
+            ("мрковь", ["морковь"]),
+            ("кортофель", ["картофель"]),
+        ):
+            with self.subTest(query=query):
+                self.assertEqual(
+                    names(self.index, query)[:len(expected)], expected
+                )
+
+    def test_same_results_across_hash_seeds(self):
+        queries = ["сохар", "чисног", "помедор", "посах"]
+        payload = json.dumps([catalog_rows(CATALOG + NOISE), queries])
+        results = set()
+        for seed in range(1, 7):
+            process = subprocess.run(
+                [sys.executable, "-c", SEARCH_SCRIPT],
+                input=payload,
+                capture_output=True,
+                check=True,
+                cwd=settings.BASE_DIR,
+                env={**os.environ, "PYTHONHASHSEED": str(seed)},
+                text=True,
+            )
+            results.add(process.stdout)
+        self.assertEqual(len(results), 1)
+        found = json.loads(results.pop())
+        self.assertEqual(found[0][:2], ["сахар", "сахар ванильный"])
+        self.assertEqual(found[1][:2], ["чеснок", "чеснок молодой"])
@@ -0,0 +1,69 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+
+from api import response_cache
+from api.tests.base import FoodgramTestCase, create_recipe, create_user
+from recipes import relations
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+def reconcile(*args):
+    call_command("reconcile_recipe_counters", *args, stdout=StringIO())
+
+
+class PopularityCountersTests(FoodgramTestCase):
+    """Счётчики favorites_count и in_carts_count у рецепта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.soup = create_recipe(cls.author, "Суп")
+        cls.bread = create_recipe(cls.author, "Хлеб")
+
+    def counters(self, recipe):
+        recipe.refresh_from_db()
+        return recipe.favorites_count, recipe.in_carts_count
+
+    def test_relation_signals(self):
+        Favorite.objects.create(user=self.user, recipe=self.soup)
+        Favorite.objects.create(user=self.author, recipe=self.soup)
+        ShoppingCart.objects.create(user=self.user, recipe=self.soup)
+        self.assertEqual(self.counters(self.soup), (2, 1))
+        Favorite.objects.filter(user=self.author).delete()
+        self.assertEqual(self.counters(self.soup), (1, 1))
+
+    def test_cascade_delete(self):
+        guest = create_user("guest")
+        Favorite.objects.create(user=guest, recipe=self.soup)
+        ShoppingCart.objects.create(user=guest, recipe=self.bread)
+        guest.delete()
+        self.assertEqual(self.counters(self.soup), (0, 0))
+        self.assertEqual(self.counters(self.bread), (0, 0))
+
+    def test_batch_relations(self):
+        ids = [self.soup.pk, self.bread.pk]
+        relations.add(Favorite, self.user.pk, ids)
+        # повторное добавление не меняет счётчик
+        relations.add(Favorite, self.user.pk, ids)
+        self.assertEqual(self.counters(self.soup), (1, 0))
+        relations.remove(Favorite, self.user.pk, [self.bread.pk])
+        self.assertEqual(self.counters(self.bread), (0, 0))
+
+    def test_reconcile(self):
+        Favorite.objects.create(user=self.user, recipe=self.soup)
+        Recipe.objects.filter(pk=self.soup.pk).update(favorites_count=5)
+        Recipe.objects.filter(pk=self.bread.pk).update(in_carts_count=2)
+        cache.clear()
+        version = response_cache._version(response_cache.LIST_VERSION_KEY)
+        with self.assertRaises(CommandError):
+            reconcile("--check")
+        with self.captureOnCommitCallbacks(execute=True):
+            reconcile()
+        self.assertEqual(self.counters(self.soup), (1, 0))
+        self.assertEqual(self.counters(self.bread), (0, 0))
+        self.assertNotEqual(
+            cache.get(response_cache.LIST_VERSION_KEY), version
+        )
+        reconcile("--check")
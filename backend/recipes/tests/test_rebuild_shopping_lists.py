@@ -0,0 +1,77 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connections
+from django.test import TransactionTestCase
+
+from api.tests.base import FoodgramTestCase, create_recipe, create_user
+from recipes.management.commands import rebuild_shopping_lists
+from recipes.models import Ingredient, ShoppingCart, ShoppingListItem
+
+
+def rebuild(*args):
+    call_command("rebuild_shopping_lists", *args, stdout=StringIO())
+
+
+class RebuildShoppingListsTests(FoodgramTestCase):
+    """Сверка агрегата списков покупок с корзинами."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        soup = create_recipe(cls.author, "Суп", {cls.water: 500, cls.salt: 5})
+        ShoppingCart.objects.create(user=cls.user, recipe=soup)
+
+    def totals(self):
+        return dict(
+            ShoppingListItem.objects.filter(user=self.user)
+            .values_list("ingredient", "amount")
+        )
+
+    def test_drift_fixed(self):
+        ShoppingListItem.objects.filter(ingredient=self.water).delete()
+        ShoppingListItem.objects.filter(ingredient=self.salt).update(amount=1)
+        ShoppingListItem.objects.create(
+            user=self.user, ingredient=self.flour, amount=300
+        )
+        with self.assertRaises(CommandError):
+            rebuild("--check")
+        rebuild()
+        self.assertEqual(self.totals(), {self.water.pk: 500, self.salt.pk: 5})
+        rebuild("--check")
+
+
+class RebuildShoppingListsLockTests(TransactionTestCase):
+    """Пока идёт сверка, другие транзакции не меняют агрегат."""
+
+    def test_concurrent_insert_waits(self):
+        user = create_user("reader")
+        water = Ingredient.objects.create(name="вода", measurement_unit="мл")
+        soup = create_recipe(create_user("author"), "Суп", {water: 500})
+        ShoppingCart.objects.create(user=user, recipe=soup)
+        ShoppingListItem.objects.all().delete()
+        other = connections.create_connection("default")
+        self.addCleanup(other.close)
+        live_totals = rebuild_shopping_lists.live_totals
+
+        def insert_during_rebuild():
+            with other.cursor() as cursor:
+                cursor.execute("SET lock_timeout = '100ms'")
+                with self.assertRaises(OperationalError):
+                    cursor.execute(
+                        f"INSERT INTO {ShoppingListItem._meta.db_table} "
+                        "(user_id, ingredient_id, amount) "
+                        "VALUES (%s, %s, 500)",
+                        [user.pk, water.pk],
+                    )
+            return live_totals()
+
+        with mock.patch.object(
+            rebuild_shopping_lists, "live_totals", insert_during_rebuild
+        ):
+            rebuild()
+        self.assertEqual(
+            list(ShoppingListItem.objects.values_list("amount", flat=True)),
+            [500],
+        )
@@ -0,0 +1,132 @@
+import json
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.test import TransactionTestCase
+
+from api import response_cache
+from api.tests.base import IMAGE, FoodgramTestCase, create_recipe, create_user
+from recipes import renditions
+from recipes.constants import IMAGE_RENDITION_CLAIM_TIMEOUT
+from recipes.models import Recipe
+
+
+def fake_renditions(field_file):
+    return {"status": renditions.READY, "source": field_file.name}
+
+
+class RenderNextLockTests(TransactionTestCase):
+    """Строка не заблокирована, пока воркер делает копии."""
+
+    def setUp(self):
+        self.recipe = create_recipe(create_user("author"), "Суп")
+
+    def test_row_not_locked_while_rendering(self):
+        other = connections.create_connection("default")
+        self.addCleanup(other.close)
+        seen = []
+
+        def render(field_file):
+            with other.cursor() as cursor:
+                # NOWAIT: ошибка, если строку держит воркер
+                cursor.execute(
+                    f"SELECT image_renditions FROM {Recipe._meta.db_table} "
+                    "WHERE id = %s FOR UPDATE NOWAIT",
+                    [self.recipe.pk],
+                )
+                seen.append(cursor.fetchone()[0])
+            return fake_renditions(field_file)
+
+        with mock.patch.object(renditions, "render", render):
+            self.assertTrue(
+                renditions.render_next(Recipe.objects.all(), "image")
+            )
+        self.assertEqual(len(seen), 1)
+        self.assertEqual(
+            json.loads(seen[0])["status"], renditions.PROCESSING
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(
+            self.recipe.image_renditions,
+            {"status": renditions.READY, "source": self.recipe.image.name},
+        )
+
+
+class RenderNextTests(FoodgramTestCase):
+    """Очередь копий изображений (recipes.renditions)."""
+
+    def render_next(self):
+        return renditions.render_next(Recipe.objects.all(), "image")
+
+    def test_rendered_copies_saved(self):
+        response = self.client.post(
+            "/api/recipes/",
+            {
+                "ingredients": [{"id": self.water.pk, "amount": 100}],
+                "name": "Суп",
+                "image": IMAGE,
+                "text": "Сварить",
+                "cooking_time": 10,
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        cache.clear()
+        version = response_cache._version(response_cache.LIST_VERSION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(self.render_next())
+        self.assertFalse(self.render_next())
+        recipe = Recipe.objects.get(pk=response.data["id"])
+        self.assertEqual(recipe.image_renditions["status"], renditions.READY)
+        self.assertTrue(all(map(
+            default_storage.exists,
+            renditions.all_rendition_names(recipe.image.name),
+        )))
+        # копии записаны UPDATE, но кэш ответов всё равно сброшен
+        self.assertNotEqual(
+            cache.get(response_cache.LIST_VERSION_KEY), version
+        )
+
+    def test_replaced_image_not_overwritten(self):
+        recipe = create_recipe(self.author, "Суп")
+
+        def render(field_file):
+            # загрузка нового изображения во время обработки
+            replaced = Recipe.objects.get(pk=recipe.pk)
+            replaced.image = "recipes/images/new.png"
+            replaced.save()
+            return fake_renditions(field_file)
+
+        with mock.patch.object(renditions, "render", render):
+            self.assertTrue(self.render_next())
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image.name, "recipes/images/new.png")
+        self.assertIsNone(recipe.image_renditions)
+
+    def test_stale_claims_released(self):
+        stale, fresh = (
+            create_recipe(self.author, name) for name in ("Суп", "Чай")
+        )
+        now = time.time()
+        for recipe, claimed_at in (
+            (stale, now - IMAGE_RENDITION_CLAIM_TIMEOUT - 1),
+            (fresh, now),
+        ):
+            Recipe.objects.filter(pk=recipe.pk).update(image_renditions={
+                "status": renditions.PROCESSING,
+                "source": recipe.image.name,
+                "claimed_at": claimed_at,
+            })
+        self.assertFalse(self.render_next())
+        self.assertEqual(
+            renditions.release_stale_claims(Recipe.objects.all(), "image"), 1
+        )
+        stale.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertIsNone(stale.image_renditions)
+        self.assertEqual(
+            fresh.image_renditions["status"], renditions.PROCESSING
+        )
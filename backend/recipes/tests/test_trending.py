@@ -0,0 +1,76 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+
+from api.tests.base import FoodgramTestCase, create_recipe
+from recipes.models import Favorite, ShoppingCart, TrendingRecipe
+
+
+def refresh_trending(*args):
+    call_command("refresh_trending", *args, stdout=StringIO())
+
+
+class TrendingTests(FoodgramTestCase):
+    """Пересчёт трендов и их выдача."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.soup, cls.bread, cls.tea, cls.pie = (
+            create_recipe(cls.author, name)
+            for name in ("Суп", "Хлеб", "Чай", "Пирог")
+        )
+        for user in (cls.user, cls.author):
+            Favorite.objects.create(user=user, recipe=cls.soup)
+        Favorite.objects.create(user=cls.user, recipe=cls.bread)
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.bread)
+        now = timezone.now()
+        for recipe, age in ((cls.tea, 3), (cls.pie, 20)):
+            Favorite.objects.filter(
+                pk=Favorite.objects.create(user=cls.user, recipe=recipe).pk
+            ).update(created_at=now - timedelta(days=age))
+
+    def ranking(self):
+        return list(
+            TrendingRecipe.objects.values_list("recipe", "rank")
+        )
+
+    def test_scores_ranked(self):
+        refresh_trending()
+        # хлеб: 1 + 2 за корзину, суп: 1 + 1, чай: вес за 3 дня упал
+        # в 2 ** (72 / 48) раза, пирог вне окна в 14 дней
+        self.assertEqual(
+            self.ranking(),
+            [(self.bread.pk, 1), (self.soup.pk, 2), (self.tea.pk, 3)],
+        )
+        tea = TrendingRecipe.objects.get(recipe=self.tea)
+        self.assertAlmostEqual(tea.score, 2 ** -1.5, places=3)
+
+    def test_refresh_replaces_ranking(self):
+        refresh_trending()
+        Favorite.objects.filter(recipe=self.soup).delete()
+        refresh_trending("--limit", "1", "--window", "30")
+        self.assertEqual(self.ranking(), [(self.bread.pk, 1)])
+
+    def test_invalid_options(self):
+        for option in ("--window", "--half-life", "--limit"):
+            args = (option, "0")
+            with self.subTest(args=args), self.assertRaises(CommandError):
+                refresh_trending(*args)
+
+    def test_trending_endpoint(self):
+        refresh_trending()
+        response = self.client.get("/api/recipes/trending/", {"limit": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe["id"] for recipe in response.data["results"]],
+            [self.bread.pk, self.soup.pk],
+        )
+        response = self.client.get(response.data["next"])
+        self.assertEqual(
+            [recipe["id"] for recipe in response.data["results"]],
+            [self.tea.pk],
+        )
+        self.assertIsNone(response.data["next"])
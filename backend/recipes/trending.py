@@ -0,0 +1,54 @@
+"""Тренды: рейтинг рецептов по недавним добавлениям в избранное и корзину.
+
+Оценка рецепта — сумма весов событий за окно TRENDING_WINDOW_DAYS, вес
+каждого события убывает экспоненциально с периодом полураспада
+TRENDING_HALF_LIFE_HOURS. Оценки всех рецептов считаются одним
+SQL-запросом (агрегат по UNION ALL обеих таблиц, использующий индексы по
+created_at), а первые TRENDING_RECIPES_LIMIT мест записываются в
+TrendingRecipe. Чтение трендов — сканирование уникального индекса по rank.
+"""
+import math
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Favorite, ShoppingCart, TrendingRecipe
+
+
+def refresh(
+    half_life_hours, window_days, limit, favorite_weight, cart_weight
+):
+    """Пересчитывает тренды и заменяет таблицу; возвращает число мест.
+
+    Замена атомарна: читатели видят старый рейтинг до коммита, а
+    блокировка EXCLUSIVE не даёт двум пересчётам выполняться одновременно,
+    но не мешает чтению.
+    """
+    now = timezone.now()
+    since = now - timedelta(days=window_days)
+    decay = math.log(2) / (half_life_hours * 3600)
+    trending = TrendingRecipe._meta.db_table
+    events = " UNION ALL ".join(
+        f"SELECT recipe_id, created_at, %s::float8 AS weight "
+        f"FROM {model._meta.db_table} WHERE created_at >= %s"
+        for model in (Favorite, ShoppingCart)
+    )
+    sql = (
+        f"INSERT INTO {trending} (recipe_id, score, rank) "
+        "SELECT recipe_id, score, "
+        "row_number() OVER (ORDER BY score DESC, recipe_id DESC) "
+        "FROM ("
+        "SELECT recipe_id, "
+        "SUM(weight * exp(-%s * extract(epoch FROM %s - created_at))) "
+        f"AS score FROM ({events}) AS events GROUP BY recipe_id"
+        ") AS scores ORDER BY score DESC, recipe_id DESC LIMIT %s"
+    )
+    params = [
+        decay, now, favorite_weight, since, cart_weight, since, limit
+    ]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {trending} IN EXCLUSIVE MODE")
+        cursor.execute(f"DELETE FROM {trending}")
+        cursor.execute(sql, params)
+        return cursor.rowcount
@@ -1,3 +1,4 @@
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect
 
 from .models import Recipe
@@ -5,3 +6,11 @@ from .models import Recipe
 def recipe_short_redirect_view(request, pk):
     recipe = get_object_or_404(Recipe, pk=pk)
     return redirect(f"/recipes/{recipe.pk}/")
+
+
+async def async_recipe_short_redirect_view(request, pk):
+    if not await Recipe.objects.filter(pk=pk).aexists():
+        raise Http404(
+            f"No {Recipe._meta.object_name} matches the given query."
+        )
+    return redirect(f"/recipes/{pk}/")
@@ -0,0 +1,29 @@
+"""Подписки на авторов одним SQL-оператором (см. recipes.relations)."""
+from django.db import connection
+
+from .models import Follow, User
+
+
+def follow(user_id, author_ids):
+    """Подписывает на существующих авторов; возвращает id новых подписок."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {Follow._meta.db_table} "
+            "(user_id, author_id, created_at) "
+            f"SELECT %s, id, now() FROM {User._meta.db_table} "
+            "WHERE id = ANY(%s) AND id <> %s ORDER BY id "
+            "ON CONFLICT DO NOTHING RETURNING author_id",
+            [user_id, sorted(author_ids), user_id],
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def unfollow(user_id, author_ids):
+    """Отменяет подписки; возвращает id авторов, подписка на которых была."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {Follow._meta.db_table} "
+            "WHERE user_id = %s AND author_id = ANY(%s) RETURNING author_id",
+            [user_id, sorted(author_ids)],
+        )
+        return {row[0] for row in cursor.fetchall()}
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 04:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0002_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_renditions',
+            field=models.JSONField(blank=True, editable=False, null=True, verbose_name='уменьшенные копии аватара'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('avatar_renditions__isnull', True)), fields=['id'], name='user_renditions_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 04:33
+
+import recipes.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(blank=True, db_index=True, null=True, storage=recipes.storage.get_image_storage, upload_to='users/avatars/', verbose_name='аватар'),
+        ),
+    ]
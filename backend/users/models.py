@@ -1,6 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from recipes.storage import get_image_storage
 from users.constants import MAX_EMAIL_LENGTH
 
 class User(AbstractUser):
@@ -12,8 +13,16 @@ class User(AbstractUser):
     avatar = models.ImageField(
         verbose_name='аватар',
         upload_to='users/avatars/',
+        storage=get_image_storage,
         blank=True,
         null=True,
+        db_index=True,
+    )
+    avatar_renditions = models.JSONField(
+        verbose_name='уменьшенные копии аватара',
+        null=True,
+        blank=True,
+        editable=False,
     )
 
     USERNAME_FIELD = 'email'
@@ -23,10 +32,33 @@ class User(AbstractUser):
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ['username']
+        indexes = [
+            models.Index(
+                fields=['username', 'id'],
+                name='user_username_id_idx',
+            ),
+            models.Index(
+                fields=['id'],
+                condition=models.Q(avatar_renditions__isnull=True),
+                name='user_renditions_pending_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.username
 
+    def save(self, *args, **kwargs):
+        if self.avatar and not self.avatar._committed:
+            # имя файла становится известно только после записи в хранилище
+            self.avatar.save(self.avatar.name, self.avatar.file, save=False)
+        if (
+            self.avatar_renditions
+            and self.avatar_renditions.get('source') != self.avatar.name
+        ):
+            # аватар сменился: копии сделает воркер process_images
+            self.avatar_renditions = None
+        super().save(*args, **kwargs)
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -34,12 +66,16 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='follower',
         verbose_name='Подписчик',
+        # покрывается уникальным ограничением (user, author)
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='following',
         verbose_name='Автор',
+        # заменён составным индексом (author, user)
+        db_index=False,
     )
     created_at = models.DateTimeField(
         verbose_name='Дата создания подписки',
@@ -59,6 +95,13 @@ class Follow(models.Model):
                 name='prevent_self_follow',
             ),
         ]
+        indexes = [
+            # подписчики автора и проверка подписки без чтения таблицы
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'{self.user.username} подписан на {self.author.username}'